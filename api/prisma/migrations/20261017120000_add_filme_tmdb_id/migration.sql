@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE "Filme" ADD COLUMN     "tmdb_id" INTEGER;
+
+-- CreateIndex
+CREATE UNIQUE INDEX "Filme_tmdb_id_key" ON "Filme"("tmdb_id");
@@ -0,0 +1,4 @@
+-- Duplicate forums must be merged first, see backend/app/sql/forum_unique_filme.sql
+
+-- CreateIndex
+CREATE UNIQUE INDEX IF NOT EXISTS "Forum_filme_id_key" ON "Forum"("filme_id");
@@ -1,6 +1,7 @@
 from fastapi import Header, HTTPException, Request, Depends, status
 from typing import Optional, Dict, Any
 import logging
+from app.executor import run_query
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +35,7 @@ async def get_user_by_email(
     try:
         if request and hasattr(request.app.state, "supabase"):
             supabase = request.app.state.supabase
-            user_result = supabase.table("Usuario").select("*").eq("email", email).execute()
+            user_result = await run_query(supabase.table("Usuario").select("*").eq("email", email))
             
             if not user_result.data or len(user_result.data) == 0:
                 raise HTTPException(status_code=404, detail=f"User with email {email} not found")
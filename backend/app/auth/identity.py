@@ -0,0 +1,146 @@
+from fastapi import Depends, HTTPException, Request
+from pydantic import BaseModel
+from typing import Any, Callable, Dict, Optional
+import logging
+
+from app.cache import TTLCache
+from app.config import get_settings
+from app.executor import run_query
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings().cache
+_identity_cache = TTLCache(maxsize=_settings.identity_size, ttl=_settings.identity_ttl)
+
+
+class Identity(BaseModel):
+    """Database identity of an authenticated user"""
+    usuario_id: int
+    perfil_id: Optional[int] = None  # default profile
+    email: Optional[str] = None
+    firebase_uid: Optional[str] = None
+
+    def profile(self, perfil_id: Optional[int] = None) -> int:
+        """Return perfil_id when given, otherwise the user's default profile"""
+        if perfil_id:
+            return perfil_id
+        if self.perfil_id is None:
+            raise HTTPException(status_code=404, detail="Perfil não encontrado para o usuário")
+        return self.perfil_id
+
+
+def _claim(user: Any, name: str) -> Any:
+    """Read a field from a decoded token dict, a user dict or a Firebase UserRecord"""
+    if isinstance(user, dict):
+        return user.get(name)
+    return getattr(user, name, None)
+
+
+def _cache_keys(identity: Identity):
+    keys = [("usuario", identity.usuario_id)]
+    if identity.firebase_uid:
+        keys.append(("uid", identity.firebase_uid))
+    if identity.email:
+        keys.append(("email", identity.email))
+    return keys
+
+
+def _lookup_keys(user: Any):
+    usuario_id = _claim(user, "id")
+    uid = _claim(user, "uid")
+    email = _claim(user, "email")
+    keys = []
+    if isinstance(usuario_id, int):
+        keys.append(("usuario", usuario_id))
+    if uid:
+        keys.append(("uid", uid))
+    if email:
+        keys.append(("email", email))
+    return keys
+
+
+async def _load_identity(supabase, keys) -> Optional[Identity]:
+    columns = {"usuario": "id", "uid": "firebase_uid", "email": "email"}
+    for kind, value in keys:
+        result = await run_query(supabase.table("Usuario").select("id, email, firebase_uid").eq(columns[kind], value).limit(1))
+        if result.data:
+            user = result.data[0]
+            break
+    else:
+        return None
+
+    profile = await run_query(supabase.table("Perfil").select("id").eq("usuario_id", user["id"]).limit(1))
+    return Identity(
+        usuario_id=user["id"],
+        perfil_id=profile.data[0]["id"] if profile.data else None,
+        email=user.get("email"),
+        firebase_uid=user.get("firebase_uid"),
+    )
+
+
+async def resolve_identity(supabase, user: Any) -> Identity:
+    """
+    Resolve the Usuario id and default Perfil id of an authenticated user.
+
+    Accepts a Firebase token dict, a Firebase UserRecord or the dict returned by
+    the email authentication. Results are kept in a process-wide TTL cache that
+    is invalidated when the user is updated or deleted.
+
+    Raises:
+        HTTPException: 404 if the user has no Usuario record.
+    """
+    keys = _lookup_keys(user)
+    for key in keys:
+        identity = _identity_cache.get(key)
+        if identity is not None:
+            return identity
+
+    identity = await _load_identity(supabase, keys)
+    if identity is None:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+    for key in _cache_keys(identity):
+        _identity_cache.set(key, identity)
+    return identity
+
+
+def identity_keys(user: Any) -> Dict[str, Any]:
+    """
+    Keys identifying an authenticated user, for SQL functions that resolve
+    the Usuario themselves. The Usuario id is filled in from the cache when
+    the identity was already resolved.
+    """
+    keys = dict(_lookup_keys(user))
+    if "usuario" not in keys:
+        for key in _lookup_keys(user):
+            identity = _identity_cache.get(key)
+            if identity is not None:
+                keys["usuario"] = identity.usuario_id
+                break
+    return {"usuario_id": keys.get("usuario"), "firebase_uid": keys.get("uid"), "email": keys.get("email")}
+
+
+def invalidate_identity(firebase_uid: Optional[str] = None, email: Optional[str] = None, usuario_id: Optional[int] = None):
+    """Drop the cached identity of a user under all of its keys"""
+    keys = [key for key in (("uid", firebase_uid), ("email", email), ("usuario", usuario_id)) if key[1] is not None]
+    for key in keys:
+        identity = _identity_cache.pop(key)
+        if identity is not None:
+            for other in _cache_keys(identity):
+                _identity_cache.pop(other)
+
+
+def identity_dependency(user_dependency: Callable) -> Callable:
+    """
+    Build a FastAPI dependency resolving the Identity of the user returned by
+    `user_dependency`. FastAPI caches dependencies per request, so the identity
+    is resolved once per request even when several dependencies need it.
+    """
+    async def get_identity(request: Request, current_user: Any = Depends(user_dependency)) -> Identity:
+        return await resolve_identity(request.app.state.supabase, current_user)
+
+    return get_identity
+
+
+def identity_cache_stats():
+    return _identity_cache.stats()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Body, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Body, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
@@ -8,6 +8,9 @@ import firebase_admin
 from firebase_admin import auth
 
 from app.auth.sync import get_current_user, create_access_token, verify_password, get_password_hash
+from app.auth.tokens import forget_token
+from app.auth.identity import invalidate_identity
+from app.executor import run_blocking, run_query
 
 # Router setup
 auth_routes = APIRouter(
@@ -51,7 +54,7 @@ async def register_user(user_data: UserRegister, request: Request):
     try:
         # Check if user already exists
         supabase = request.app.state.supabase
-        existing_user = supabase.table("Usuario").select("id").eq("email", user_data.email).execute()
+        existing_user = await run_query(supabase.table("Usuario").select("id").eq("email", user_data.email))
         
         if existing_user.data and len(existing_user.data) > 0:
             raise HTTPException(status_code=400, detail="Email already registered")
@@ -68,12 +71,13 @@ async def register_user(user_data: UserRegister, request: Request):
             "birth_date": user_data.birthDate
         }
         
-        result = supabase.table("Usuario").insert(new_user).execute()
+        result = await run_query(supabase.table("Usuario").insert(new_user))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=500, detail="Failed to create user")
         
         user_id = result.data[0]["id"]
+        invalidate_identity(email=user_data.email, usuario_id=user_id)
         
         # Create access token
         access_token = create_access_token(data={"sub": user_id})
@@ -98,7 +102,7 @@ async def login_user(form_data: UserLogin, request: Request):
         supabase = request.app.state.supabase
         
         # Get user by email
-        user_query = supabase.table("Usuario").select("*").eq("email", form_data.email).execute()
+        user_query = await run_query(supabase.table("Usuario").select("*").eq("email", form_data.email))
         
         if not user_query.data or len(user_query.data) == 0:
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -141,8 +145,13 @@ async def login_user(form_data: UserLogin, request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @auth_routes.post("/logout")
-async def logout_user(current_user: Dict[str, Any] = Depends(get_current_user)):
+async def logout_user(
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    authorization: Optional[str] = Header(None)
+):
     """Logout user (client-side should clear tokens)"""
+    if authorization:
+        forget_token(authorization.replace("Bearer ", ""))
     return {"message": "Successfully logged out"}
 
 @auth_routes.post("/refresh-token", response_model=TokenResponse)
@@ -186,7 +195,7 @@ async def forgot_password(reset_request: PasswordResetRequest, request: Request)
         supabase = request.app.state.supabase
         
         # Check if user exists
-        user_query = supabase.table("Usuario").select("id").eq("email", reset_request.email).execute()
+        user_query = await run_query(supabase.table("Usuario").select("id").eq("email", reset_request.email))
         
         if not user_query.data or len(user_query.data) == 0:
             # Return success even if user doesn't exist (security best practice)
@@ -247,7 +256,7 @@ async def firebase_login(id_token: str = Body(..., embed=True), request: Request
     try:
         # Verify the token
         from firebase_admin import auth
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = await run_blocking(auth.verify_id_token, id_token)
         user_id = decoded_token["uid"]
         
         # Check if user exists in our database
@@ -255,18 +264,18 @@ async def firebase_login(id_token: str = Body(..., embed=True), request: Request
         
         if supabase:
             # Get user from database
-            user_query = supabase.table("Usuario").select("*").eq("firebase_uid", user_id).execute()
+            user_query = await run_query(supabase.table("Usuario").select("*").eq("firebase_uid", user_id))
             
             if not user_query.data or len(user_query.data) == 0:
                 # If user doesn't exist in our DB but exists in Firebase,
                 # we should sync them to our DB
-                firebase_user = auth.get_user(user_id)
+                firebase_user = await run_blocking(auth.get_user, user_id)
                 
                 if hasattr(request.app.state, "user_synchronizer"):
                     await request.app.state.user_synchronizer.create_user_in_supabase(firebase_user)
                     
                     # Get the newly created user
-                    user_query = supabase.table("Usuario").select("*").eq("firebase_uid", user_id).execute()
+                    user_query = await run_query(supabase.table("Usuario").select("*").eq("firebase_uid", user_id))
             
             if user_query.data and len(user_query.data) > 0:
                 user_data = user_query.data[0]
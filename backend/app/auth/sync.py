@@ -10,6 +10,9 @@ from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 import jwt
 from passlib.context import CryptContext
+from app.auth.identity import invalidate_identity
+from app.auth.tokens import verify_token
+from app.executor import run_blocking, run_client_call, run_query
 
 logger = logging.getLogger(__name__)
 
@@ -50,7 +53,7 @@ class UserSynchronizer:
                 
                 # Step 4: Assign 'authenticated' role to Firebase user
                 try:
-                    auth.set_custom_user_claims(firebase_user.uid, {'role': 'authenticated'})
+                    await run_blocking(auth.set_custom_user_claims, firebase_user.uid, {'role': 'authenticated'})
                     #logger.info(f"Added 'authenticated' role to Firebase user {firebase_user.uid}")
                 except Exception as e:
                     logger.error(f"Failed to set custom claim for user {firebase_user.uid}: {str(e)}")
@@ -83,7 +86,8 @@ class UserSynchronizer:
             
             # Update the user
             try:
-                response = self.supabase.table("Usuario").update(user_data).eq("firebase_uid", firebase_user.uid).execute()
+                response = await run_query(self.supabase.table("Usuario").update(user_data).eq("firebase_uid", firebase_user.uid))
+                invalidate_identity(firebase_uid=firebase_user.uid, email=existing_user.get("email"))
                 #logger.info(f"Updated user {firebase_user.email} in Supabase")
                 return response.data[0] if response.data and len(response.data) > 0 else None
             except Exception as e:
@@ -100,16 +104,17 @@ class UserSynchronizer:
         """
         try:
             # Delete from Usuario table first (this will cascade to profiles)
-            response = self.supabase.table("Usuario").delete().eq("firebase_uid", firebase_uid).execute()
+            response = await run_query(self.supabase.table("Usuario").delete().eq("firebase_uid", firebase_uid))
+            invalidate_identity(firebase_uid=firebase_uid)
             
             # Try to delete from Supabase Auth if possible
             try:
                 # Get user from Supabase Auth by firebase_uid
-                users = self.supabase.auth.admin.list_users()
+                users = await run_client_call(self.supabase.auth.admin.list_users)
                 for user in users.users:
                     # Check user metadata for firebase_uid
                     if user.app_metadata and user.app_metadata.get('firebase_uid') == firebase_uid:
-                        self.supabase.auth.admin.delete_user(user.id)
+                        await run_client_call(self.supabase.auth.admin.delete_user, user.id)
                         #logger.info(f"Deleted user with firebase_uid {firebase_uid} from Supabase Auth")
                         break
             except Exception as auth_e:
@@ -124,7 +129,7 @@ class UserSynchronizer:
     async def _check_existing_user(self, firebase_uid: str):
         """Check if user already exists in Usuario table by Firebase UID"""
         try:
-            response = self.supabase.table("Usuario").select("*").eq("firebase_uid", firebase_uid).execute()
+            response = await run_query(self.supabase.table("Usuario").select("*").eq("firebase_uid", firebase_uid))
             return response.data[0] if response.data and len(response.data) > 0 else None
         except Exception as e:
             logger.error(f"Error checking existing user: {str(e)}")
@@ -134,7 +139,7 @@ class UserSynchronizer:
         """Get user from Supabase Auth by email"""
         try:
             # Use the admin.list_users() method to find user by email
-            response = self.supabase.auth.admin.list_users()
+            response = await run_client_call(self.supabase.auth.admin.list_users)
             if not hasattr(response, 'users'):
                 logger.error("Unexpected response format from auth.admin.list_users()")
                 return None
@@ -185,7 +190,7 @@ class UserSynchronizer:
                 }
             }
             
-            response = self.supabase.auth.admin.create_user(user_data)
+            response = await run_client_call(self.supabase.auth.admin.create_user, user_data)
             #logger.info(f"Created user {firebase_user.email} in Supabase Auth")
             return response.user
         except Exception as e:
@@ -211,7 +216,7 @@ class UserSynchronizer:
                 user_data["supabase_uid"] = supabase_auth_user.id
             
             # Insert the user
-            response = self.supabase.table("Usuario").insert(user_data).execute()
+            response = await run_query(self.supabase.table("Usuario").insert(user_data))
             
             if not response.data or len(response.data) == 0:
                 logger.error("Failed to create user record: No data returned")
@@ -226,7 +231,9 @@ class UserSynchronizer:
                 "descricao": f"Profile for {user_data['nome']}"
             }
             
-            profile_response = self.supabase.table("Perfil").insert(profile_data).execute()
+            profile_response = await run_query(self.supabase.table("Perfil").insert(profile_data))
+            # A lookup made before the profile existed may have cached perfil_id=None
+            invalidate_identity(firebase_uid=firebase_user.uid, email=firebase_user.email, usuario_id=user_id)
             #logger.info(f"Created profile for user {firebase_user.email}")
             
             return response.data[0]
@@ -297,62 +304,8 @@ async def get_current_user(
         )
     
     token = authorization.replace("Bearer ", "")
-    logger.info(f"Attempting to verify token: {token[:10]}...")
-    
-    # First try to validate as a Firebase token
-    try:
-        from firebase_admin import auth
-        user = auth.verify_id_token(token)
-        logger.info(f"Successfully authenticated user with Firebase: {user.get('uid')}")
-        return user
-    except Exception as firebase_error:
-        # If Firebase validation fails, try as a JWT token
-        try:
-            # JWT token validation
-            # Use the same secret key as in create_access_token
-            SECRET_KEY = "your-secret-key"  # For development only
-            ALGORITHM = "HS256"
-            
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-            
-            if not user_id:
-                raise jwt.InvalidTokenError("Token missing 'sub' claim")
-                
-            # If using Supabase, get the user from the database
-            if request and hasattr(request.app.state, "supabase"):
-                supabase = request.app.state.supabase
-                user_result = supabase.table("Usuario").select("*").eq("id", user_id).execute()
-                
-                if not user_result.data or len(user_result.data) == 0:
-                    raise HTTPException(status_code=404, detail="User not found")
-                    
-                user_data = user_result.data[0]
-                
-                # Return in a format similar to Firebase user
-                return {
-                    "uid": str(user_data["id"]),
-                    "email": user_data["email"],
-                    "name": user_data["nome"],
-                    "auth_time": int(datetime.now().timestamp()),
-                    "user_id": str(user_data["id"])
-                }
-            else:
-                # Minimal user data if no database connection
-                return {
-                    "uid": str(user_id),
-                    "user_id": str(user_id),
-                    "auth_time": int(datetime.now().timestamp())
-                }
-                
-        except (jwt.PyJWTError, HTTPException) as jwt_error:
-            # If both validations fail, log the errors and raise exception
-            error_msg = f"Firebase error: {str(firebase_error)}. JWT error: {str(jwt_error)}"
-            logger.error(f"Authentication failed: {error_msg}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Invalid authentication token: {error_msg}"
-            )
+    supabase = getattr(request.app.state, "supabase", None)
+    return await verify_token(token, supabase)
 
 def create_access_token(data: dict, expires_delta=None):
     """
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import jwt
+from fastapi import HTTPException, status
+
+from app.cache import TTLCache
+from app.config import get_settings
+from app.executor import run_blocking, run_query
+
+logger = logging.getLogger(__name__)
+
+# Must match the key used by app.auth.sync.create_access_token
+SECRET_KEY = "your-secret-key"  # For development only
+ALGORITHM = "HS256"
+
+FIREBASE = "firebase"
+JWT = "jwt"
+
+_settings = get_settings().cache
+_token_cache = TTLCache(maxsize=_settings.token_size, ttl=_settings.token_ttl)
+
+
+class _VerificationStats:
+    """Latency and outcome counters of upstream token verifications"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.verifications = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self.verifications += 1
+            if not ok:
+                self.failures += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "verifications": self.verifications,
+                "failures": self.failures,
+                "avg_ms": round(self.total_seconds / self.verifications * 1000, 3) if self.verifications else 0.0,
+                "max_ms": round(self.max_seconds * 1000, 3),
+            }
+
+
+_verification_stats = _VerificationStats()
+
+
+def _digest(token: str) -> str:
+    # Only digests are kept in memory, never the bearer tokens themselves
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _ttl_for(claims: Dict[str, Any]) -> float:
+    """Cache lifetime of a verified token: never past its `exp`"""
+    exp = claims.get("exp")
+    if exp is None:
+        return _token_cache.ttl
+    return min(_token_cache.ttl, float(exp) - time.time())
+
+
+async def _decode_jwt(token: str, supabase=None) -> Dict[str, Any]:
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    user_id = payload.get("sub")
+
+    if not user_id:
+        raise jwt.InvalidTokenError("Token missing 'sub' claim")
+
+    if supabase is None:
+        # Minimal user data if no database connection
+        return {
+            "uid": str(user_id),
+            "user_id": str(user_id),
+            "auth_time": int(datetime.now().timestamp()),
+            "exp": payload.get("exp"),
+        }
+
+    user_result = await run_query(supabase.table("Usuario").select("*").eq("id", user_id))
+    if not user_result.data:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user_data = user_result.data[0]
+    # Return in a format similar to Firebase user
+    return {
+        "uid": str(user_data["id"]),
+        "email": user_data["email"],
+        "name": user_data["nome"],
+        "auth_time": int(datetime.now().timestamp()),
+        "user_id": str(user_data["id"]),
+        "exp": payload.get("exp"),
+    }
+
+
+async def _verify_uncached(token: str, supabase, allow_jwt: bool):
+    from firebase_admin import auth
+    try:
+        return await run_blocking(auth.verify_id_token, token), FIREBASE
+    except Exception as firebase_error:
+        if not allow_jwt:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication token"
+            )
+        # If Firebase validation fails, try as a JWT token
+        try:
+            return await _decode_jwt(token, supabase), JWT
+        except (jwt.PyJWTError, HTTPException) as jwt_error:
+            error_msg = f"Firebase error: {str(firebase_error)}. JWT error: {str(jwt_error)}"
+            logger.error(f"Authentication failed: {error_msg}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Invalid authentication token: {error_msg}"
+            )
+
+
+async def verify_token(token: str, supabase=None, allow_jwt: bool = True) -> Dict[str, Any]:
+    """
+    Verify a Firebase ID token, falling back to the app's own JWT tokens.
+
+    Verified Firebase claims are cached by token digest until the token's
+    `exp` (capped by CACHE_TOKEN_TTL), so repeated requests and WebSocket
+    handshakes carrying the same token skip the verification. Failed
+    verifications and JWT tokens are not cached: a JWT is only valid while its
+    Usuario exists, which is checked on every request.
+
+    Args:
+        token: The bearer token, without the "Bearer " prefix
+        supabase: Client used to load the Usuario of JWT tokens (optional)
+        allow_jwt: Whether to accept JWT tokens when Firebase rejects the token
+
+    Raises:
+        HTTPException: 401 if the token cannot be verified.
+    """
+    key = _digest(token)
+    cached = _token_cache.get(key)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    try:
+        claims, source = await _verify_uncached(token, supabase, allow_jwt)
+    except HTTPException:
+        _verification_stats.record(time.perf_counter() - started, ok=False)
+        raise
+    _verification_stats.record(time.perf_counter() - started, ok=True)
+
+    ttl = _ttl_for(claims)
+    if source == FIREBASE and ttl > 0:
+        _token_cache.set(key, claims, ttl=ttl)
+    return claims
+
+
+def forget_token(token: str):
+    """Drop a token from the cache, e.g. on logout"""
+    _token_cache.pop(_digest(token))
+
+
+def token_cache_stats() -> Dict[str, Any]:
+    return {
+        "cache": _token_cache.stats(),
+        "verification": _verification_stats.stats(),
+    }
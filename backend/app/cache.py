@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Union
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache with LRU eviction and per-entry time-to-live.
+
+    Concurrent misses for the same key can be coalesced through
+    `get_or_load`, so only one loader call is in flight per key.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > self._clock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if absent or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the least recently used entries if full"""
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key from the cache and return its value"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Union[float, Callable[[Any], float], None] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, calling loader on a miss.
+
+        While a load is in flight, other callers asking for the same key wait
+        for it instead of starting their own. The load runs in its own task, so
+        a cancelled caller does not fail the others. Exceptions are propagated
+        to all waiters and are not cached. `ttl` may be a callable receiving the loaded
+        value, which allows e.g. shorter lifetimes for negative results.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        else:
+            pending = self._load(key, loader, ttl)
+        # A caller going away does not cancel the load the others are waiting for
+        return await asyncio.shield(pending)
+
+    def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl) -> asyncio.Task:
+        async def load():
+            value = await loader()
+            self.set(key, value, ttl(value) if callable(ttl) else ttl)
+            return value
+
+        task = asyncio.create_task(load())
+        self._pending[key] = task
+
+        def done(task: asyncio.Task):
+            if self._pending.get(key) is task:
+                del self._pending[key]
+            if not task.cancelled():
+                # Retrieved here in case every caller was cancelled
+                task.exception()
+
+        task.add_done_callback(done)
+        return task
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
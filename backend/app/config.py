@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,8 +11,113 @@ class FastAPISettings(BaseSettings):
     log_level: str = "info"
     reload: bool = True
 
+class TMDBSettings(BaseSettings):
+    url: str = "https://api.themoviedb.org/3"
+    bearer_token: Optional[str] = None
+    timeout: float = 10.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    cache_size: int = 2048
+    cache_ttl: float = 6 * 60 * 60
+    negative_cache_ttl: float = 10 * 60
+    # Client-side rate limit for bulk jobs (TMDB allows ~50 requests/s per IP)
+    rate_limit: float = 40.0
+    rate_burst: int = 20
+
+    class Config:
+        env_prefix = "TMDB_"
+
+class SupabaseSettings(BaseSettings):
+    url: Optional[str] = None
+    key: Optional[str] = None  # anon key for public operations
+    service_key: Optional[str] = None  # service_role key for admin operations
+    http2: bool = True
+    timeout: float = 10.0
+    connect_timeout: float = 5.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+
+    class Config:
+        env_prefix = "SUPABASE_"
+
+class CacheSettings(BaseSettings):
+    movie_count_ttl: float = 30.0
+    identity_ttl: float = 5 * 60
+    identity_size: int = 10000
+    token_ttl: float = 10 * 60  # upper bound, tokens are never cached past their exp
+    token_size: int = 10000
+    roster_ttl: float = 60.0
+    roster_size: int = 10000
+    forum_id_ttl: float = 24 * 60 * 60  # a movie's forum never changes once created
+    forum_id_size: int = 50000
+
+    class Config:
+        env_prefix = "CACHE_"
+
+class ChatSettings(BaseSettings):
+    # Frames buffered per socket before the client is evicted as a slow consumer
+    send_queue_size: int = 256
+    send_timeout: float = 10.0
+    # Quiet sockets are pinged every `heartbeat_interval` seconds and closed after `idle_timeout`
+    heartbeat_interval: float = 25.0
+    idle_timeout: float = 90.0
+    # Catch-up replay: recent messages kept per group, and the most replayed on reconnect
+    history_size: int = 200
+    history_groups: int = 10000
+    replay_limit: int = 200
+    # Presence diffs are coalesced and broadcast every `presence_interval` seconds
+    presence_interval: float = 0.3
+    typing_ttl: float = 5.0
+    # Offer permessage-deflate to chat sockets (negotiated per connection by the server)
+    per_message_deflate: bool = True
+    # Groups a single multiplexed socket may subscribe to
+    max_subscriptions: int = 500
+    # "memory" for a single worker, "redis" to fan out across workers
+    backplane: str = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    channel_prefix: str = "chat:"
+    # Write-behind persistence: flush every `write_interval` seconds or `write_batch_size` messages
+    write_interval: float = 0.005
+    write_batch_size: int = 100
+    write_queue_size: int = 10000
+    write_retries: int = 3
+
+    class Config:
+        env_prefix = "CHAT_"
+
+class ForumSettings(BaseSettings):
+    # Likes are coalesced per comment and written every like_flush_interval seconds
+    like_flush_interval: float = 1.0
+    like_flush_size: int = 1000
+    # Threaded listings: reply levels, replies per comment and comments per response
+    thread_depth: int = 3
+    thread_replies: int = 3
+    thread_size: int = 200
+    # Comment page cache: fresh for page_ttl, served while revalidating up to page_stale_ttl
+    page_ttl: float = 5.0
+    page_stale_ttl: float = 60.0
+    page_forums: int = 1000
+    page_pages: int = 32
+
+    class Config:
+        env_prefix = "FORUM_"
+
+class ExecutorSettings(BaseSettings):
+    # Threads available to blocking Firebase Admin / Supabase calls
+    max_workers: int = 32
+
+    class Config:
+        env_prefix = "EXECUTOR_"
+
 class Settings(BaseSettings):
     fastapi: FastAPISettings = Field(default_factory=FastAPISettings)
+    tmdb: TMDBSettings = Field(default_factory=TMDBSettings)
+    supabase: SupabaseSettings = Field(default_factory=SupabaseSettings)
+    cache: CacheSettings = Field(default_factory=CacheSettings)
+    executor: ExecutorSettings = Field(default_factory=ExecutorSettings)
+    chat: ChatSettings = Field(default_factory=ChatSettings)
+    forum: ForumSettings = Field(default_factory=ForumSettings)
     
     class Config:
         env_nested_delimiter = "__"
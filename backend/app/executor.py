@@ -0,0 +1,66 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared pool for blocking calls, creating it on first use"""
+    global _executor
+    if _executor is None:
+        settings = get_settings().executor
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.max_workers,
+            thread_name_prefix="blocking-io",
+        )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking function (Firebase Admin SDK, sync Supabase client) on the
+    shared bounded thread pool so it does not stall the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def run_client_call(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Call a Supabase client method that may be sync or async depending on the
+    client in use: coroutine functions are awaited directly, anything else is
+    run on the shared thread pool.
+    """
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_blocking(func, *args, **kwargs)
+
+
+async def run_query(query) -> Any:
+    """Execute a Supabase/PostgREST query builder without blocking the loop"""
+    return await run_client_call(query.execute)
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    """Shut the pool down; called from the application lifespan"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=not wait)
+        _executor = None
+
+
+def executor_stats() -> Dict[str, Any]:
+    if _executor is None:
+        return {"max_workers": get_settings().executor.max_workers, "threads": 0, "queued": 0}
+    return {
+        "max_workers": _executor._max_workers,
+        "threads": len(_executor._threads),
+        "queued": _executor._work_queue.qsize(),
+    }
@@ -1,8 +1,6 @@
 import firebase_admin
 from contextlib import asynccontextmanager
 from pathlib import Path
-import os
-from supabase import create_client, Client
 import logging
 
 from fastapi import APIRouter, FastAPI
@@ -15,13 +13,23 @@ from firebase_admin import credentials, auth
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 
+from app.config import get_settings
+from app.supabase_client import create_http_client, create_supabase_client
+from app.executor import executor_stats, run_blocking, shutdown_executor
 from app.v1.movies.routes import movies_routes
+from app.v1.movies.tmdb_client import TMDBClient
 from app.v1.user.routes import user_routes
 from app.v1.forum.routes import forum_routes
+from app.v1.forum.helper import forum_cache_stats
+from app.v1.forum.likes import like_aggregator
+from app.v1.forum.pages import comment_pages
 from app.v1.movielist.routes import movielist_routes
-from app.v1.chat.routes import chat_routes
+from app.v1.chat.routes import chat_routes, manager as chat_manager, writer as chat_writer
+from app.v1.chat.roster import roster_cache_stats
 from app.auth import setup_firebase_auth_hooks
 from app.auth.routes import auth_routes
+from app.auth.identity import identity_cache_stats
+from app.auth.tokens import token_cache_stats
 from app.v1.communities.routes import communities_routes
 from app.v1.profile.routes import profile_routes
 from app.v1.social.routes import social_routes
@@ -39,17 +47,29 @@ logger = logging.getLogger(__name__)
 
 health = APIRouter(tags=["health"], responses={404: {"description": "Not found"}})
 
-# Supabase configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")  # anon key for public operations
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")  # service_role key for admin operations
-
-
 @health.get("/health")
 async def health_check():
     return JSONResponse(True, status_code=200)
 
 
+@health.get("/health/metrics")
+async def metrics(request: Request):
+    """Runtime counters of the shared clients and caches owned by the app"""
+    state = request.app.state
+    return {
+        "tmdb": state.tmdb.stats() if hasattr(state, "tmdb") else None,
+        "identity": identity_cache_stats(),
+        "tokens": token_cache_stats(),
+        "executor": executor_stats(),
+        "chat": chat_manager.stats(),
+        "chat_writer": chat_writer.stats(),
+        "chat_roster": roster_cache_stats(),
+        "forum_ids": forum_cache_stats(),
+        "forum_likes": like_aggregator.stats(),
+        "forum_pages": comment_pages.stats(),
+    }
+
+
 def error_handler(request: Request, exc: Exception):
     return JSONResponse(
         {"message": str(exc)},
@@ -66,12 +86,24 @@ async def lifespan(app: FastAPI):
         cred = credentials.Certificate(cred_path)
         firebase_admin.initialize_app(cred)
 
-    # Initialize Supabase client - use service role key for admin operations if available
-    supabase_key = SUPABASE_SERVICE_KEY if SUPABASE_SERVICE_KEY else SUPABASE_KEY
-    app.state.supabase = create_client(SUPABASE_URL, supabase_key)
+    settings = get_settings()
+
+    # Async Supabase client over a pooled HTTP/2 connection
+    app.state.supabase_http = create_http_client(settings.supabase)
+    app.state.supabase = await create_supabase_client(settings.supabase, app.state.supabase_http)
+
+    # Shared keep-alive TMDB client with movie cache
+    app.state.tmdb = TMDBClient(settings.tmdb)
     
     # Initialize Firebase-Supabase user synchronization
     app.state.user_synchronizer = setup_firebase_auth_hooks(app.state.supabase)
+
+    # Chat fan-out between workers
+    await chat_manager.start()
+    await chat_writer.start(app.state.supabase)
+
+    # Coalesced comment likes
+    await like_aggregator.start(app.state.supabase)
     
     # Sync existing Firebase users with Supabase
     try:
@@ -83,14 +115,21 @@ async def lifespan(app: FastAPI):
     
     yield
 
-    # No need to close Supabase client
+    await chat_manager.close_all()
+    # Flush buffered chat messages before the clients go away
+    await chat_writer.close()
+    await comment_pages.close()
+    await like_aggregator.close()
+    await app.state.tmdb.aclose()
+    await app.state.supabase_http.aclose()
+    shutdown_executor()
 
 
 async def sync_existing_users(synchronizer):
     """Synchronize existing Firebase users with Supabase"""
     try:
         # Get all Firebase users
-        page = auth.list_users()
+        page = await run_blocking(auth.list_users)
         count = 0
         sync_count = 0
         
@@ -101,7 +140,7 @@ async def sync_existing_users(synchronizer):
                     # Check if user has 'authenticated' role
                     if not user.custom_claims or not user.custom_claims.get('role') == 'authenticated':
                         # Set the authenticated role for proper Supabase integration
-                        auth.set_custom_user_claims(user.uid, {'role': 'authenticated'})
+                        await run_blocking(auth.set_custom_user_claims, user.uid, {'role': 'authenticated'})
                         #logger.info(f"Added 'authenticated' role to Firebase user {user.uid}")
                     
                     # Synchronize with Supabase
@@ -112,7 +151,7 @@ async def sync_existing_users(synchronizer):
                     logger.error(f"Error synchronizing user {user.uid}: {str(user_e)}")
             
             # Get next page of users
-            page = page.get_next_page()
+            page = await run_blocking(page.get_next_page)
         
         #logger.info(f"Synchronized {sync_count} out of {count} Firebase users with Supabase")
     except Exception as e:
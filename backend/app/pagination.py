@@ -0,0 +1,34 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Encode the keyset position of the last returned row as an opaque cursor"""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[str]) -> Dict[str, Any]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed or does not contain all keys.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Cursor inválido")
+    if not isinstance(values, dict) or any(key not in values for key in keys):
+        raise ValueError("Cursor inválido")
+    return values
+
+
+def next_cursor(rows: List[Dict[str, Any]], limit: int, keys: Sequence[str]) -> Optional[str]:
+    """Return the cursor following rows, or None when the page was not full"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor({key: last[key] for key in keys})
@@ -0,0 +1,58 @@
+-- Unread counters and last-read markers, kept on group_members
+ALTER TABLE group_members ADD COLUMN IF NOT EXISTS unread_count integer NOT NULL DEFAULT 0;
+ALTER TABLE group_members ADD COLUMN IF NOT EXISTS last_read_message_id text;
+ALTER TABLE group_members ADD COLUMN IF NOT EXISTS last_read_at timestamp;
+
+CREATE INDEX IF NOT EXISTS messages_group_id_created_at_idx ON messages (group_id, created_at);
+
+-- Add a batch of persisted messages to the counters of every other member.
+-- p_counts: [{"group_id": ..., "sender_id": ..., "count": ...}, ...]
+CREATE OR REPLACE FUNCTION chat_increment_unread(p_counts jsonb)
+RETURNS void AS $$
+    WITH counts AS (
+        SELECT c.group_id, c.sender_id, c.count
+        FROM jsonb_to_recordset(p_counts) AS c(group_id text, sender_id text, count integer)
+    ), totals AS (
+        SELECT group_id, sum(count) AS total
+        FROM counts
+        GROUP BY group_id
+    )
+    UPDATE group_members gm
+    SET unread_count = gm.unread_count + t.total - coalesce((
+        SELECT c.count FROM counts c WHERE c.group_id = gm.group_id AND c.sender_id = gm.user_id
+    ), 0)
+    FROM totals t
+    WHERE gm.group_id = t.group_id;
+$$ LANGUAGE sql;
+
+-- Move a member's read marker to p_message_id (the latest message when null)
+-- and recount what is left after it, which only touches the unread tail.
+CREATE OR REPLACE FUNCTION chat_mark_read(p_group_id text, p_user_id text, p_message_id text DEFAULT NULL)
+RETURNS SETOF group_members AS $$
+DECLARE
+    marker messages%ROWTYPE;
+BEGIN
+    IF p_message_id IS NULL THEN
+        SELECT * INTO marker FROM messages
+        WHERE group_id = p_group_id
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1;
+    ELSE
+        SELECT * INTO marker FROM messages
+        WHERE group_id = p_group_id AND id = p_message_id;
+    END IF;
+
+    RETURN QUERY
+    UPDATE group_members gm
+    SET last_read_message_id = marker.id,
+        last_read_at = marker.created_at,
+        unread_count = (
+            SELECT count(*) FROM messages m
+            WHERE m.group_id = p_group_id
+              AND m.sender_id <> p_user_id
+              AND (marker.id IS NULL OR (m.created_at, m.id) > (marker.created_at, marker.id))
+        )
+    WHERE gm.group_id = p_group_id AND gm.user_id = p_user_id
+    RETURNING gm.*;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,62 @@
+-- Validate and insert a forum comment in one round trip.
+--
+-- The author is looked up by the first key given (Usuario id, Firebase uid or
+-- email); p_perfil_id defaults to the author's first profile and otherwise
+-- must belong to them. The movie's forum is created on first use and
+-- p_respondendo_id, when given, must exist. Errors are raised with PostgREST
+-- SQLSTATEs (PT403/PT404) so the API answers with that HTTP status.
+CREATE OR REPLACE FUNCTION forum_create_comment(
+    p_filme_id integer,
+    p_mensagem text,
+    p_usuario_id integer DEFAULT NULL,
+    p_firebase_uid text DEFAULT NULL,
+    p_email text DEFAULT NULL,
+    p_perfil_id integer DEFAULT NULL,
+    p_respondendo_id integer DEFAULT NULL
+)
+RETURNS SETOF "Comentario" AS $$
+DECLARE
+    v_usuario_id integer;
+    v_perfil_id integer := p_perfil_id;
+    v_forum_id integer;
+BEGIN
+    IF p_usuario_id IS NOT NULL THEN
+        SELECT id INTO v_usuario_id FROM "Usuario" WHERE id = p_usuario_id;
+    END IF;
+    IF v_usuario_id IS NULL AND p_firebase_uid IS NOT NULL THEN
+        SELECT id INTO v_usuario_id FROM "Usuario" WHERE firebase_uid = p_firebase_uid LIMIT 1;
+    END IF;
+    IF v_usuario_id IS NULL AND p_email IS NOT NULL THEN
+        SELECT id INTO v_usuario_id FROM "Usuario" WHERE email = p_email LIMIT 1;
+    END IF;
+    IF v_usuario_id IS NULL THEN
+        RAISE SQLSTATE 'PT403' USING MESSAGE = 'Usuário não encontrado no sistema';
+    END IF;
+
+    IF v_perfil_id IS NULL THEN
+        SELECT id INTO v_perfil_id FROM "Perfil" WHERE usuario_id = v_usuario_id ORDER BY id LIMIT 1;
+        IF v_perfil_id IS NULL THEN
+            RAISE SQLSTATE 'PT404' USING MESSAGE = 'Nenhum perfil encontrado para o usuário';
+        END IF;
+    ELSIF NOT EXISTS (SELECT 1 FROM "Perfil" WHERE id = v_perfil_id AND usuario_id = v_usuario_id) THEN
+        RAISE SQLSTATE 'PT403' USING MESSAGE = 'Perfil não encontrado ou não pertence ao usuário';
+    END IF;
+
+    IF p_respondendo_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM "Comentario" WHERE id = p_respondendo_id) THEN
+        RAISE SQLSTATE 'PT404' USING MESSAGE = 'Comentário para responder não encontrado';
+    END IF;
+
+    SELECT id INTO v_forum_id FROM "Forum" WHERE filme_id = p_filme_id;
+    IF v_forum_id IS NULL THEN
+        -- Relies on the unique filme_id from forum_unique_filme.sql
+        INSERT INTO "Forum" (filme_id) VALUES (p_filme_id)
+        ON CONFLICT (filme_id) DO UPDATE SET filme_id = EXCLUDED.filme_id
+        RETURNING id INTO v_forum_id;
+    END IF;
+
+    RETURN QUERY
+    INSERT INTO "Comentario" (mensagem, likes, usuario_id, forum_id, perfil_id, respondendo_id)
+    VALUES (p_mensagem, 0, v_usuario_id, v_forum_id, v_perfil_id, p_respondendo_id)
+    RETURNING *;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,16 @@
+-- Apply a batch of like deltas in one statement; the increment happens in the
+-- database, so concurrent batches (or workers) never overwrite each other.
+-- p_deltas: [{"id": ..., "delta": ...}, ...]
+CREATE OR REPLACE FUNCTION forum_increment_likes(p_deltas jsonb)
+RETURNS SETOF "Comentario" AS $$
+    WITH deltas AS (
+        SELECT d.id, sum(d.delta) AS delta
+        FROM jsonb_to_recordset(p_deltas) AS d(id integer, delta integer)
+        GROUP BY d.id
+    )
+    UPDATE "Comentario" c
+    SET likes = coalesce(c.likes, 0) + deltas.delta
+    FROM deltas
+    WHERE c.id = deltas.id
+    RETURNING c.*;
+$$ LANGUAGE sql;
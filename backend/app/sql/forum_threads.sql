@@ -0,0 +1,56 @@
+-- Reply subtrees of a page of comments, for threaded forum listings
+CREATE INDEX IF NOT EXISTS comentario_respondendo_id_id_idx ON "Comentario" (respondendo_id, id);
+CREATE INDEX IF NOT EXISTS comentario_forum_id_top_level_idx ON "Comentario" (forum_id, id) WHERE respondendo_id IS NULL;
+
+-- Walk the replies of p_parent_ids breadth first, one level per query: at most
+-- p_per_parent replies per comment (after p_after for the direct replies),
+-- p_max_depth levels and p_max_total rows. Each row carries its depth and its
+-- number of direct replies, so the caller knows which subtrees were cut.
+-- The parents themselves come back first as depth 0 rows with only their id.
+CREATE OR REPLACE FUNCTION forum_comment_replies(
+    p_parent_ids integer[],
+    p_max_depth integer,
+    p_per_parent integer,
+    p_max_total integer,
+    p_after integer DEFAULT NULL
+)
+RETURNS TABLE (depth integer, reply_count integer, comment jsonb) AS $$
+DECLARE
+    frontier integer[] := p_parent_ids;
+    current_depth integer := 1;
+    total integer := 0;
+    ids integer[];
+BEGIN
+    RETURN QUERY
+    SELECT 0, (SELECT count(*)::integer FROM "Comentario" r WHERE r.respondendo_id = p.id), jsonb_build_object('id', p.id)
+    FROM unnest(p_parent_ids) AS p(id);
+
+    WHILE current_depth <= p_max_depth AND total < p_max_total AND coalesce(cardinality(frontier), 0) > 0 LOOP
+        SELECT array_agg(page.id ORDER BY page.id) INTO ids
+        FROM (
+            SELECT ranked.id
+            FROM (
+                SELECT c.id, row_number() OVER (PARTITION BY c.respondendo_id ORDER BY c.id) AS position
+                FROM "Comentario" c
+                WHERE c.respondendo_id = ANY(frontier)
+                  AND (current_depth > 1 OR p_after IS NULL OR c.id > p_after)
+            ) ranked
+            WHERE ranked.position <= p_per_parent
+            ORDER BY ranked.position, ranked.id
+            LIMIT p_max_total - total
+        ) page;
+
+        EXIT WHEN ids IS NULL;
+
+        RETURN QUERY
+        SELECT current_depth, (SELECT count(*)::integer FROM "Comentario" r WHERE r.respondendo_id = c.id), to_jsonb(c)
+        FROM "Comentario" c
+        WHERE c.id = ANY(ids)
+        ORDER BY c.id;
+
+        total := total + cardinality(ids);
+        frontier := ids;
+        current_depth := current_depth + 1;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,24 @@
+-- One forum per movie, which lets get_or_create_forum upsert on filme_id.
+-- Forums duplicated by concurrent first comments are merged into the oldest
+-- one before the unique index is created.
+WITH ranked AS (
+    SELECT id, min(id) OVER (PARTITION BY filme_id) AS keep_id
+    FROM "Forum"
+), moved_comments AS (
+    UPDATE "Comentario" c
+    SET forum_id = ranked.keep_id
+    FROM ranked
+    WHERE c.forum_id = ranked.id AND ranked.id <> ranked.keep_id
+), moved_posts AS (
+    UPDATE "Post" p
+    SET forum_id = ranked.keep_id
+    FROM ranked
+    WHERE p.forum_id = ranked.id AND ranked.id <> ranked.keep_id
+)
+SELECT 1;
+
+DELETE FROM "Forum" f
+USING "Forum" older
+WHERE f.filme_id = older.filme_id AND f.id > older.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS "Forum_filme_id_key" ON "Forum"("filme_id");
@@ -0,0 +1,44 @@
+import logging
+from typing import Optional
+
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+
+from app.config import SupabaseSettings
+
+logger = logging.getLogger(__name__)
+
+
+def create_http_client(
+    settings: SupabaseSettings, transport: Optional[httpx.AsyncBaseTransport] = None
+) -> httpx.AsyncClient:
+    """
+    Build the pooled HTTP client shared by the PostgREST, Auth and Storage
+    clients. With HTTP/2 enabled concurrent requests are multiplexed over a few
+    keep-alive connections instead of opening one connection per request.
+    """
+    return httpx.AsyncClient(
+        http2=settings.http2,
+        follow_redirects=True,
+        timeout=httpx.Timeout(settings.timeout, connect=settings.connect_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        transport=transport,
+    )
+
+
+async def create_supabase_client(settings: SupabaseSettings, http_client: httpx.AsyncClient) -> AsyncClient:
+    """Create the app's async Supabase client on top of `http_client`"""
+    # Use the service role key for admin operations if available
+    key = settings.service_key or settings.key
+    options = AsyncClientOptions(
+        httpx_client=http_client,
+        postgrest_client_timeout=settings.timeout,
+        # Server-side client: no user session to refresh or persist
+        auto_refresh_token=False,
+        persist_session=False,
+    )
+    return await acreate_client(settings.url, key, options)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from app.config import ChatSettings
+
+logger = logging.getLogger(__name__)
+
+# Called with (group_id, frame) for every message published to a subscribed group
+DeliverCallback = Callable[[str, str], Awaitable[None]]
+
+
+class Backplane:
+    """
+    Pub/sub channel between the workers serving chat sockets.
+
+    `ConnectionManager` publishes each broadcast once; the backplane hands it
+    back to the manager of every worker subscribed to the group, which then
+    delivers it to its local sockets.
+    """
+
+    # Whether every published message reaches `deliver`, subscribed or not
+    delivers_all = False
+
+    def __init__(self):
+        self._deliver: Optional[DeliverCallback] = None
+        self.published = 0
+        self.delivered = 0
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+
+    async def subscribe(self, group_id: str):
+        """Start receiving messages of a group hosted by this worker"""
+
+    async def unsubscribe(self, group_id: str):
+        """Stop receiving messages of a group with no local sockets left"""
+
+    async def publish(self, group_id: str, frame: str):
+        raise NotImplementedError
+
+    async def close(self):
+        self._deliver = None
+
+    async def _dispatch(self, group_id: str, frame: str):
+        if self._deliver is not None:
+            self.delivered += 1
+            await self._deliver(group_id, frame)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+
+class InProcessBackplane(Backplane):
+    """Single-worker backplane: published messages are delivered directly"""
+
+    delivers_all = True
+
+    async def publish(self, group_id: str, frame: str):
+        self.published += 1
+        await self._dispatch(group_id, frame)
+
+
+class RedisBackplane(Backplane):
+    """
+    Backplane over Redis pub/sub, one channel per group.
+
+    Works with any client exposing the `redis.asyncio` API used here:
+    `publish`, `pubsub()` with `subscribe`/`unsubscribe`/`get_message`, and
+    `aclose`. A worker only subscribes to the groups it has sockets for.
+    """
+
+    def __init__(self, client, channel_prefix: str = "chat:", poll_timeout: float = 1.0):
+        super().__init__()
+        self.client = client
+        self.channel_prefix = channel_prefix
+        self.poll_timeout = poll_timeout
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._channels: Set[str] = set()
+        self.errors = 0
+
+    def _channel(self, group_id: str) -> str:
+        return f"{self.channel_prefix}{group_id}"
+
+    async def start(self, deliver: DeliverCallback):
+        await super().start(deliver)
+        self._pubsub = self.client.pubsub()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def subscribe(self, group_id: str):
+        channel = self._channel(group_id)
+        if channel not in self._channels:
+            self._channels.add(channel)
+            await self._pubsub.subscribe(channel)
+
+    async def unsubscribe(self, group_id: str):
+        channel = self._channel(group_id)
+        if channel in self._channels:
+            self._channels.discard(channel)
+            await self._pubsub.unsubscribe(channel)
+
+    async def publish(self, group_id: str, frame: str):
+        self.published += 1
+        await self.client.publish(self._channel(group_id), frame)
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self._channels:
+                    await asyncio.sleep(self.poll_timeout)
+                    continue
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=self.poll_timeout)
+                if not message or message.get("type") != "message":
+                    continue
+                channel, data = message["channel"], message["data"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                if isinstance(data, bytes):
+                    data = data.decode()
+                await self._dispatch(channel[len(self.channel_prefix):], data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error reading chat backplane: {str(e)}")
+                await asyncio.sleep(self.poll_timeout)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await self.client.aclose()
+        await super().close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({"channels": len(self._channels), "errors": self.errors})
+        return stats
+
+
+def create_backplane(settings: ChatSettings) -> Backplane:
+    """Build the backplane selected by CHAT_BACKPLANE ("memory" or "redis")"""
+    if settings.backplane == "memory":
+        return InProcessBackplane()
+    if settings.backplane == "redis":
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("CHAT_BACKPLANE=redis requires the 'redis' package")
+        return RedisBackplane(aioredis.from_url(settings.redis_url), settings.channel_prefix)
+    raise ValueError(f"Unknown chat backplane: {settings.backplane}")
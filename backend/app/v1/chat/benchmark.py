@@ -0,0 +1,84 @@
+"""
+Compare the chat wire encodings: bytes on the wire and CPU per broadcast.
+
+Usage:
+    python -m app.v1.chat.benchmark --messages 5000 --content-size 80
+
+For each encoding the broadcast cost is what ConnectionManager pays once per
+message (serializing the frame, plus transcoding for non-JSON encodings);
+the deflate columns are what permessage-deflate adds per recipient, with the
+compression context kept across messages as negotiated by default.
+"""
+import argparse
+import random
+import string
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from app.v1.chat.connections import encode_frame
+from app.v1.chat.encoding import CODECS, encode_for
+from app.v1.chat.models import Message
+
+
+def sample_messages(count: int, content_size: int, seed: int = 42) -> List[dict]:
+    rng = random.Random(seed)
+    words = ["filme", "cena", "final", "ator", "roteiro", "trilha", "diretor", "sequência", "ótimo", "assisti"]
+    group_id = Message(content="", group_id="", sender_id="").id
+    senders = [f"firebase-uid-{rng.choice(string.ascii_letters)}{n:04d}" for n in range(20)]
+    messages = []
+    for _ in range(count):
+        content = " ".join(rng.choice(words) for _ in range(content_size // 6))[:content_size]
+        messages.append(Message(content=content, group_id=group_id, sender_id=rng.choice(senders)).model_dump())
+    return messages
+
+
+def _deflate_stream():
+    # Raw deflate as used by permessage-deflate (RFC 7692), context takeover on
+    return zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+
+
+def run_benchmark(count: int = 2000, content_size: int = 80) -> Dict[str, Dict[str, float]]:
+    messages = sample_messages(count, content_size)
+    results = {}
+    for name, codec in CODECS.items():
+        started = time.perf_counter()
+        frames = [encode_for(codec, encode_frame(message)) for message in messages]
+        encode_seconds = time.perf_counter() - started
+
+        stream = _deflate_stream()
+        started = time.perf_counter()
+        deflated = 0
+        for frame in frames:
+            data = frame.encode() if isinstance(frame, str) else frame
+            deflated += len(stream.compress(data) + stream.flush(zlib.Z_SYNC_FLUSH)) - 4
+        deflate_seconds = time.perf_counter() - started
+
+        raw = sum(len(frame.encode() if isinstance(frame, str) else frame) for frame in frames)
+        results[name] = {
+            "bytes_per_message": raw / count,
+            "deflate_bytes_per_message": deflated / count,
+            "encode_us_per_broadcast": encode_seconds / count * 1e6,
+            "deflate_us_per_recipient": deflate_seconds / count * 1e6,
+        }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    parser = argparse.ArgumentParser(description="Compara as codificações do chat: bytes e CPU por broadcast")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--content-size", type=int, default=80, help="Tamanho médio do conteúdo das mensagens")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.messages, args.content_size)
+    print(f"{'encoding':<10}{'bytes':>10}{'deflate':>10}{'encode µs':>12}{'deflate µs':>12}")
+    for name, result in results.items():
+        print(
+            f"{name:<10}{result['bytes_per_message']:>10.1f}{result['deflate_bytes_per_message']:>10.1f}"
+            f"{result['encode_us_per_broadcast']:>12.2f}{result['deflate_us_per_recipient']:>12.2f}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
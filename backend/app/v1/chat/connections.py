@@ -0,0 +1,418 @@
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import WebSocket, status
+from fastapi.encoders import jsonable_encoder
+
+from app.config import ChatSettings, get_settings
+from app.v1.chat.backplane import Backplane, create_backplane
+from app.v1.chat.encoding import JSON, Frame, encode_for
+from app.v1.chat.history import MessageHistory
+from app.v1.chat.presence import PresenceTracker
+from app.v1.chat import roster
+
+logger = logging.getLogger(__name__)
+
+# Backplane channel every worker listens to for group membership changes
+ROSTER_CHANNEL = "_roster"
+
+
+def encode_frame(message: Dict[str, Any]) -> str:
+    """Serialize a broadcast payload once for all recipients"""
+    return json.dumps(jsonable_encoder(message), separators=(",", ":"))
+
+
+def frame_id(frame: str) -> Optional[str]:
+    """Message id of a broadcast frame"""
+    message = json.loads(frame)
+    return message.get("id") if isinstance(message, dict) else None
+
+
+class Connection:
+    """
+    An accepted WebSocket with a bounded outbound queue.
+
+    Frames are written by a dedicated writer task, so a slow client only
+    fills its own queue and never delays delivery to the rest of the group.
+    One connection may be subscribed to many groups, and speaks the wire
+    encoding (`codec`) negotiated at the handshake.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        queue_size: int,
+        clock: Callable[[], float] = time.monotonic,
+        codec=JSON,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.codec = codec
+        self.groups: Set[str] = set()
+        # {group_id: live frames held back while the group's replay is sent}
+        self.held: Dict[str, List[str]] = {}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.queued_bytes = 0
+        self.closed = False
+        self._clock = clock
+        self.last_seen = clock()
+
+    def touch(self):
+        """Record inbound activity (any client frame, including pongs)"""
+        self.last_seen = self._clock()
+
+    def idle_for(self, now: float) -> float:
+        return now - self.last_seen
+
+    def enqueue(self, frame: Frame) -> bool:
+        """Queue a frame for sending; False if the queue is full"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            self.queued_bytes += len(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def stop(self):
+        """Stop the writer without waiting for queued frames"""
+        self.closed = True
+        if self.writer is not None and not self.writer.done():
+            self.writer.cancel()
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        self.stop()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            # The socket may already be gone
+            pass
+
+
+class ConnectionManager:
+    """
+    Tracks chat sockets and the groups they subscribe to, and fans messages
+    out to them.
+
+    Subscriptions are indexed both ways: `active_connections` maps a group to
+    its subscribed connections and `Connection.groups` holds the groups of a
+    connection, so a broadcast touches only the group's sockets and a
+    disconnect only the socket's groups. A user may hold several connections
+    (e.g. one per tab) without them replacing each other.
+
+    Each broadcast is serialized once and pushed onto every recipient's
+    bounded queue without awaiting the sockets. A recipient whose queue is
+    full, or whose socket does not accept a frame within `send_timeout`, is a
+    slow consumer and is evicted: its socket is closed with 1013 (try again
+    later) and the client is expected to reconnect.
+
+    Broadcasts go through a `Backplane`: `send_message` publishes the frame
+    once and the backplane calls `deliver` on every worker hosting the group,
+    so sockets of the same group may live on different processes. New group
+    members are announced on `ROSTER_CHANNEL`, which every worker listens
+    to, so their cached rosters admit the member right away.
+
+    A heartbeat task sweeps the connections every `heartbeat_interval`
+    seconds: sockets quiet for longer than that get a `{"type": "ping"}`
+    frame, and sockets that sent nothing (not even a pong) for
+    `idle_timeout` seconds are reaped with 1001 (going away).
+
+    Delivered messages are also kept in `history`, a per-group ring buffer
+    that serves catch-up replay to reconnecting clients. Subscriptions feed
+    `presence`, whose coalesced diffs are sent every `presence_interval`
+    seconds. Presence is worker-local: its diffs only reach the sockets of
+    this worker, which describe the users connected to it, and never go
+    through the backplane.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[ChatSettings] = None,
+        backplane: Optional[Backplane] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.settings = settings or get_settings().chat
+        self.backplane = backplane or create_backplane(self.settings)
+        self.history = MessageHistory(self.settings.history_size, self.settings.history_groups)
+        self.presence = PresenceTracker(self.settings, clock)
+        self._clock = clock
+        self._started = False
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._presence: Optional[asyncio.Task] = None
+        # Channel releases and socket closes still running
+        self._tasks: Set[asyncio.Task] = set()
+        # Structure: {group_id: {Connection}}
+        self.active_connections: Dict[str, Set[Connection]] = {}
+        self.connections: Set[Connection] = set()
+        self.broadcasts = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.send_errors = 0
+        self.pings = 0
+        self.reaped = 0
+
+    async def start(self):
+        """Attach to the backplane and start the heartbeat; called from the lifespan and on first use"""
+        if not self._started:
+            self._started = True
+            await self.backplane.start(self.deliver)
+            await self.backplane.subscribe(ROSTER_CHANNEL)
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+            self._presence = asyncio.create_task(self._presence_loop())
+
+    async def connect(self, websocket: WebSocket, user_id: str, codec=JSON, subprotocol: Optional[str] = None) -> Connection:
+        await self.start()
+        await websocket.accept(subprotocol=subprotocol)
+        connection = Connection(websocket, user_id, self.settings.send_queue_size, self._clock, codec)
+        connection.writer = asyncio.create_task(self._write(connection))
+        self.connections.add(connection)
+        return connection
+
+    async def subscribe(self, connection: Connection, group_id: str, hold: bool = False) -> bool:
+        """
+        Subscribe a connection to a group; False once it reached `max_subscriptions`.
+
+        With `hold`, live frames of the group are kept aside until `release`,
+        so a replay of missed messages can be sent before them.
+        """
+        if group_id in connection.groups:
+            if hold:
+                connection.held.setdefault(group_id, [])
+            return True
+        if connection.closed or len(connection.groups) >= self.settings.max_subscriptions:
+            return False
+        if hold:
+            connection.held[group_id] = []
+        if group_id not in self.active_connections:
+            self.active_connections[group_id] = set()
+            await self.backplane.subscribe(group_id)
+        self.active_connections[group_id].add(connection)
+        connection.groups.add(group_id)
+        self.presence.join(group_id, connection.user_id)
+        return True
+
+    def release(self, connection: Connection, group_id: str, replayed: Iterable[str] = ()):
+        """Send the live frames held during a replay, minus the messages the replay already sent"""
+        held = connection.held.pop(group_id, None)
+        if not held:
+            return
+        replayed = set(replayed)
+        for frame in held:
+            if not replayed or frame_id(frame) not in replayed:
+                self.send_frame(connection, frame)
+
+    def unsubscribe(self, connection: Connection, group_id: str):
+        connection.groups.discard(group_id)
+        connection.held.pop(group_id, None)
+        group = self.active_connections.get(group_id)
+        if group is None or connection not in group:
+            return
+        group.discard(connection)
+        self.presence.leave(group_id, connection.user_id)
+        if not group:
+            del self.active_connections[group_id]
+            self._spawn(self._release(group_id), f"releasing chat group {group_id}")
+
+    def disconnect(self, connection: Connection):
+        """Forget a socket and all of its subscriptions"""
+        for group_id in list(connection.groups):
+            self.unsubscribe(connection, group_id)
+        self.connections.discard(connection)
+        connection.stop()
+
+    async def _release(self, group_id: str):
+        # A socket may have rejoined the group before this ran
+        if group_id not in self.active_connections:
+            await self.backplane.unsubscribe(group_id)
+            if not self.backplane.delivers_all:
+                # Messages published elsewhere no longer reach this worker
+                self.history.forget(group_id)
+
+    def send_to(self, connection: Connection, message: Dict[str, Any]):
+        """Queue a reply (e.g. a subscription ack) for a single connection"""
+        self.send_frame(connection, encode_frame(message))
+
+    def send_frame(self, connection: Connection, frame: str):
+        """Queue a JSON frame for a single connection, in the connection's encoding"""
+        if not connection.enqueue(encode_for(connection.codec, frame)):
+            self.dropped += 1
+            self._evict(connection, "send queue full")
+
+    async def send_message(self, message: Dict[str, Any], group_id: str):
+        """Publish a message to the group on every worker, serialized once"""
+        await self.start()
+        self.broadcasts += 1
+        await self.backplane.publish(group_id, encode_frame(message))
+
+    async def announce_member(self, group_id: str, user_id: str, role: str = "member"):
+        """Add a new member to the cached roster of the group on every worker"""
+        await self.start()
+        try:
+            await self.backplane.publish(ROSTER_CHANNEL, encode_frame(
+                {"type": "member", "group_id": group_id, "user_id": user_id, "role": role}
+            ))
+        except Exception as e:
+            # Other workers still pick the member up when their roster expires
+            logger.error(f"Error announcing member {user_id} of group {group_id}: {str(e)}")
+
+    async def deliver(self, group_id: str, frame: str):
+        """Push a published frame to this worker's sockets without blocking on any of them"""
+        if group_id == ROSTER_CHANNEL:
+            member = json.loads(frame)
+            roster.record_member(member["group_id"], member["user_id"], member["role"])
+            return
+        self.history.record(group_id, frame)
+        self._fan_out(group_id, frame)
+
+    def _fan_out(self, group_id: str, frame: str):
+        group = self.active_connections.get(group_id)
+        if not group:
+            return
+        # Transcoded at most once per encoding in use
+        encoded = {}
+        for connection in list(group):
+            held = connection.held.get(group_id)
+            if held is not None:
+                held.append(frame)
+                continue
+            if not connection.enqueue(encode_for(connection.codec, frame, encoded)):
+                self.dropped += 1
+                self._evict(connection, "send queue full")
+
+    def sweep(self):
+        """Ping quiet connections and reap idle ones"""
+        now = self._clock()
+        for connection in list(self.connections):
+            idle = connection.idle_for(now)
+            if idle >= self.settings.idle_timeout:
+                logger.info(f"Reaping idle chat socket of {connection.user_id} after {idle:.0f}s")
+                self.reaped += 1
+                self.disconnect(connection)
+                self._spawn(
+                    connection.close(code=status.WS_1001_GOING_AWAY),
+                    f"closing idle chat socket of {connection.user_id}",
+                )
+            elif idle >= self.settings.heartbeat_interval:
+                self.pings += 1
+                self.send_to(connection, {"type": "ping"})
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.settings.heartbeat_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error in chat heartbeat: {str(e)}")
+
+    async def flush_presence(self):
+        """Send the pending presence diffs to this worker's sockets of each group"""
+        for group_id, diff in self.presence.flush():
+            self._fan_out(group_id, encode_frame(diff))
+
+    async def _presence_loop(self):
+        while True:
+            await asyncio.sleep(self.settings.presence_interval)
+            try:
+                await self.flush_presence()
+            except Exception as e:
+                logger.error(f"Error broadcasting chat presence: {str(e)}")
+
+    def _evict(self, connection: Connection, reason: str):
+        if connection.closed:
+            return
+        logger.warning(f"Evicting slow chat consumer {connection.user_id}: {reason}")
+        self.evicted += 1
+        self.disconnect(connection)
+        self._spawn(
+            connection.close(code=status.WS_1013_TRY_AGAIN_LATER),
+            f"closing slow chat socket of {connection.user_id}",
+        )
+
+    def _spawn(self, coroutine, action: str):
+        """Run a step in the background, keeping the task referenced until it ends and logging its failure"""
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+
+        def done(task: asyncio.Task):
+            self._tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"Error {action}: {str(task.exception())}")
+
+        task.add_done_callback(done)
+
+    async def _write(self, connection: Connection):
+        while True:
+            frame = await connection.queue.get()
+            connection.queued_bytes -= len(frame)
+            try:
+                send = connection.websocket.send_bytes if isinstance(frame, bytes) else connection.websocket.send_text
+                await asyncio.wait_for(send(frame), self.settings.send_timeout)
+                connection.sent += 1
+            except asyncio.TimeoutError:
+                self._evict(connection, "send timed out")
+                return
+            except Exception as e:
+                # Broken socket: drop it, the receive loop will notice the disconnect
+                self.send_errors += 1
+                logger.info(f"Dropping chat socket of {connection.user_id}: {str(e)}")
+                self.disconnect(connection)
+                return
+
+    async def close_all(self):
+        """Close every socket and detach from the backplane, e.g. on application shutdown"""
+        for task in (self._heartbeat, self._presence):
+            if task is not None:
+                task.cancel()
+        self._heartbeat = self._presence = None
+        connections = list(self.connections)
+        self.connections.clear()
+        self.active_connections.clear()
+        self.presence = PresenceTracker(self.settings, self._clock)
+        await asyncio.gather(*(c.close(code=status.WS_1001_GOING_AWAY) for c in connections))
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._started:
+            self._started = False
+            await self.backplane.close()
+
+    def memory_estimate(self) -> int:
+        """Approximate bytes held by the manager: indexes, connection state and queued frames"""
+        total = sys.getsizeof(self.connections) + sys.getsizeof(self.active_connections)
+        for group_id, group in self.active_connections.items():
+            total += sys.getsizeof(group_id) + sys.getsizeof(group)
+        for connection in self.connections:
+            total += sys.getsizeof(connection) + sys.getsizeof(connection.__dict__)
+            total += sys.getsizeof(connection.groups) + connection.queued_bytes
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        depths = [c.queue.qsize() for c in self.connections]
+        return {
+            "groups": len(self.active_connections),
+            "connections": len(self.connections),
+            "users": len({c.user_id for c in self.connections}),
+            "subscriptions": sum(len(group) for group in self.active_connections.values()),
+            "queued": sum(depths),
+            "queued_bytes": sum(c.queued_bytes for c in self.connections),
+            "max_queue_depth": max(depths, default=0),
+            "max_idle": round(max((c.idle_for(now) for c in self.connections), default=0.0), 1),
+            "memory_bytes": self.memory_estimate(),
+            "broadcasts": self.broadcasts,
+            "dropped": self.dropped,
+            "evicted": self.evicted,
+            "send_errors": self.send_errors,
+            "pings": self.pings,
+            "reaped": self.reaped,
+            "backplane": self.backplane.stats(),
+            "history": self.history.stats(),
+            "presence": self.presence.stats(),
+        }
@@ -0,0 +1,118 @@
+"""
+Wire encodings of the chat sockets.
+
+Clients pick one per connection by offering WebSocket subprotocols
+(`Sec-WebSocket-Protocol: chat.msgpack, chat.json`) or, when they cannot set
+subprotocols, with the `encoding` query param. JSON is the default.
+
+`chat.msgpack` sends binary MessagePack frames with short keys (see
+`SHORT_KEYS`), timestamps as MessagePack timestamps and without fields at
+their default value (`is_edited: false`, `updated_at: null`). Compression is
+negotiated separately by the ASGI server through permessage-deflate.
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import WebSocket
+
+from app.v1.chat.history import parse_timestamp
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+Frame = Union[str, bytes]
+
+SHORT_KEYS = {
+    "id": "i",
+    "content": "c",
+    "group_id": "g",
+    "sender_id": "s",
+    "created_at": "t",
+    "updated_at": "u",
+    "is_edited": "e",
+    "type": "y",
+    "detail": "d",
+    "since": "a",
+}
+LONG_KEYS = {short: name for name, short in SHORT_KEYS.items()}
+_TIMESTAMPS = ("created_at", "updated_at")
+_DEFAULTS = {"is_edited": False, "updated_at": None}
+
+
+class JSONCodec:
+    name = "json"
+    subprotocol = "chat.json"
+    binary = False
+
+    def from_json(self, frame: str) -> str:
+        return frame
+
+    async def receive(self, websocket: WebSocket) -> Any:
+        try:
+            return await websocket.receive_json()
+        except (KeyError, TypeError):
+            # A binary frame on a text socket
+            raise ValueError("Expected a text frame")
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    subprotocol = "chat.msgpack"
+    binary = True
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        compact = {}
+        for key, value in message.items():
+            if key in _DEFAULTS and value == _DEFAULTS[key]:
+                continue
+            if key in _TIMESTAMPS and isinstance(value, str):
+                value = parse_timestamp(value).astimezone()
+            compact[SHORT_KEYS.get(key, key)] = value
+        return msgpack.packb(compact, datetime=True)
+
+    def from_json(self, frame: str) -> bytes:
+        return self.encode(json.loads(frame))
+
+    async def receive(self, websocket: WebSocket) -> Any:
+        try:
+            data = await websocket.receive_bytes()
+        except KeyError:
+            raise ValueError("Expected a binary frame")
+        try:
+            message = msgpack.unpackb(data)
+        except Exception as e:
+            raise ValueError(f"Invalid MessagePack frame: {str(e)}")
+        if isinstance(message, dict):
+            message = {LONG_KEYS.get(key, key): value for key, value in message.items()}
+        return message
+
+
+JSON = JSONCodec()
+CODECS = {JSON.name: JSON}
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+
+def negotiate(websocket: WebSocket):
+    """Pick the codec of a connection from its offered subprotocols or `encoding` query param"""
+    offered: List[str] = list(websocket.scope.get("subprotocols") or [])
+    for subprotocol in offered:
+        for codec in CODECS.values():
+            if codec.subprotocol == subprotocol:
+                return codec, subprotocol
+    return CODECS.get(websocket.query_params.get("encoding", JSON.name), JSON), None
+
+
+def encode_for(codec, frame: str, cache: Optional[Dict[str, Frame]] = None) -> Frame:
+    """Transcode a JSON broadcast frame for a codec, once per codec when given a cache"""
+    if codec is JSON:
+        return frame
+    if cache is None:
+        return codec.from_json(frame)
+    encoded = cache.get(codec.name)
+    if encoded is None:
+        encoded = cache[codec.name] = codec.from_json(frame)
+    return encoded
@@ -0,0 +1,104 @@
+import json
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+
+class _Entry(NamedTuple):
+    created_at: datetime
+    id: str
+    frame: str
+
+
+class _Ring:
+    def __init__(self, size: int, complete_from: datetime):
+        self.entries: Deque[_Entry] = deque(maxlen=size)
+        # Every message of the group created after this instant is in `entries`
+        self.complete_from = complete_from
+
+    def append(self, entry: _Entry):
+        if len(self.entries) == self.entries.maxlen:
+            self.complete_from = max(self.complete_from, self.entries[0].created_at)
+        self.entries.append(entry)
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp as the naive local time used by Message.created_at"""
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+
+def parse_since(since: str) -> Tuple[Optional[datetime], Optional[str]]:
+    """A `since` value is either an ISO timestamp or a message id"""
+    try:
+        return parse_timestamp(since), None
+    except ValueError:
+        return None, since
+
+
+class MessageHistory:
+    """
+    Per-group ring buffers of the last `size` message frames seen by this
+    worker, used to replay what a reconnecting client missed.
+
+    A buffer knows since when it is complete, so `since` only answers from
+    memory when no message can be missing and returns None otherwise, in
+    which case the caller falls back to the database.
+    """
+
+    def __init__(self, size: int = 200, max_groups: int = 10000, clock: Callable[[], datetime] = datetime.now):
+        self.size = size
+        self.max_groups = max_groups
+        self._clock = clock
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, group_id: str, frame: str):
+        """Remember a broadcast frame; frames that are not messages are ignored"""
+        try:
+            message = json.loads(frame)
+            entry = _Entry(parse_timestamp(message["created_at"]), message["id"], frame)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return
+        ring = self._rings.get(group_id)
+        if ring is None:
+            ring = self._rings[group_id] = _Ring(self.size, self._clock())
+            while len(self._rings) > self.max_groups:
+                self._rings.popitem(last=False)
+        else:
+            self._rings.move_to_end(group_id)
+        ring.append(entry)
+
+    def since(self, group_id: str, since: str) -> Optional[List[str]]:
+        """Frames after `since` (message id or timestamp), or None when the buffer cannot tell"""
+        ring = self._rings.get(group_id)
+        timestamp, message_id = parse_since(since)
+        frames = None
+        if ring is not None and timestamp is not None and timestamp >= ring.complete_from:
+            frames = [entry.frame for entry in ring.entries if entry.created_at > timestamp]
+        elif ring is not None and message_id is not None:
+            entries = list(ring.entries)
+            for n, entry in enumerate(entries):
+                if entry.id == message_id:
+                    frames = [later.frame for later in entries[n + 1:]]
+                    break
+        if frames is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return frames
+
+    def forget(self, group_id: str):
+        """Drop a buffer that stops receiving the group's messages"""
+        self._rings.pop(group_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "groups": len(self._rings),
+            "messages": sum(len(ring.entries) for ring in self._rings.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
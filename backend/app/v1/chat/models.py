@@ -25,8 +25,18 @@ class Message(MessageCreate):
     updated_at: Optional[datetime] = None
     is_edited: bool = False
 
+class MessagePage(BaseModel):
+    messages: List[Message]
+    next_cursor: Optional[str] = None  # pass as `after` to fetch older messages
+
 class GroupMember(BaseModel):
     user_id: str
     group_id: str
     role: str = "member"  # Options: "admin", "member"
-    joined_at: datetime = Field(default_factory=datetime.now) 
\ No newline at end of file
+    joined_at: datetime = Field(default_factory=datetime.now)
+
+class UnreadCount(BaseModel):
+    group_id: str
+    unread_count: int = 0
+    last_read_message_id: Optional[str] = None
+    last_read_at: Optional[datetime] = None
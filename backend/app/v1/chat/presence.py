@@ -0,0 +1,122 @@
+import time
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from app.config import ChatSettings
+
+
+class PresenceTracker:
+    """
+    Who is online and who is typing in each group, broadcast as coalesced diffs.
+
+    Connects, disconnects and typing frames only mark the user dirty; `flush`
+    (called every `presence_interval` seconds) compares the dirty users with
+    what was last broadcast and returns one diff per changed group. A burst of
+    keystrokes or a reconnect within the interval therefore costs at most one
+    broadcast, and none when the net state did not change.
+
+    Presence is counted per connection, so a user with two tabs stays online
+    until both are closed. State is local to the worker: a user counts as
+    online in a group while they have a socket on this worker, and diffs are
+    only sent to this worker's sockets, so tabs on another worker neither
+    show up here nor mark the user offline.
+    """
+
+    def __init__(self, settings: ChatSettings, clock: Callable[[], float] = time.monotonic):
+        self.settings = settings
+        self._clock = clock
+        # {group_id: {user_id: open connections}}
+        self._online: Dict[str, Dict[str, int]] = {}
+        # {group_id: {user_id: typing expires at}}
+        self._typing: Dict[str, Dict[str, float]] = {}
+        # {group_id: {user_id: (online, typing)}} as last broadcast
+        self._reported: Dict[str, Dict[str, Tuple[bool, bool]]] = {}
+        self._dirty: Dict[str, Set[str]] = {}
+        self.diffs = 0
+
+    def _mark(self, group_id: str, user_id: str):
+        self._dirty.setdefault(group_id, set()).add(user_id)
+
+    def join(self, group_id: str, user_id: str):
+        group = self._online.setdefault(group_id, {})
+        group[user_id] = group.get(user_id, 0) + 1
+        self._mark(group_id, user_id)
+
+    def leave(self, group_id: str, user_id: str):
+        group = self._online.get(group_id)
+        if not group or user_id not in group:
+            return
+        group[user_id] -= 1
+        if group[user_id] <= 0:
+            del group[user_id]
+            self.typing(group_id, user_id, False)
+            if not group:
+                del self._online[group_id]
+        self._mark(group_id, user_id)
+
+    def typing(self, group_id: str, user_id: str, active: bool = True):
+        """Start (or keep alive) a typing indicator, which lapses after `typing_ttl` seconds"""
+        if active:
+            self._typing.setdefault(group_id, {})[user_id] = self._clock() + self.settings.typing_ttl
+        else:
+            typing = self._typing.get(group_id)
+            if not typing or typing.pop(user_id, None) is None:
+                return
+            if not typing:
+                del self._typing[group_id]
+        self._mark(group_id, user_id)
+
+    def _state(self, group_id: str, user_id: str) -> Tuple[bool, bool]:
+        online = user_id in self._online.get(group_id, {})
+        return online, online and user_id in self._typing.get(group_id, {})
+
+    def flush(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Return the presence diff of every group that changed since the last flush"""
+        now = self._clock()
+        for group_id, typing in list(self._typing.items()):
+            for user_id in [user for user, expires in typing.items() if expires <= now]:
+                self.typing(group_id, user_id, False)
+
+        diffs = []
+        dirty, self._dirty = self._dirty, {}
+        for group_id, users in dirty.items():
+            reported = self._reported.setdefault(group_id, {})
+            changes = {"online": [], "offline": [], "typing": [], "stopped_typing": []}
+            for user_id in sorted(users):
+                before = reported.get(user_id, (False, False))
+                after = self._state(group_id, user_id)
+                if before == after:
+                    continue
+                if after[0] != before[0]:
+                    changes["online" if after[0] else "offline"].append(user_id)
+                if after[1] != before[1]:
+                    changes["typing" if after[1] else "stopped_typing"].append(user_id)
+                if after == (False, False):
+                    reported.pop(user_id, None)
+                else:
+                    reported[user_id] = after
+            if not reported:
+                del self._reported[group_id]
+            diff = {key: value for key, value in changes.items() if value}
+            if diff:
+                diffs.append((group_id, {"type": "presence", "group_id": group_id, **diff}))
+        self.diffs += len(diffs)
+        return diffs
+
+    def snapshot(self, group_id: str) -> Dict[str, Any]:
+        """Current presence of a group, without waiting for the next diff"""
+        online = sorted(self._online.get(group_id, {}))
+        now = self._clock()
+        typing = sorted(
+            user for user, expires in self._typing.get(group_id, {}).items()
+            if expires > now and user in self._online.get(group_id, {})
+        )
+        return {"group_id": group_id, "scope": "worker", "online": online, "typing": typing}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "groups": len(self._online),
+            "online": sum(len(group) for group in self._online.values()),
+            "typing": sum(len(group) for group in self._typing.values()),
+            "pending_groups": len(self._dirty),
+            "diffs": self.diffs,
+        }
@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Optional, Set
+
+from app.cache import TTLCache
+from app.config import get_settings
+from app.executor import run_query
+
+_settings = get_settings().cache
+# group_id -> {user_id: role}
+_rosters = TTLCache(maxsize=_settings.roster_size, ttl=_settings.roster_ttl)
+# user_id -> set of group_ids
+_user_groups = TTLCache(maxsize=_settings.roster_size, ttl=_settings.roster_ttl)
+# group_id -> chat_groups row
+_groups = TTLCache(maxsize=_settings.roster_size, ttl=_settings.roster_ttl)
+
+
+async def group_roster(supabase, group_id: str) -> Dict[str, str]:
+    """Members of a group with their roles, loaded once per TTL"""
+    async def load():
+        result = await run_query(
+            supabase.table("group_members")
+            .select("user_id, role")
+            .eq("group_id", group_id)
+        )
+        return {row["user_id"]: row.get("role") or "member" for row in result.data}
+
+    return await _rosters.get_or_load(group_id, load)
+
+
+async def member_role(supabase, group_id: str, user_id: str) -> Optional[str]:
+    """Role of a user in a group, or None when not a member"""
+    return (await group_roster(supabase, group_id)).get(user_id)
+
+
+async def user_group_ids(supabase, user_id: str) -> Set[str]:
+    """Ids of the groups a user belongs to"""
+    async def load():
+        result = await run_query(
+            supabase.table("group_members")
+            .select("group_id")
+            .eq("user_id", user_id)
+        )
+        return {row["group_id"] for row in result.data}
+
+    return await _user_groups.get_or_load(user_id, load)
+
+
+async def groups_by_id(supabase, group_ids: List[str]) -> List[Dict[str, Any]]:
+    """chat_groups rows for the given ids, querying only the ones not cached"""
+    rows = {}
+    missing = []
+    for group_id in group_ids:
+        row = _groups.get(group_id)
+        if row is None:
+            missing.append(group_id)
+        else:
+            rows[group_id] = row
+    if missing:
+        result = await run_query(supabase.table("chat_groups").select("*").in_("id", missing))
+        for row in result.data:
+            _groups.set(row["id"], row)
+            rows[row["id"]] = row
+    return [rows[group_id] for group_id in group_ids if group_id in rows]
+
+
+def record_group(row: Dict[str, Any]):
+    _groups.set(row["id"], row)
+
+
+def record_member(group_id: str, user_id: str, role: str = "member"):
+    """
+    Apply a membership insert to the cached entries, if any.
+
+    Called by the worker that inserted the member and, through the chat
+    backplane, by every other worker (see ConnectionManager.announce_member).
+    Entries only expire after `roster_ttl` otherwise.
+    """
+    roster = _rosters.get(group_id)
+    if roster is not None:
+        roster[user_id] = role
+    groups = _user_groups.get(user_id)
+    if groups is not None:
+        groups.add(group_id)
+
+
+def roster_cache_stats() -> Dict[str, Any]:
+    return {
+        "rosters": _rosters.stats(),
+        "user_groups": _user_groups.stats(),
+        "groups": _groups.stats(),
+    }
@@ -1,37 +1,24 @@
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException, status, Request
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException, status, Request, Query
+from typing import List, Dict, Any, Optional, Union
 from fastapi.responses import JSONResponse
 
-from app.v1.chat.models import GroupCreate, Group, MessageCreate, Message
+from app.v1.chat.models import GroupCreate, Group, MessageCreate, Message, MessagePage, UnreadCount
 from app.v1.chat.service import ChatService
+from app.v1.chat.connections import Connection, ConnectionManager, encode_frame, frame_id
+from app.v1.chat.encoding import negotiate
+from app.v1.chat.writer import MessageWriter
 from app.auth.sync import get_current_user
+from app.auth.tokens import verify_token
+import logging
 
-# Websocket connections manager
-class ConnectionManager:
-    def __init__(self):
-        # Structure: {group_id: {user_id: websocket}}
-        self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, group_id: str, user_id: str):
-        await websocket.accept()
-        if group_id not in self.active_connections:
-            self.active_connections[group_id] = {}
-        self.active_connections[group_id][user_id] = websocket
-
-    def disconnect(self, group_id: str, user_id: str):
-        if group_id in self.active_connections:
-            if user_id in self.active_connections[group_id]:
-                del self.active_connections[group_id][user_id]
-            if not self.active_connections[group_id]:
-                del self.active_connections[group_id]
-
-    async def send_message(self, message: Dict[str, Any], group_id: str):
-        if group_id in self.active_connections:
-            for user_id, connection in self.active_connections[group_id].items():
-                await connection.send_json(message)
+logger = logging.getLogger(__name__)
 
+# Websocket connections manager
 manager = ConnectionManager()
 
+# Write-behind persistence of messages received over websockets
+writer = MessageWriter()
+
 # Router setup
 chat_routes = APIRouter(
     prefix="/api/v1/chat",
@@ -49,6 +36,12 @@ def get_chat_service(request: Request = None):
         return ChatService(None)
     return ChatService(request.app.state.supabase)
 
+def get_ws_chat_service(websocket: WebSocket):
+    """
+    Dependency that returns a ChatService instance for websocket routes
+    """
+    return ChatService(websocket.app.state.supabase)
+
 # REST API routes
 @chat_routes.post("/groups", response_model=Group)
 async def create_group(
@@ -58,7 +51,9 @@ async def create_group(
 ):
     # Set the created_by field with the current user's ID
     group_data.created_by = current_user["uid"]
-    return await service.create_group(group_data)
+    group = await service.create_group(group_data)
+    await manager.announce_member(group.id, group.created_by, "admin")
+    return group
 
 @chat_routes.get("/groups/{group_id}", response_model=Group)
 async def get_group(
@@ -83,79 +78,278 @@ async def add_user_to_group(
     service: ChatService = Depends(get_chat_service)
 ):
     # To do: Add permission check - only admins can add users
-    return await service.add_user_to_group(group_id, user_id)
+    member = await service.add_user_to_group(group_id, user_id)
+    await manager.announce_member(group_id, user_id, member.role)
+    return member
 
-@chat_routes.get("/groups/{group_id}/messages", response_model=List[Message])
+@chat_routes.get("/groups/{group_id}/messages", response_model=Union[List[Message], MessagePage])
 async def get_group_messages(
     group_id: str,
     limit: int = 50,
     offset: int = 0,
+    after: Optional[str] = Query(None, description="Cursor from next_cursor; when given, even empty, replaces offset pagination"),
     current_user: Dict[str, Any] = Depends(get_current_user),
     service: ChatService = Depends(get_chat_service)
 ):
-    # To do: Check if user is in group
+    if not await service.is_member(group_id, current_user["uid"]):
+        raise HTTPException(status_code=403, detail="User not in group")
+    if after is not None:
+        try:
+            return await service.get_group_messages_page(group_id, limit, after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     return await service.get_group_messages(group_id, limit, offset)
 
-# WebSocket endpoint for real-time chat
-@chat_routes.websocket("/ws/{group_id}")
-async def websocket_endpoint(
-    websocket: WebSocket,
+@chat_routes.get("/unread", response_model=List[UnreadCount])
+async def get_unread_counts(
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    service: ChatService = Depends(get_chat_service)
+):
+    """Unread counters and read markers of all the user's groups"""
+    return await service.get_unread(current_user["uid"])
+
+@chat_routes.post("/groups/{group_id}/read", response_model=UnreadCount)
+async def mark_group_read(
     group_id: str,
+    message_id: Optional[str] = Query(None, description="Last message read; defaults to the latest one"),
+    current_user: Dict[str, Any] = Depends(get_current_user),
     service: ChatService = Depends(get_chat_service)
 ):
-    # Verify token from query param
+    # The acknowledged message may still be waiting in the write-behind buffer
+    await writer.flush()
+    return await service.mark_read(group_id, current_user["uid"], message_id)
+
+@chat_routes.get("/groups/{group_id}/presence")
+async def get_group_presence(
+    group_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    service: ChatService = Depends(get_chat_service)
+):
+    """
+    Who is online and typing in a group, from this worker's presence state.
+
+    Only sockets connected to the worker answering the request are counted,
+    which the response states with `"scope": "worker"`.
+    """
+    if not await service.is_member(group_id, current_user["uid"]):
+        raise HTTPException(status_code=403, detail="User not in group")
+    return manager.presence.snapshot(group_id)
+
+# WebSocket helpers
+async def authenticate_websocket(websocket: WebSocket) -> Optional[str]:
+    """
+    Verify the token query param of a websocket, closing it with 1008 when
+    missing or invalid. Returns the user id.
+    """
     token = websocket.query_params.get("token")
     if not token:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-        return
+        return None
     
-    # Validate token and get user
+    # Validate token and get user, sharing the verified-token cache with HTTP requests
     try:
-        # First try Firebase token validation
-        try:
-            from firebase_admin import auth
-            decoded_token = auth.verify_id_token(token)
-            user_id = decoded_token["uid"]
-        except Exception as firebase_error:
-            # If Firebase validation fails, try JWT token
-            import jwt
-            SECRET_KEY = "your-secret-key"  # Should match the key in auth.sync
-            ALGORITHM = "HS256"
-            
+        decoded_token = await verify_token(token, getattr(websocket.app.state, "supabase", None))
+        return decoded_token["uid"]
+    except Exception as e:
+        logger.error(f"WebSocket auth error: {str(e)}")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return None
+
+async def publish_message(user_id: str, group_id: str, content: str):
+    message = Message(
+        content=content,
+        group_id=group_id,
+        sender_id=user_id
+    )
+    
+    # Queue for the batched database write, then broadcast right away
+    await writer.submit(message)
+    manager.presence.typing(group_id, user_id, False)
+    
+    # Broadcast to all connected clients in the group
+    await manager.send_message(message.model_dump(mode="json"), group_id)
+
+async def replay_missed(connection: Connection, group_id: str, since: str, service: ChatService):
+    """
+    Send a (re)subscribed socket the messages of a group it missed since
+    `since`, from the in-memory history when it covers the gap and from the
+    database otherwise, then a {"type": "replayed"} marker. `truncated`
+    tells the client to page older messages through the REST API.
+
+    The subscription must have been made with `hold=True`: live messages
+    broadcast meanwhile are sent after the marker, without those the replay
+    already included, so the client sees every message once and in order.
+    """
+    limit = manager.settings.replay_limit
+    replayed = []
+    try:
+        frames = manager.history.since(group_id, since)
+        if frames is None:
             try:
-                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-                user_id = str(payload.get("sub"))
-                if not user_id:
-                    raise Exception("Invalid token: missing user ID")
-            except Exception as jwt_error:
-                # Both validations failed
-                raise Exception(f"Failed to validate token: Firebase error: {str(firebase_error)}. JWT error: {str(jwt_error)}")
+                messages = await service.get_messages_since(group_id, since, limit + 1)
+            except ValueError as e:
+                manager.send_to(connection, error_frame(group_id, str(e)))
+                return
+            except Exception as e:
+                logger.error(f"Error replaying chat messages of group {group_id}: {str(e)}")
+                manager.send_to(connection, error_frame(group_id, "Replay unavailable"))
+                return
+            frames = [encode_frame(message.model_dump(mode="json")) for message in messages]
+        
+        truncated = len(frames) > limit
+        for frame in frames[-limit:]:
+            manager.send_frame(connection, frame)
+            replayed.append(frame_id(frame))
+        manager.send_to(connection, {
+            "type": "replayed",
+            "group_id": group_id,
+            "count": min(len(frames), limit),
+            "truncated": truncated,
+        })
+    finally:
+        manager.release(connection, group_id, replayed)
+
+def error_frame(group_id: Optional[str], detail: str) -> Dict[str, Any]:
+    return {"type": "error", "group_id": group_id, "detail": detail}
+
+async def receive_frames(websocket: WebSocket, connection: Connection):
+    """
+    Yield the JSON object frames of a socket, answering heartbeats and
+    rejecting malformed frames without dropping the connection.
+    """
+    while True:
+        try:
+            data = await connection.codec.receive(websocket)
+        except ValueError:
+            manager.send_to(connection, error_frame(None, "Invalid frame"))
+            continue
+        connection.touch()
+        if not isinstance(data, dict):
+            manager.send_to(connection, error_frame(None, "Frame must be a JSON object"))
+        elif data.get("type") == "pong":
+            continue
+        elif data.get("type") == "ping":
+            manager.send_to(connection, {"type": "pong"})
+        else:
+            yield data
+
+async def serve_connection(connection: Connection, handler):
+    """
+    Run a socket's receive loop, removing the connection from the manager on
+    every exit path: client disconnect, reaping/eviction or an unexpected error.
+    """
+    try:
+        async for data in receive_frames(connection.websocket, connection):
+            await handler(data)
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        import logging
-        logging.getLogger(__name__).error(f"WebSocket auth error: {str(e)}")
+        # A socket closed by the reaper or an eviction fails its next receive
+        if not connection.closed:
+            logger.error(f"Chat socket of {connection.user_id} failed: {str(e)}")
+            await connection.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        manager.disconnect(connection)
+
+# Multiplexed WebSocket endpoint: one socket for all of a user's groups
+@chat_routes.websocket("/ws")
+async def multiplexed_websocket_endpoint(
+    websocket: WebSocket,
+    service: ChatService = Depends(get_ws_chat_service)
+):
+    """
+    Client frames:
+        {"type": "subscribe", "group_id": "...", "since": "<message id or ISO timestamp>"}
+        {"type": "unsubscribe", "group_id": "..."}
+        {"type": "message", "group_id": "...", "content": "..."}
+        {"type": "typing", "group_id": "...", "active": true | false}
+        {"type": "read", "group_id": "...", "message_id": "..."}
+        {"type": "pong"}  (answer to the server's {"type": "ping"})
+    Replies are {"type": "subscribed" | "unsubscribed" | "read" | "error", "group_id": ...};
+    messages of subscribed groups arrive as Message objects and presence
+    changes as {"type": "presence", "group_id": ..., "online": [...], ...}.
+    """
+    user_id = await authenticate_websocket(websocket)
+    if user_id is None:
+        return
+    
+    codec, subprotocol = negotiate(websocket)
+    connection = await manager.connect(websocket, user_id, codec, subprotocol)
+    
+    async def handle(data: Dict[str, Any]):
+        action = data.get("type")
+        group_id = data.get("group_id")
+        
+        if not group_id:
+            manager.send_to(connection, error_frame(None, "group_id is required"))
+        elif action == "subscribe":
+            # Membership is checked once per subscription instead of once per message
+            if not await service.is_member(group_id, user_id):
+                manager.send_to(connection, error_frame(group_id, "User not in group"))
+            elif not await manager.subscribe(connection, group_id, hold=bool(data.get("since"))):
+                manager.send_to(connection, error_frame(group_id, "Too many subscriptions"))
+            else:
+                manager.send_to(connection, {"type": "subscribed", "group_id": group_id})
+                if data.get("since"):
+                    await replay_missed(connection, group_id, data["since"], service)
+        elif action == "unsubscribe":
+            manager.unsubscribe(connection, group_id)
+            manager.send_to(connection, {"type": "unsubscribed", "group_id": group_id})
+        elif action == "message":
+            if group_id not in connection.groups:
+                manager.send_to(connection, error_frame(group_id, "Not subscribed to group"))
+            elif not data.get("content"):
+                manager.send_to(connection, error_frame(group_id, "content is required"))
+            else:
+                await publish_message(user_id, group_id, data["content"])
+        elif action == "typing":
+            if group_id in connection.groups:
+                manager.presence.typing(group_id, user_id, bool(data.get("active", True)))
+        elif action == "read":
+            await writer.flush()
+            try:
+                unread = await service.mark_read(group_id, user_id, data.get("message_id"))
+            except HTTPException as e:
+                manager.send_to(connection, error_frame(group_id, e.detail))
+                return
+            manager.send_to(connection, {"type": "read", **unread.model_dump(mode="json")})
+        else:
+            manager.send_to(connection, error_frame(group_id, "Unknown frame type"))
+    
+    await serve_connection(connection, handle)
+
+# WebSocket endpoint for real-time chat in a single group
+@chat_routes.websocket("/ws/{group_id}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    group_id: str,
+    since: Optional[str] = None,
+    service: ChatService = Depends(get_ws_chat_service)
+):
+    """Pass `since` (last seen message id or timestamp) to receive the messages missed while away"""
+    user_id = await authenticate_websocket(websocket)
+    if user_id is None:
+        return
+    
+    # Membership is checked once per socket instead of once per message
+    if not await service.is_member(group_id, user_id):
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
     
     # Connect to the WebSocket
-    await manager.connect(websocket, group_id, user_id)
+    codec, subprotocol = negotiate(websocket)
+    connection = await manager.connect(websocket, user_id, codec, subprotocol)
+    await manager.subscribe(connection, group_id, hold=bool(since))
+    if since:
+        await replay_missed(connection, group_id, since, service)
     
-    try:
-        # Listen for messages
-        while True:
-            data = await websocket.receive_json()
-            
-            # Create message in database
-            message_data = MessageCreate(
-                content=data["content"],
-                group_id=group_id,
-                sender_id=user_id
-            )
-            
-            # Save to database
-            message = await service.create_message(message_data)
-            
-            # Broadcast to all connected clients in the group
-            await manager.send_message(message.dict(), group_id)
-            
-    except WebSocketDisconnect:
-        manager.disconnect(group_id, user_id) 
\ No newline at end of file
+    async def handle(data: Dict[str, Any]):
+        if data.get("type") == "typing":
+            manager.presence.typing(group_id, user_id, bool(data.get("active", True)))
+            return
+        if not data.get("content"):
+            manager.send_to(connection, error_frame(group_id, "content is required"))
+            return
+        await publish_message(user_id, group_id, data["content"])
+    
+    await serve_connection(connection, handle)
@@ -3,7 +3,11 @@ from supabase import Client
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from app.v1.chat.models import Group, GroupCreate, Message, MessageCreate, GroupMember
+from app.v1.chat.models import Group, GroupCreate, Message, MessageCreate, GroupMember, MessagePage, UnreadCount
+from app.pagination import decode_cursor, encode_cursor
+from app.v1.chat.history import parse_since
+from app.executor import run_query
+from app.v1.chat import roster
 
 class ChatService:
     def __init__(self, supabase: Client):
@@ -14,10 +18,11 @@ class ChatService:
         group = Group(**group_data.dict())
         
         # Add to Supabase
-        result = self.supabase.table("chat_groups").insert(group.dict()).execute()
+        result = await run_query(self.supabase.table("chat_groups").insert(group.dict()))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create group")
+        roster.record_group(result.data[0])
         
         # Add creator as member and admin
         member = GroupMember(
@@ -25,48 +30,35 @@ class ChatService:
             group_id=group.id,
             role="admin"
         )
-        self.supabase.table("group_members").insert(member.dict()).execute()
+        await run_query(self.supabase.table("group_members").insert(member.dict()))
+        roster.record_member(group.id, member.user_id, member.role)
         
         return group
     
     async def get_group(self, group_id: str) -> Group:
         """Get group by ID"""
-        result = self.supabase.table("chat_groups").select("*").eq("id", group_id).execute()
+        groups = await roster.groups_by_id(self.supabase, [group_id])
         
-        if not result.data:
+        if not groups:
             raise HTTPException(status_code=404, detail="Group not found")
         
-        return Group(**result.data[0])
+        return Group(**groups[0])
     
     async def list_user_groups(self, user_id: str) -> List[Group]:
         """List all groups a user belongs to"""
-        result = self.supabase.table("group_members")\
-            .select("group_id")\
-            .eq("user_id", user_id)\
-            .execute()
+        group_ids = await roster.user_group_ids(self.supabase, user_id)
         
-        if not result.data:
+        if not group_ids:
             return []
         
-        group_ids = [item["group_id"] for item in result.data]
-        
-        groups_result = self.supabase.table("chat_groups")\
-            .select("*")\
-            .in_("id", group_ids)\
-            .execute()
+        groups = await roster.groups_by_id(self.supabase, sorted(group_ids))
         
-        return [Group(**group) for group in groups_result.data]
+        return [Group(**group) for group in groups]
     
     async def add_user_to_group(self, group_id: str, user_id: str, role: str = "member") -> GroupMember:
         """Add a user to a group"""
         # Check if user is already in group
-        result = self.supabase.table("group_members")\
-            .select("*")\
-            .eq("group_id", group_id)\
-            .eq("user_id", user_id)\
-            .execute()
-        
-        if result.data:
+        if await roster.member_role(self.supabase, group_id, user_id) is not None:
             raise HTTPException(status_code=400, detail="User already in group")
         
         # Add user to group
@@ -76,40 +68,146 @@ class ChatService:
             role=role
         )
         
-        self.supabase.table("group_members").insert(member.dict()).execute()
+        await run_query(self.supabase.table("group_members").insert(member.dict()))
+        roster.record_member(group_id, user_id, role)
         
         return member
     
+    async def is_member(self, group_id: str, user_id: str) -> bool:
+        """Check whether a user belongs to a group, from the cached roster"""
+        return await roster.member_role(self.supabase, group_id, user_id) is not None
+    
     async def create_message(self, message_data: MessageCreate) -> Message:
         """Create a new message in a group"""
         # Verify user is in group
-        result = self.supabase.table("group_members")\
-            .select("*")\
-            .eq("group_id", message_data.group_id)\
-            .eq("user_id", message_data.sender_id)\
-            .execute()
-        
-        if not result.data:
+        if not await self.is_member(message_data.group_id, message_data.sender_id):
             raise HTTPException(status_code=403, detail="User not in group")
         
         # Create message
         message = Message(**message_data.dict())
         
-        message_result = self.supabase.table("messages").insert(message.dict()).execute()
+        message_result = await run_query(self.supabase.table("messages").insert(message.dict()))
         
         if not message_result.data:
             raise HTTPException(status_code=500, detail="Failed to create message")
         
+        await self.increment_unread([message])
+        
         return message
     
     async def get_group_messages(self, group_id: str, limit: int = 50, offset: int = 0) -> List[Message]:
         """Get recent messages for a group"""
-        result = self.supabase.table("messages")\
+        result = await run_query(
+            self.supabase.table("messages")
+            .select("*")
+            .eq("group_id", group_id)
+            .order("created_at", desc=True)
+            .limit(limit)
+            .offset(offset)
+        )
+        
+        return [Message(**message) for message in result.data]
+    
+    async def get_group_messages_page(self, group_id: str, limit: int = 50, after: Optional[str] = None) -> MessagePage:
+        """Get messages for a group, newest first, using keyset pagination on (created_at, id)"""
+        query = self.supabase.table("messages")\
             .select("*")\
-            .eq("group_id", group_id)\
-            .order("created_at", desc=True)\
-            .limit(limit)\
-            .offset(offset)\
-            .execute()
+            .eq("group_id", group_id)
+        
+        if after:
+            position = decode_cursor(after, ["created_at", "id"])
+            created_at, message_id = position["created_at"], position["id"]
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt."{message_id}")'
+            )
+        
+        result = await run_query(
+            query
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(limit)
+        )
+        
+        messages = [Message(**message) for message in result.data]
+        cursor = None
+        if len(messages) == limit:
+            last = messages[-1]
+            cursor = encode_cursor({"created_at": last.created_at.isoformat(), "id": last.id})
+        
+        return MessagePage(messages=messages, next_cursor=cursor)
+
+    
+    async def get_messages_since(self, group_id: str, since: str, limit: int = 200) -> List[Message]:
+        """
+        Messages created after `since` (message id or ISO timestamp), oldest
+        first. When more than `limit` are missing only the newest are returned.
+        """
+        timestamp, message_id = parse_since(since)
+        query = self.supabase.table("messages")\
+            .select("*")\
+            .eq("group_id", group_id)
+        
+        if message_id is not None:
+            anchor = await run_query(
+                self.supabase.table("messages")
+                .select("created_at")
+                .eq("group_id", group_id)
+                .eq("id", message_id)
+            )
+            if not anchor.data:
+                raise ValueError("Unknown message id")
+            created_at = anchor.data[0]["created_at"]
+            query = query.or_(
+                f'created_at.gt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.gt."{message_id}")'
+            )
+        else:
+            query = query.gt("created_at", timestamp.isoformat())
+        
+        result = await run_query(
+            query
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(limit)
+        )
+        
+        return [Message(**message) for message in reversed(result.data)]
+
+    
+    async def increment_unread(self, messages: List[Message]):
+        """Add persisted messages to the unread counters of the other members of their groups"""
+        counts: Dict[tuple, int] = {}
+        for message in messages:
+            key = (message.group_id, message.sender_id)
+            counts[key] = counts.get(key, 0) + 1
+        
+        await run_query(self.supabase.rpc("chat_increment_unread", {
+            "p_counts": [
+                {"group_id": group_id, "sender_id": sender_id, "count": count}
+                for (group_id, sender_id), count in counts.items()
+            ]
+        }))
+    
+    async def mark_read(self, group_id: str, user_id: str, message_id: Optional[str] = None) -> UnreadCount:
+        """Move the user's read marker to message_id (or the latest message) and recount the rest"""
+        result = await run_query(self.supabase.rpc("chat_mark_read", {
+            "p_group_id": group_id,
+            "p_user_id": user_id,
+            "p_message_id": message_id,
+        }))
+        
+        if not result.data:
+            raise HTTPException(status_code=403, detail="User not in group")
+        
+        return UnreadCount(**result.data[0])
+    
+    async def get_unread(self, user_id: str) -> List[UnreadCount]:
+        """Unread counters of all the user's groups, read from group_members without touching messages"""
+        result = await run_query(
+            self.supabase.table("group_members")
+            .select("group_id, unread_count, last_read_message_id, last_read_at")
+            .eq("user_id", user_id)
+        )
         
-        return [Message(**message) for message in result.data] 
\ No newline at end of file
+        return [UnreadCount(**row) for row in result.data]
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from app.config import ChatSettings, get_settings
+from app.executor import run_query
+from app.v1.chat.models import Message
+from app.v1.chat.service import ChatService
+
+logger = logging.getLogger(__name__)
+
+# Queued after the last message on shutdown to stop the flusher
+_STOP = object()
+
+
+class MessageWriter:
+    """
+    Write-behind persistence of chat messages.
+
+    Messages are broadcast as soon as they are received and queued here; a
+    single flusher task collects them for up to `write_interval` seconds or
+    `write_batch_size` messages and stores each batch with one bulk insert.
+
+    Guarantees:
+    - ordering: one flusher writes batches in submission order, and a batch is
+      retried until it succeeds or is given up before the next one is taken;
+    - durability: failed batches are retried `write_retries` times with
+      backoff; the upsert on `id` makes a retry after an ambiguous failure
+      harmless. Only messages still failing after that are lost, and they are
+      logged. `close` flushes everything queued, so a clean shutdown loses
+      nothing;
+    - backpressure: `submit` waits once `write_queue_size` messages are
+      pending, slowing senders instead of growing memory without bound.
+
+    `flush` waits only for the messages submitted before it was called:
+    submissions are numbered and the flusher publishes how far it got, so a
+    read acknowledgement is not held up by traffic that arrives after it.
+
+    After each committed batch the members' unread counters are incremented
+    with a single RPC. A failure there is only logged: the next read
+    acknowledgement recounts the member's counter.
+    """
+
+    def __init__(self, settings: Optional[ChatSettings] = None):
+        self.settings = settings or get_settings().chat
+        self.supabase = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._progress: Optional[asyncio.Condition] = None
+        # Messages queued so far, and how many of them were written or given up
+        self._submitted = 0
+        self._processed = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.unread_errors = 0
+
+    async def start(self, supabase):
+        self.supabase = supabase
+        if self._flusher is None:
+            self._queue = asyncio.Queue(maxsize=self.settings.write_queue_size)
+            self._progress = asyncio.Condition()
+            self._flusher = asyncio.create_task(self._run())
+
+    async def submit(self, message: Message):
+        """Queue a message for persistence"""
+        if self._flusher is None:
+            raise RuntimeError("MessageWriter is not running")
+        await self._queue.put(message)
+        self._submitted += 1
+
+    async def flush(self):
+        """Wait until every message submitted before this call has been written (or given up)"""
+        if self._progress is None:
+            return
+        target = self._submitted
+        progress = self._progress
+        async with progress:
+            await progress.wait_for(lambda: self._processed >= target or self._flusher is None)
+
+    async def close(self):
+        """Flush pending messages and stop the flusher; called from the lifespan"""
+        if self._flusher is None:
+            return
+        await self._queue.put(_STOP)
+        await self._flusher
+        self._flusher = None
+        self._queue = None
+        async with self._progress:
+            self._progress.notify_all()
+        self._progress = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                return
+            batch = [first]
+            stopping = False
+            deadline = loop.time() + self.settings.write_interval
+            while len(batch) < self.settings.write_batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+            self._processed += len(batch)
+            async with self._progress:
+                self._progress.notify_all()
+            if stopping:
+                self._queue.task_done()
+                return
+
+    async def _write(self, batch: List[Message]):
+        rows = [jsonable_encoder(message) for message in batch]
+        for attempt in range(self.settings.write_retries + 1):
+            try:
+                await run_query(self.supabase.table("messages").upsert(rows, on_conflict="id"))
+                self.batches += 1
+                self.written += len(rows)
+                break
+            except Exception as e:
+                if attempt == self.settings.write_retries:
+                    self.failed += len(rows)
+                    logger.error(
+                        f"Dropping {len(rows)} chat messages after {attempt + 1} attempts: {str(e)} "
+                        f"(ids: {', '.join(row['id'] for row in rows)})"
+                    )
+                    return
+                self.retries += 1
+                logger.warning(f"Error writing {len(rows)} chat messages, retrying: {str(e)}")
+                await asyncio.sleep(0.05 * 2 ** attempt)
+
+        try:
+            await ChatService(self.supabase).increment_unread(batch)
+        except Exception as e:
+            self.unread_errors += 1
+            logger.error(f"Error updating unread counters for {len(batch)} chat messages: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+            "unread_errors": self.unread_errors,
+        }
@@ -0,0 +1,120 @@
+"""
+Compare comment posting latency: sequential queries versus one RPC.
+
+Usage:
+    python -m app.v1.forum.benchmark --comments 500 --rtt-ms 2
+
+Each Supabase call is simulated as one round trip with a log-normally
+distributed latency around `--rtt-ms`, so the numbers show what the number
+of sequential round trips costs at p50 and p99, not database execution time.
+
+- sequential: the previous create_comment flow, with a cold identity cache:
+  Usuario, default Perfil, Forum lookup, replied comment check and insert;
+- rpc: the current create_comment, a single forum_create_comment call.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from app.executor import run_query
+from app.v1.forum import helper
+from app.v1.forum.schemas import CommentCreate
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _SimulatedQuery:
+    def __init__(self, client: "SimulatedSupabase", data):
+        self.client = client
+        self.data = data
+
+    def __getattr__(self, name):
+        # Filters and modifiers (eq, limit, ...) keep building the same query
+        return lambda *args, **kwargs: self
+
+    async def execute(self):
+        self.client.round_trips += 1
+        await asyncio.sleep(self.client.latency())
+        return _Result(self.data)
+
+
+class SimulatedSupabase:
+    """Async Supabase stand-in where every call costs one simulated round trip"""
+
+    def __init__(self, rtt_ms: float, seed: int = 42):
+        self.rtt = rtt_ms / 1000
+        self.rng = random.Random(seed)
+        self.round_trips = 0
+
+    def latency(self) -> float:
+        return self.rtt * self.rng.lognormvariate(0, 0.5)
+
+    def _row(self) -> dict:
+        return {"id": 1, "mensagem": "Ótimo filme", "likes": 0, "usuario_id": 1, "forum_id": 1,
+                "perfil_id": 1, "created_at": None, "updated_at": None, "respondendo_id": 1}
+
+    def table(self, name: str) -> _SimulatedQuery:
+        return _SimulatedQuery(self, [self._row()])
+
+    def rpc(self, name: str, params: dict) -> _SimulatedQuery:
+        return _SimulatedQuery(self, [self._row()])
+
+
+async def sequential_create_comment(supabase, filme_id: int, comment: CommentCreate, email: str):
+    """The round trips of the previous create_comment, in order"""
+    await run_query(supabase.table("Usuario").select("id, email, firebase_uid").eq("email", email).limit(1))
+    await run_query(supabase.table("Perfil").select("id").eq("usuario_id", 1).limit(1))
+    await run_query(supabase.table("Forum").select("id").eq("filme_id", filme_id))
+    if comment.respondendo_id:
+        await run_query(supabase.table("Comentario").select("*").eq("id", comment.respondendo_id))
+    return (await run_query(supabase.table("Comentario").insert({"mensagem": comment.mensagem}))).data[0]
+
+
+async def rpc_create_comment(supabase, filme_id: int, comment: CommentCreate, email: str):
+    return await helper.create_comment(supabase, filme_id, comment, {"email": email})
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_benchmark(count: int = 200, rtt_ms: float = 2.0) -> Dict[str, Dict[str, float]]:
+    comment = CommentCreate(mensagem="Ótimo filme", respondendo_id=1)
+    results = {}
+    for name, post in (("sequential", sequential_create_comment), ("rpc", rpc_create_comment)):
+        supabase = SimulatedSupabase(rtt_ms)
+        samples = []
+        for n in range(count):
+            started = time.perf_counter()
+            await post(supabase, n, comment, f"user{n}@example.com")
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            "round_trips": supabase.round_trips / count,
+            "p50_ms": statistics.median(samples),
+            "p99_ms": _percentile(samples, 0.99),
+        }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    parser = argparse.ArgumentParser(description="Compara a latência de criação de comentários antes e depois da RPC")
+    parser.add_argument("--comments", type=int, default=500)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="Latência média de uma chamada ao Supabase")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmark(args.comments, args.rtt_ms))
+    print(f"{'flow':<12}{'round trips':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['round_trips']:>12.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,31 @@ from fastapi import Depends, Request, Header, HTTPException
 from app.v1.forum.schemas import *
 from firebase_admin import auth
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 import os
 from datetime import datetime
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 from firebase_admin.auth import UserRecord
+from app.cache import TTLCache
+from app.pagination import decode_cursor, next_cursor
+from app.executor import run_blocking, run_query
+from app.auth.identity import identity_keys, resolve_identity
+from app.auth.tokens import verify_token
+from app.v1.forum.likes import like_aggregator
+from app.v1.forum.pages import comment_pages
+from app.v1.forum.threads import build_threads
+from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 DEV_MODE = os.getenv("DEV_MODE", "false").lower() == "true"
+DEFAULT_COMMENTS_PAGE_SIZE = 20
+_settings = get_settings()
+_forum_settings = _settings.forum
+# filme_id -> Forum.id
+_forum_ids = TTLCache(maxsize=_settings.cache.forum_id_size, ttl=_settings.cache.forum_id_ttl)
+# Comentario.id -> Forum.id; a comment never moves to another forum
+_comment_forums = TTLCache(maxsize=_settings.cache.forum_id_size, ttl=_settings.cache.forum_id_ttl)
 
 async def get_current_user(
     request: Request, 
@@ -25,7 +42,7 @@ async def get_current_user(
     if DEV_MODE and dev_email:
         try:
             # Find user by email
-            user = auth.get_user_by_email(dev_email)
+            user = await run_blocking(auth.get_user_by_email, dev_email)
             return user
         except Exception as e:
             logger.error(f"Error authenticating with dev email: {str(e)}")
@@ -35,40 +52,71 @@ async def get_current_user(
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
     
-    try:
-        # Verify the Firebase ID token
-        token = authorization.replace("Bearer ", "")
-        user = auth.verify_id_token(token)
-        return user
-    except Exception as e:
-        logger.error(f"Error authenticating user: {str(e)}")
-        raise HTTPException(status_code=401, detail="Invalid authentication token")
+    # Verify the Firebase ID token (cached until it expires)
+    token = authorization.replace("Bearer ", "")
+    return await verify_token(token, allow_jwt=False)
+
+
+async def get_forum_id(supabase, filme_id: int) -> Optional[int]:
+    """ID of a movie's forum, or None when nobody commented on it yet"""
+    async def load():
+        result = await run_query(supabase.table("Forum").select("id").eq("filme_id", filme_id))
+        return result.data[0]["id"] if result.data else None
+
+    # Only found forums are kept; a missing one may be created at any time
+    return await _forum_ids.get_or_load(filme_id, load, ttl=lambda forum_id: None if forum_id is not None else 0)
 
 
-def get_or_create_forum(supabase, filme_id: int):
-    """Get an existing forum for a movie or create one if it doesn't exist"""
+async def get_or_create_forum(supabase, filme_id: int):
+    """
+    Get an existing forum for a movie or create one if it doesn't exist.
+
+    Creation is an upsert on the unique `filme_id`, so concurrent first
+    comments on a movie all get the same forum. The id is cached for the
+    process, so this touches the Forum table at most once per movie.
+    """
+    async def create():
+        result = await run_query(supabase.table("Forum").upsert({"filme_id": filme_id}, on_conflict="filme_id"))
+        return result.data[0]["id"]
+
     try:
-        # Check if forum exists
-        result = supabase.table("Forum").select("id").eq("filme_id", filme_id).execute()
-        
-        if result.data and len(result.data) > 0:
-            # Return existing forum
-            return result.data[0]
-        else:
-            # Create new forum - only specify filme_id, let database handle id
-            result = supabase.table("Forum").insert({"filme_id": filme_id}).execute()
-            return result.data[0]
+        forum_id = _forum_ids.get(filme_id)
+        if forum_id is None:
+            forum_id = await _forum_ids.get_or_load(filme_id, create)
+        if forum_id is None:
+            # Coalesced with a lookup that ran before the forum existed
+            forum_id = await create()
+            _forum_ids.set(filme_id, forum_id)
+        return {"id": forum_id}
     except Exception as e:
         logger.error(f"Error getting or creating forum: {str(e)}")
         raise Exception(f"Failed to get or create forum: {str(e)}")
 
 
+async def get_comment_forum_id(supabase, comment_id: int) -> Optional[int]:
+    """ID of the forum of a comment, or None when the comment does not exist"""
+    async def load():
+        result = await run_query(supabase.table("Comentario").select("forum_id").eq("id", comment_id))
+        return result.data[0]["forum_id"] if result.data else None
+
+    # Missing comments are not remembered, they may be created at any time
+    return await _comment_forums.get_or_load(comment_id, load, ttl=lambda forum_id: None if forum_id is not None else 0)
+
+
+def forum_cache_stats() -> Dict[str, Any]:
+    return _forum_ids.stats()
+
+
 async def create_comment(
     supabase, filme_id: int, comment: CommentCreate, user_data: Dict[str, Any], perfil_id: Optional[int] = None
 ):
     """
     Cria um novo comentário no fórum de um filme.
     
+    A validação (usuário, perfil, comentário respondido), a criação do fórum e
+    a inserção são feitas pela função forum_create_comment
+    (app/sql/forum_create_comment.sql) em uma única chamada ao banco.
+    
     Args:
         supabase: Cliente Supabase
         filme_id: ID do filme
@@ -83,109 +131,220 @@ async def create_comment(
         HTTPException: Se ocorrer algum erro durante o processo
     """
     try:
-        logging.info(f"Creating comment for movie {filme_id} by user {user_data.get('email', user_data.get('uid', 'unknown'))}")
+        keys = identity_keys(user_data)
+        logging.info(f"Creating comment for movie {filme_id} by user {keys['usuario_id'] or keys['firebase_uid'] or keys['email']}")
         
-        # Verificar usuário no banco de dados usando email
-        email = user_data.get("email")
-        if not email:
+        if not keys["email"]:
             raise HTTPException(status_code=403, detail="Email de usuário não disponível")
-            
-        user_response = supabase.table("Usuario").select("*").eq("email", email).execute()
-        
-        if not user_response.data:
-            logging.error(f"User with email {email} not found in database")
-            raise HTTPException(status_code=403, detail="Usuário não encontrado no sistema")
-        
-        user_db = user_response.data[0]
-        usuario_id = user_db["id"]
-        
-        # Se nenhum perfil_id for fornecido, usa qualquer perfil do usuário
-        if perfil_id is None:
-            perfil_response = supabase.table("Perfil").select("id").eq("usuario_id", usuario_id).limit(1).execute()
-            
-            if not perfil_response.data:
-                logging.error(f"No profile found for user {usuario_id}")
-                raise HTTPException(status_code=404, detail="Nenhum perfil encontrado para o usuário")
-            
-            perfil_id = perfil_response.data[0]["id"]
-        else:
-            # Verificar se o perfil pertence ao usuário
-            perfil_response = supabase.table("Perfil").select("*").eq("id", perfil_id).eq("usuario_id", usuario_id).execute()
-            
-            if not perfil_response.data:
-                logging.error(f"Profile {perfil_id} not found or does not belong to user {usuario_id}")
-                raise HTTPException(status_code=403, detail="Perfil não encontrado ou não pertence ao usuário")
         
-        # Obter ou criar o fórum
-        forum = get_or_create_forum(supabase, filme_id)
-        
-        # Verificar se o ID de resposta é válido, se fornecido
-        if comment.respondendo_id:
-            comment_check = supabase.table("Comentario").select("*").eq("id", comment.respondendo_id).execute()
-            if not comment_check.data:
-                logging.error(f"Comment to reply to with ID {comment.respondendo_id} not found")
-                raise HTTPException(status_code=404, detail="Comentário para responder não encontrado")
-        
-        # Criar o comentário
-        comment_data = {
-            "mensagem": comment.mensagem,
-            "likes": 0,
-            "usuario_id": usuario_id,
-            "forum_id": forum["id"],
-            "perfil_id": perfil_id,
-            "respondendo_id": comment.respondendo_id
-        }
-        
-        logging.info(f"Inserting comment data: {comment_data}")
-        response = supabase.table("Comentario").insert(comment_data).execute()
+        response = await run_query(supabase.rpc("forum_create_comment", {
+            "p_filme_id": filme_id,
+            "p_mensagem": comment.mensagem,
+            "p_usuario_id": keys["usuario_id"],
+            "p_firebase_uid": keys["firebase_uid"],
+            "p_email": keys["email"],
+            "p_perfil_id": perfil_id,
+            "p_respondendo_id": comment.respondendo_id,
+        }))
         
         if not response.data:
             logging.error("Failed to create comment, no data returned from database")
             raise HTTPException(status_code=500, detail="Falha ao criar comentário")
         
-        return response.data[0]
+        created = response.data[0]
+        _forum_ids.set(filme_id, created["forum_id"])
+        _comment_forums.set(created["id"], created["forum_id"])
+        comment_pages.invalidate(created["forum_id"])
+        return created
     
     except HTTPException:
         raise
+    except APIError as e:
+        # forum_create_comment raises PT403/PT404, answered by PostgREST with that status
+        if e.code and e.code.startswith("PT") and e.code[2:].isdigit():
+            logging.error(f"Comment rejected for movie {filme_id}: {e.message}")
+            raise HTTPException(status_code=int(e.code[2:]), detail=e.message)
+        logging.error(f"Error creating comment: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao criar comentário: {str(e)}")
     except Exception as e:
         logging.error(f"Error creating comment: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao criar comentário: {str(e)}")
 
 
-async def get_comments(supabase, filme_id: int):
-    """Get all comments for a movie's forum"""
+async def get_movie_comments(
+    supabase, filme_id: int, limit: Optional[int] = None, after: Optional[str] = None
+) -> Union[List[Dict[str, Any]], CommentList]:
+    """
+    Get comments for a movie's forum.
+
+    Without `limit`/`after` every comment is returned as a list. Otherwise the
+    comments are paginated by keyset on `id` and a CommentList carrying
+    `next_cursor` is returned. Pages are served from the comment page cache.
+    """
+    paginated = limit is not None or after is not None
+    if paginated:
+        limit = limit or DEFAULT_COMMENTS_PAGE_SIZE
     try:
         # Get forum ID for the movie
-        forum_query = supabase.table("Forum").select("id").eq("filme_id", filme_id).execute()
+        forum_id = await get_forum_id(supabase, filme_id)
         
-        if not forum_query.data or len(forum_query.data) == 0:
+        if forum_id is None:
             # No forum exists yet, return empty list
-            return []
-        
-        forum_id = forum_query.data[0]['id']
+            return CommentList(comments=[]) if paginated else []
         
         # Get comments for the forum
-        result = supabase.table("Comentario").select("*").eq("forum_id", forum_id).execute()
-        return result.data
+        async def load():
+            query = supabase.table("Comentario").select("*").eq("forum_id", forum_id)
+            if not paginated:
+                return like_aggregator.merge((await run_query(query)).data)
+            
+            if after:
+                position = decode_cursor(after, ["id"])
+                query = query.gt("id", position["id"])
+            result = await run_query(query.order("id").limit(limit))
+            like_aggregator.merge(result.data)
+            return CommentList(comments=result.data, next_cursor=next_cursor(result.data, limit, ["id"]))
+        
+        return await comment_pages.get(forum_id, ("comments", limit, after), load)
+    except ValueError:
+        raise
     except Exception as e:
         logger.error(f"Error getting comments: {str(e)}")
         raise Exception(f"Failed to get comments: {str(e)}")
 
 
+async def _load_replies(
+    supabase, parent_ids: List[int], depth: int, replies: int, after: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Reply subtrees of parent_ids, bounded by depth, replies per comment and thread_size"""
+    params = {
+        "p_parent_ids": parent_ids,
+        "p_max_depth": depth,
+        "p_per_parent": replies,
+        "p_max_total": _forum_settings.thread_size,
+    }
+    if after is not None:
+        params["p_after"] = after
+    result = await run_query(supabase.rpc("forum_comment_replies", params))
+    like_aggregator.merge([row["comment"] for row in result.data])
+    return result.data
+
+
+async def get_comment_threads(
+    supabase,
+    filme_id: int,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    depth: Optional[int] = None,
+    replies: Optional[int] = None,
+) -> CommentThreadList:
+    """
+    Get a page of top-level comments of a movie's forum with their replies.
+
+    Top-level comments are paginated by keyset on `id`; their replies are
+    loaded with one RPC (up to `depth` levels and `replies` replies per
+    comment) and assembled into trees. Cut subtrees carry a `replies_cursor`
+    for `get_comment_replies`. Pages are served from the comment page cache.
+    """
+    limit = limit or DEFAULT_COMMENTS_PAGE_SIZE
+    depth = _forum_settings.thread_depth if depth is None else depth
+    replies = replies or _forum_settings.thread_replies
+    try:
+        forum_id = await get_forum_id(supabase, filme_id)
+        if forum_id is None:
+            return CommentThreadList(threads=[])
+
+        async def load():
+            query = (
+                supabase.table("Comentario")
+                .select("*")
+                .eq("forum_id", forum_id)
+                .is_("respondendo_id", "null")
+            )
+            if after:
+                position = decode_cursor(after, ["id"])
+                query = query.gt("id", position["id"])
+            result = await run_query(query.order("id").limit(limit))
+            roots = like_aggregator.merge(result.data)
+            if not roots:
+                return CommentThreadList(threads=[])
+
+            rows = await _load_replies(supabase, [root["id"] for root in roots], depth, replies)
+            return CommentThreadList(
+                threads=build_threads(roots, rows),
+                next_cursor=next_cursor(roots, limit, ["id"]),
+            )
+
+        return await comment_pages.get(forum_id, ("threads", limit, after, depth, replies), load)
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting comment threads: {str(e)}")
+        raise Exception(f"Failed to get comment threads: {str(e)}")
+
+
+async def get_comment_replies(
+    supabase,
+    comment_id: int,
+    after: Optional[str] = None,
+    depth: Optional[int] = None,
+    replies: Optional[int] = None,
+) -> CommentThreadList:
+    """
+    Load more replies of a comment, continuing from a `replies_cursor`.
+
+    Returns up to `replies` direct replies after the cursor, each with its own
+    subtree down to `depth` levels.
+    """
+    depth = _forum_settings.thread_depth if depth is None else depth
+    replies = replies or _forum_settings.thread_replies
+    position = decode_cursor(after, ["id"]) if after else None
+    try:
+        forum_id = await get_comment_forum_id(supabase, comment_id)
+        if forum_id is None:
+            raise HTTPException(status_code=404, detail="Comment not found")
+
+        async def load():
+            rows = await _load_replies(
+                supabase, [comment_id], max(depth, 1), replies, position["id"] if position else None
+            )
+            threads = build_threads([{"id": comment_id}], rows)[0]["replies"]
+            return CommentThreadList(threads=threads, next_cursor=next_cursor(threads, replies, ["id"]))
+
+        key = ("replies", comment_id, position["id"] if position else None, depth, replies)
+        return await comment_pages.get(forum_id, key, load)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting comment replies: {str(e)}")
+        raise Exception(f"Failed to get comment replies: {str(e)}")
+
+
 async def like_comment(supabase, comment_id: int):
-    """Increment the like counter for a comment"""
+    """
+    Add a like to a comment.
+
+    While the like aggregator is running the like is only counted in memory
+    and written with its next flush; the returned row already includes it.
+    Otherwise the like is applied directly with the atomic increment RPC.
+    """
     try:
-        # Get current likes count
-        comment_query = supabase.table("Comentario").select("likes").eq("id", comment_id).execute()
-        
-        if not comment_query.data or len(comment_query.data) == 0:
+        if not like_aggregator.running:
+            result = await run_query(
+                supabase.rpc("forum_increment_likes", {"p_deltas": [{"id": comment_id, "delta": 1}]})
+            )
+            if not result.data:
+                raise HTTPException(status_code=404, detail="Comment not found")
+            comment_pages.patch_likes(result.data[0].get("forum_id"), comment_id)
+            return result.data[0]
+
+        comment_query = await run_query(supabase.table("Comentario").select("*").eq("id", comment_id))
+        if not comment_query.data:
             raise HTTPException(status_code=404, detail="Comment not found")
-        
-        current_likes = comment_query.data[0]['likes']
-        
-        # Update likes count
-        result = supabase.table("Comentario").update({"likes": current_likes + 1}).eq("id", comment_id).execute()
-        return result.data[0]
+
+        like_aggregator.add(comment_id)
+        comment_pages.patch_likes(comment_query.data[0].get("forum_id"), comment_id)
+        return like_aggregator.merge(comment_query.data)[0]
     except HTTPException:
         raise
     except Exception as e:
@@ -203,33 +362,15 @@ async def update_comment(
     logging.info(f"Atualizando comentário {comment_id}")
     try:
         # Verifica se o comentário existe
-        comment_response = supabase.table("Comentario").select("*").eq("id", comment_id).execute()
+        comment_response = await run_query(supabase.table("Comentario").select("*").eq("id", comment_id))
         if not comment_response.data:
             raise HTTPException(status_code=404, detail="Comentário não encontrado")
         
         comment = comment_response.data[0]
         
         # Verifica se o usuário é o dono do comentário
-        profile_id = comment["perfil_id"]
-        profile_response = supabase.table("Perfil").select("*").eq("id", profile_id).execute()
-        
-        if not profile_response.data:
-            raise HTTPException(status_code=404, detail="Perfil não encontrado")
-        
-        profile = profile_response.data[0]
-        user_id = profile["usuario_id"]
-        
-        # Busca o user_id do usuário atual usando o email
-        email = user_data["email"]
-        current_user_response = supabase.table("Usuario").select("*").eq("email", email).execute()
-        
-        if not current_user_response.data:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
-        
-        current_user_id = current_user_response.data[0]["id"]
-        
-        # Verifica se o usuário é o dono do comentário
-        if current_user_id != user_id:
+        identity = await resolve_identity(supabase, user_data)
+        if comment.get("usuario_id") != identity.usuario_id:
             raise HTTPException(status_code=403, detail="Você não tem permissão para editar este comentário")
         
         # Atualiza o comentário
@@ -238,11 +379,12 @@ async def update_comment(
             "updated_at": datetime.now().isoformat()
         }
         
-        response = supabase.table("Comentario").update(update_data).eq("id", comment_id).execute()
+        response = await run_query(supabase.table("Comentario").update(update_data).eq("id", comment_id))
         if not response.data:
             raise HTTPException(status_code=500, detail="Falha ao atualizar comentário")
         
-        return response.data[0]
+        comment_pages.invalidate(comment.get("forum_id"))
+        return like_aggregator.merge(response.data)[0]
     except HTTPException:
         raise
     except Exception as e:
@@ -261,56 +403,33 @@ async def delete_comment(
         # If we only have a user_id string, just check ownership directly
         if isinstance(user_data, str):
             # Check comment exists
-            check = supabase.table("comments").select("*").eq("id", comment_id).eq("user_id", user_data).execute()
+            check = await run_query(supabase.table("comments").select("*").eq("id", comment_id).eq("user_id", user_data))
             if not check.data:
                 return False
                 
             # Delete the comment
-            supabase.table("comments").delete().eq("id", comment_id).execute()
+            await run_query(supabase.table("comments").delete().eq("id", comment_id))
             return True
             
         # If we have a Dict with user data
-        if user_data and "uid" in user_data:
+        if user_data:
             # Check the comment exists
-            comment_response = supabase.table("Comentario").select("*").eq("id", comment_id).execute()
+            comment_response = await run_query(supabase.table("Comentario").select("*").eq("id", comment_id))
             if not comment_response.data:
                 raise HTTPException(status_code=404, detail="Comentário não encontrado")
             
             comment = comment_response.data[0]
             
             # Check if user is the owner
-            user_uid = user_data["uid"]
-            email = user_data.get("email", None)
-            
-            # Attempt 1: Try with user_id in the comment
-            if "user_id" in comment and comment["user_id"] == user_uid:
-                response = supabase.table("Comentario").delete().eq("id", comment_id).execute()
+            identity = await resolve_identity(supabase, user_data)
+            if comment.get("usuario_id") == identity.usuario_id:
+                response = await run_query(supabase.table("Comentario").delete().eq("id", comment_id))
                 if not response.data:
                     raise HTTPException(status_code=500, detail="Falha ao excluir comentário")
+                _comment_forums.pop(comment_id)
+                comment_pages.invalidate(comment.get("forum_id"))
                 return {"message": "Comentário excluído com sucesso"}
             
-            # Attempt 2: Check through profile and user tables if needed
-            if "perfil_id" in comment and email:
-                profile_id = comment["perfil_id"]
-                profile_response = supabase.table("Perfil").select("*").eq("id", profile_id).execute()
-                
-                if profile_response.data:
-                    profile = profile_response.data[0]
-                    user_id = profile["usuario_id"]
-                    
-                    # Find user in database by email
-                    current_user_response = supabase.table("Usuario").select("*").eq("email", email).execute()
-                    
-                    if current_user_response.data:
-                        current_user_id = current_user_response.data[0]["id"]
-                        
-                        # Check if user is owner
-                        if current_user_id == user_id:
-                            response = supabase.table("Comentario").delete().eq("id", comment_id).execute()
-                            if not response.data:
-                                raise HTTPException(status_code=500, detail="Falha ao excluir comentário")
-                            return {"message": "Comentário excluído com sucesso"}
-            
             # If we got here, user doesn't have permission
             raise HTTPException(status_code=403, detail="Você não tem permissão para excluir este comentário")
         
@@ -325,7 +444,7 @@ async def delete_comment(
 # Create a forum for a movie
 async def create_forum(supabase, forum_data):
     try:
-        response = await supabase.table("forums").insert(forum_data).execute()
+        response = await run_query(supabase.table("forums").insert(forum_data))
         return response.data[0] if response.data else None
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating forum: {str(e)}")
@@ -333,7 +452,7 @@ async def create_forum(supabase, forum_data):
 # Get a forum by ID
 async def get_forum(supabase, forum_id):
     try:
-        response = await supabase.table("forums").select("*").eq("id", forum_id).single().execute()
+        response = await run_query(supabase.table("forums").select("*").eq("id", forum_id).single())
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting forum: {str(e)}")
@@ -341,7 +460,7 @@ async def get_forum(supabase, forum_id):
 # Get all forums for a movie
 async def get_forums_by_movie(supabase, filme_id):
     try:
-        response = await supabase.table("forums").select("*").eq("filme_id", filme_id).execute()
+        response = await run_query(supabase.table("forums").select("*").eq("filme_id", filme_id))
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting forums by movie: {str(e)}")
@@ -349,7 +468,7 @@ async def get_forums_by_movie(supabase, filme_id):
 # Add a comment to a forum
 async def add_comment(supabase, comment):
     try:
-        response = await supabase.table("comments").insert(comment).execute()
+        response = await run_query(supabase.table("comments").insert(comment))
         return response.data[0] if response.data else None
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding comment: {str(e)}")
@@ -357,133 +476,21 @@ async def add_comment(supabase, comment):
 # Get all comments for a forum
 async def get_comments(supabase, forum_id):
     try:
-        response = await supabase.table("comments").select("*").eq("forum_id", forum_id).execute()
+        response = await run_query(supabase.table("comments").select("*").eq("forum_id", forum_id))
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting comments: {str(e)}")
 
-# Delete a comment
-async def delete_comment(supabase, comment_id, user_id):
-    try:
-        # First check if the comment exists and belongs to the user
-        check = await supabase.table("comments").select("*").eq("id", comment_id).eq("user_id", user_id).execute()
-        if not check.data:
-            return False
-            
-        # Then delete the comment
-        await supabase.table("comments").delete().eq("id", comment_id).execute()
-        return True
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error deleting comment: {str(e)}")
-
 # Delete a forum
 async def delete_forum(supabase, forum_id, user_id):
     try:
         # First check if the forum exists and belongs to the user
-        check = await supabase.table("forums").select("*").eq("id", forum_id).eq("user_id", user_id).execute()
+        check = await run_query(supabase.table("forums").select("*").eq("id", forum_id).eq("user_id", user_id))
         if not check.data:
             return False
             
         # Then delete the forum
-        await supabase.table("forums").delete().eq("id", forum_id).execute()
+        await run_query(supabase.table("forums").delete().eq("id", forum_id))
         return True
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting forum: {str(e)}")
-
-# Create a comment directly in a movie's forum
-async def create_comment(supabase, filme_id, comment_data, current_user, perfil_id=None):
-    try:
-        # First, check if a forum exists for this movie
-        forum_response = await supabase.table("forums").select("id").eq("filme_id", filme_id).execute()
-        
-        forum_id = None
-        if forum_response.data and len(forum_response.data) > 0:
-            # Use the existing forum
-            forum_id = forum_response.data[0]["id"]
-        else:
-            # Create a new forum for this movie
-            forum_data = {
-                "titulo": f"Discussion for Movie {filme_id}",
-                "descricao": "Automatic forum created for movie discussions",
-                "filme_id": filme_id,
-                "user_id": current_user.uid,
-                "created_at": datetime.now().isoformat()
-            }
-            forum_response = await supabase.table("forums").insert(forum_data).execute()
-            forum_id = forum_response.data[0]["id"] if forum_response.data else None
-            
-        if not forum_id:
-            raise HTTPException(status_code=500, detail="Failed to get or create forum")
-            
-        # Now create the comment
-        comment = {
-            "mensagem": comment_data.mensagem,
-            "forum_id": forum_id,
-            "usuario_id": current_user.uid,
-            "perfil_id": perfil_id or 1,  # Default to profile 1 if none provided
-            "likes": 0,
-            "created_at": datetime.now().isoformat(),
-            "respondendo_id": comment_data.respondendo_id
-        }
-        
-        comment_response = await supabase.table("comments").insert(comment).execute()
-        
-        if not comment_response.data:
-            raise HTTPException(status_code=500, detail="Failed to create comment")
-            
-        return comment_response.data[0]
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating comment: {str(e)}")
-
-# Like a comment
-async def like_comment(supabase, comment_id):
-    try:
-        # Get the current comment
-        comment_response = await supabase.table("comments").select("*").eq("id", comment_id).single().execute()
-        
-        if not comment_response.data:
-            raise HTTPException(status_code=404, detail="Comment not found")
-            
-        # Increment the likes
-        current_likes = comment_response.data.get("likes", 0)
-        updated_data = {"likes": current_likes + 1}
-        
-        # Update the comment
-        update_response = await supabase.table("comments").update(updated_data).eq("id", comment_id).execute()
-        
-        if not update_response.data:
-            raise HTTPException(status_code=500, detail="Failed to update comment likes")
-            
-        return update_response.data[0]
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error liking comment: {str(e)}")
-
-# Update a comment
-async def update_comment(supabase, comment_id, comment_data, current_user):
-    try:
-        # Verify the comment exists and belongs to the user
-        check_response = await supabase.table("comments").select("*").eq("id", comment_id).eq("usuario_id", current_user.uid).execute()
-        
-        if not check_response.data:
-            raise HTTPException(status_code=404, detail="Comment not found or you don't have permission to update it")
-            
-        # Update the comment
-        update_data = {
-            "mensagem": comment_data.mensagem,
-            "updated_at": datetime.now().isoformat()
-        }
-        
-        update_response = await supabase.table("comments").update(update_data).eq("id", comment_id).execute()
-        
-        if not update_response.data:
-            raise HTTPException(status_code=500, detail="Failed to update comment")
-            
-        return update_response.data[0]
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error updating comment: {str(e)}") 
\ No newline at end of file
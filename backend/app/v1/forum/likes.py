@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.config import ForumSettings, get_settings
+from app.executor import run_query
+
+logger = logging.getLogger(__name__)
+
+
+class LikeAggregator:
+    """
+    Coalesces comment likes in memory and writes them as deltas.
+
+    `add` only bumps a per-comment counter; every `like_flush_interval`
+    seconds (or once `like_flush_size` comments are pending) the deltas are
+    applied with a single `forum_increment_likes` call, which increments in
+    the database, so concurrent workers never lose each other's likes.
+
+    Counts read back from the database lag by at most one interval, so the
+    read path passes rows through `merge`, which adds the deltas of this
+    worker that are not written yet. A failed flush keeps its deltas for the
+    next one; `close` writes whatever is left.
+    """
+
+    def __init__(self, settings: Optional[ForumSettings] = None):
+        self.settings = settings or get_settings().forum
+        self.supabase = None
+        # {comment_id: likes not sent yet}
+        self._pending: Dict[int, int] = {}
+        # {comment_id: likes sent but not acknowledged}
+        self._inflight: Dict[int, int] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._lock = asyncio.Lock()
+        self.likes = 0
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None
+
+    async def start(self, supabase):
+        self.supabase = supabase
+        if self._flusher is None:
+            self._wake = asyncio.Event()
+            self._flusher = asyncio.create_task(self._run())
+
+    def add(self, comment_id: int, delta: int = 1):
+        """Record a like; it is written with the next flush"""
+        self._pending[comment_id] = self._pending.get(comment_id, 0) + delta
+        self.likes += delta
+        if len(self._pending) >= self.settings.like_flush_size and self._wake is not None:
+            self._wake.set()
+
+    def pending(self, comment_id: int) -> int:
+        """Likes of a comment accepted by this worker but not in the database yet"""
+        return self._pending.get(comment_id, 0) + self._inflight.get(comment_id, 0)
+
+    def merge(self, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add the pending likes to comment rows read from the database"""
+        if not self._pending and not self._inflight:
+            return comments
+        for comment in comments:
+            delta = self.pending(comment.get("id"))
+            if delta:
+                comment["likes"] = (comment.get("likes") or 0) + delta
+        return comments
+
+    async def flush(self):
+        """Write the pending deltas with one RPC"""
+        async with self._lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            deltas = [{"id": comment_id, "delta": delta} for comment_id, delta in self._inflight.items()]
+            try:
+                await run_query(self.supabase.rpc("forum_increment_likes", {"p_deltas": deltas}))
+                self.flushes += 1
+                self.written += sum(item["delta"] for item in deltas)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error writing likes of {len(deltas)} comments, retrying on next flush: {str(e)}")
+                for comment_id, delta in self._inflight.items():
+                    self._pending[comment_id] = self._pending.get(comment_id, 0) + delta
+            finally:
+                self._inflight = {}
+
+    async def close(self):
+        """Stop the flusher and write what is left; called from the lifespan"""
+        if self._flusher is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._flusher
+        self._flusher = None
+        self._wake = None
+        self._stopping = False
+        # Likes added while the last flush was running
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.settings.like_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "pending_likes": sum(self._pending.values()),
+            "likes": self.likes,
+            "written": self.written,
+            "flushes": self.flushes,
+            "errors": self.errors,
+        }
+
+
+like_aggregator = LikeAggregator()
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Set
+
+from app.config import ForumSettings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Page:
+    __slots__ = ("value", "loaded_at", "comments")
+
+    def __init__(self, value: Any, loaded_at: float):
+        self.value = value
+        self.loaded_at = loaded_at
+        # {comment_id: [rows/models of that comment in the page]}, for like patches
+        self.comments: Dict[int, List[Any]] = {}
+        for comment in _walk(value):
+            self.comments.setdefault(_field(comment, "id"), []).append(comment)
+
+
+class _Forum:
+    __slots__ = ("pages", "generation")
+
+    def __init__(self):
+        self.pages: "OrderedDict[Hashable, _Page]" = OrderedDict()
+        # Bumped by every invalidation, so loads started before it are not stored
+        self.generation = 0
+
+
+def _field(comment: Any, name: str) -> Any:
+    return comment.get(name) if isinstance(comment, dict) else getattr(comment, name, None)
+
+
+def _walk(value: Any) -> Iterator[Any]:
+    """Every comment of a page: a list of rows, a CommentList or a CommentThreadList"""
+    if isinstance(value, list):
+        stack = list(value)
+    else:
+        stack = list(getattr(value, "comments", None) or getattr(value, "threads", None) or [])
+    while stack:
+        comment = stack.pop()
+        yield comment
+        stack.extend(_field(comment, "replies") or [])
+
+
+class CommentPageCache:
+    """
+    Rendered comment pages per forum, keyed by forum id and page parameters.
+
+    Pages are served from memory for `page_ttl` seconds. Up to
+    `page_stale_ttl` seconds they are still served, and one background
+    reload per page refreshes them (stale-while-revalidate); older pages
+    are loaded before answering, with concurrent misses coalesced on one
+    load task that outlives any cancelled request.
+
+    Writes go through the cache: `invalidate` drops every page of a forum
+    when a comment is created, edited or deleted, so the author sees the
+    change on the next read, and `patch_likes` adjusts the like counts of
+    cached pages in place. The cache keeps `page_forums` forums with up to
+    `page_pages` pages each, evicting the least recently used. State is
+    local to the worker.
+    """
+
+    def __init__(self, settings: Optional[ForumSettings] = None, clock: Callable[[], float] = time.monotonic):
+        self.settings = settings or get_settings().forum
+        self._clock = clock
+        self._forums: "OrderedDict[int, _Forum]" = OrderedDict()
+        self._loading: Dict[tuple, asyncio.Future] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.invalidations = 0
+        self.patches = 0
+
+    def _forum(self, forum_id: int) -> _Forum:
+        forum = self._forums.get(forum_id)
+        if forum is None:
+            forum = self._forums[forum_id] = _Forum()
+            while len(self._forums) > self.settings.page_forums:
+                self._forums.popitem(last=False)
+        self._forums.move_to_end(forum_id)
+        return forum
+
+    async def get(self, forum_id: int, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return a cached page of a forum, calling loader when it is missing or too old"""
+        forum = self._forum(forum_id)
+        page = forum.pages.get(key)
+        if page is not None:
+            age = self._clock() - page.loaded_at
+            if age < self.settings.page_ttl:
+                self.hits += 1
+                forum.pages.move_to_end(key)
+                return page.value
+            if age < self.settings.page_stale_ttl:
+                self.stale_hits += 1
+                forum.pages.move_to_end(key)
+                if (forum_id, key) not in self._loading:
+                    self._refresh(forum_id, key, loader)
+                return page.value
+
+        self.misses += 1
+        pending = self._loading.get((forum_id, key))
+        if pending is None:
+            pending = self._load(forum_id, key, loader)
+        # A caller going away does not cancel the load the others are waiting for
+        return await asyncio.shield(pending)
+
+    def _load(self, forum_id: int, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        forum = self._forum(forum_id)
+        task = asyncio.create_task(self._fetch(forum_id, forum, forum.generation, key, loader))
+        self._loading[(forum_id, key)] = task
+
+        def done(task: asyncio.Task):
+            if self._loading.get((forum_id, key)) is task:
+                del self._loading[(forum_id, key)]
+            if not task.cancelled():
+                # Retrieved here in case every caller was cancelled
+                task.exception()
+
+        task.add_done_callback(done)
+        return task
+
+    async def _fetch(
+        self, forum_id: int, forum: _Forum, generation: int, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        value = await loader()
+        # Skipped when the forum was invalidated (or evicted) during the load
+        if self._forums.get(forum_id) is forum and forum.generation == generation:
+            forum.pages[key] = _Page(value, self._clock())
+            forum.pages.move_to_end(key)
+            while len(forum.pages) > self.settings.page_pages:
+                forum.pages.popitem(last=False)
+        return value
+
+    def _refresh(self, forum_id: int, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        def refreshed(task: asyncio.Task):
+            self._refreshing.discard(task)
+            if task.cancelled():
+                return
+            error = task.exception()
+            if error is None:
+                self.refreshes += 1
+            else:
+                self.refresh_errors += 1
+                logger.warning(f"Error refreshing comment page of forum {forum_id}: {str(error)}")
+
+        task = self._load(forum_id, key, loader)
+        self._refreshing.add(task)
+        task.add_done_callback(refreshed)
+
+    def invalidate(self, forum_id: Optional[int]):
+        """Drop every cached page of a forum after one of its comments changed"""
+        # Reads after the write start their own load instead of joining one from before it
+        for loading in [loading for loading in self._loading if loading[0] == forum_id]:
+            del self._loading[loading]
+        forum = self._forums.get(forum_id)
+        if forum is None:
+            return
+        forum.pages.clear()
+        forum.generation += 1
+        self.invalidations += 1
+
+    def patch_likes(self, forum_id: Optional[int], comment_id: int, delta: int = 1):
+        """Apply a like to the cached copies of a comment"""
+        forum = self._forums.get(forum_id)
+        if forum is None:
+            return
+        for page in forum.pages.values():
+            for comment in page.comments.get(comment_id, ()):
+                if isinstance(comment, dict):
+                    comment["likes"] = (comment.get("likes") or 0) + delta
+                else:
+                    comment.likes = (comment.likes or 0) + delta
+                self.patches += 1
+
+    def clear(self):
+        self._forums.clear()
+
+    async def close(self):
+        """Cancel background reloads; called from the lifespan"""
+        for task in list(self._refreshing):
+            task.cancel()
+        if self._refreshing:
+            await asyncio.gather(*self._refreshing, return_exceptions=True)
+        self.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "forums": len(self._forums),
+            "pages": sum(len(forum.pages) for forum in self._forums.values()),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "invalidations": self.invalidations,
+            "patches": self.patches,
+        }
+
+
+comment_pages = CommentPageCache()
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Path, Query, Header, Body
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from app.v1.forum.schemas import *
 from app.v1.forum.helper import *
 from app.auth.sync import get_current_user
@@ -165,15 +165,58 @@ async def create_comment_route(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@forum_routes.get("/filme/{filme_id}/comments", response_model=List[CommentResponse])
+@forum_routes.get("/filme/{filme_id}/comments", response_model=Union[List[CommentResponse], CommentList])
 async def get_comments_route(
     request: Request,
-    filme_id: int = Path(..., description="ID do filme")
+    filme_id: int = Path(..., description="ID do filme"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Quantidade de comentários por página (ativa a paginação por cursor)"),
+    after: Optional[str] = Query(None, description="Cursor retornado em next_cursor; quando informado, mesmo vazio, ativa a paginação por cursor")
+):
+    """Obtém os comentários do fórum de um filme, opcionalmente paginados por cursor"""
+    try:
+        supabase = request.app.state.supabase
+        return await get_movie_comments(supabase, filme_id, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@forum_routes.get("/filme/{filme_id}/threads", response_model=CommentThreadList)
+async def get_comment_threads_route(
+    request: Request,
+    filme_id: int = Path(..., description="ID do filme"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Quantidade de comentários de primeiro nível por página"),
+    after: Optional[str] = Query(None, description="Cursor retornado em next_cursor"),
+    depth: Optional[int] = Query(None, ge=0, le=10, description="Níveis de respostas incluídos"),
+    replies: Optional[int] = Query(None, ge=1, le=50, description="Respostas incluídas por comentário")
 ):
-    """Obtém todos os comentários do fórum de um filme"""
+    """Obtém os comentários do fórum de um filme em threads, paginadas por cursor"""
     try:
         supabase = request.app.state.supabase
-        return await get_comments(supabase, filme_id)
+        return await get_comment_threads(supabase, filme_id, limit, after, depth, replies)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@forum_routes.get("/comments/{comment_id}/replies", response_model=CommentThreadList)
+async def get_comment_replies_route(
+    request: Request,
+    comment_id: int = Path(..., description="ID do comentário"),
+    after: Optional[str] = Query(None, description="Cursor retornado em replies_cursor ou next_cursor"),
+    depth: Optional[int] = Query(None, ge=1, le=10, description="Níveis de respostas incluídos"),
+    replies: Optional[int] = Query(None, ge=1, le=50, description="Respostas incluídas por comentário")
+):
+    """Carrega mais respostas de um comentário"""
+    try:
+        supabase = request.app.state.supabase
+        return await get_comment_replies(supabase, comment_id, after, depth, replies)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
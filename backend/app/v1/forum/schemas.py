@@ -33,6 +33,22 @@ class CommentResponse(CommentBase):
 class CommentList(BaseModel):
     """Schema for list of comments"""
     comments: List[CommentResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor para a próxima página (parâmetro after)")
+
+
+class CommentThread(CommentResponse):
+    """Schema for a comment with its assembled reply subtree"""
+    reply_count: int = Field(0, description="Quantidade de respostas diretas")
+    replies: List["CommentThread"] = Field(default_factory=list)
+    replies_cursor: Optional[str] = Field(
+        None, description="Cursor para carregar as respostas que faltam (GET /comments/{id}/replies?after=...)"
+    )
+
+
+class CommentThreadList(BaseModel):
+    """Schema for a page of comment threads"""
+    threads: List[CommentThread]
+    next_cursor: Optional[str] = Field(None, description="Cursor para a próxima página (parâmetro after)")
 
 
 class AuthUserIdentification(BaseModel):
@@ -0,0 +1,38 @@
+from typing import Any, Dict, List
+
+from app.pagination import encode_cursor
+
+
+def build_threads(parents: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Attach the rows returned by `forum_comment_replies` to their parents.
+
+    Rows arrive breadth first and ordered by id within each level, so a
+    reply's parent is always indexed before it and every reply list ends up
+    ordered without sorting: one pass over the rows, O(n). Comments with
+    replies that were not loaded (cut by the depth, per-comment or size
+    limit) get a `replies_cursor` pointing after their last loaded reply.
+    """
+    nodes = {}
+    for parent in parents:
+        nodes[parent["id"]] = {**parent, "reply_count": 0, "replies": []}
+
+    for row in rows:
+        comment = row["comment"]
+        if row["depth"] == 0:
+            if comment["id"] in nodes:
+                nodes[comment["id"]]["reply_count"] = row["reply_count"]
+            continue
+        parent = nodes.get(comment.get("respondendo_id"))
+        if parent is None:
+            continue
+        node = {**comment, "reply_count": row["reply_count"], "replies": []}
+        parent["replies"].append(node)
+        nodes[node["id"]] = node
+
+    for node in nodes.values():
+        replies = node["replies"]
+        if len(replies) < node["reply_count"]:
+            node["replies_cursor"] = encode_cursor({"id": replies[-1]["id"] if replies else 0})
+    return [nodes[parent["id"]] for parent in parents]
+
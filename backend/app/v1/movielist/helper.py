@@ -1,14 +1,16 @@
 from fastapi import HTTPException
 from app.v1.movielist.schemas import *
+import asyncio
 import logging
 from typing import Optional, List, Dict, Any
+from app.executor import run_query
 
 logger = logging.getLogger(__name__)
 
 async def get_default_profile(supabase, usuario_id: int) -> int:
     """Get the default profile for a user"""
     try:
-        result = await supabase.table("Perfil").select("id").eq("usuario_id", usuario_id).limit(1).execute()
+        result = await run_query(supabase.table("Perfil").select("id").eq("usuario_id", usuario_id).limit(1))
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=404, detail="Perfil não encontrado para o usuário")
         return result.data[0]["id"]
@@ -18,25 +20,35 @@ async def get_default_profile(supabase, usuario_id: int) -> int:
 
 async def get_movie_lists_status(supabase, filme_id: int, perfil_id: int) -> MovieListsStatus:
     """Check if a movie is in favorite, watched, or watch later lists"""
+    statuses = await get_movie_lists_status_batch(supabase, [filme_id], perfil_id)
+    return statuses[filme_id]
+
+async def get_movie_lists_status_batch(supabase, filme_ids: List[int], perfil_id: int) -> Dict[int, MovieListsStatus]:
+    """Check the list membership of many movies with one concurrent query per list table"""
     try:
-        # Check favorites
-        fav_result = await supabase.table("FilmesFavoritos").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
-        is_favorite = len(fav_result.data) > 0
-        
-        # Check watched
-        watched_result = await supabase.table("FilmesAssistidos").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
-        is_watched = len(watched_result.data) > 0
-        
-        # Check watch later
-        later_result = await supabase.table("FilmesWatchLater").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
-        is_watch_later = len(later_result.data) > 0
-        
-        return MovieListsStatus(
-            filme_id=filme_id,
-            is_favorite=is_favorite,
-            is_watched=is_watched,
-            is_watch_later=is_watch_later
+        filme_ids = list(dict.fromkeys(filme_ids))
+        
+        async def lookup(table_name: str):
+            return await run_query(supabase.table(table_name).select("filme_id").eq("perfil_id", perfil_id).in_("filme_id", filme_ids))
+        
+        fav_result, watched_result, later_result = await asyncio.gather(
+            lookup("FilmesFavoritos"),
+            lookup("FilmesAssistidos"),
+            lookup("FilmesWatchLater"),
         )
+        favorites = {row["filme_id"] for row in fav_result.data}
+        watched = {row["filme_id"] for row in watched_result.data}
+        watch_later = {row["filme_id"] for row in later_result.data}
+        
+        return {
+            filme_id: MovieListsStatus(
+                filme_id=filme_id,
+                is_favorite=filme_id in favorites,
+                is_watched=filme_id in watched,
+                is_watch_later=filme_id in watch_later
+            )
+            for filme_id in filme_ids
+        }
     except Exception as e:
         logger.error(f"Error checking movie status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Falha ao verificar o status do filme: {str(e)}")
@@ -45,20 +57,20 @@ async def add_movie_to_favorites(supabase, filme_id: int, perfil_id: int) -> Dic
     """Add a movie to favorites"""
     try:
         # Check if the movie exists
-        movie_check = await supabase.table("Filme").select("id").eq("id", filme_id).execute()
+        movie_check = await run_query(supabase.table("Filme").select("id").eq("id", filme_id))
         if not movie_check.data or len(movie_check.data) == 0:
             raise HTTPException(status_code=404, detail="Filme não encontrado")
         
         # Check if already in favorites
-        existing = await supabase.table("FilmesFavoritos").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
+        existing = await run_query(supabase.table("FilmesFavoritos").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id))
         if existing.data and len(existing.data) > 0:
             return existing.data[0]  # Already in favorites
         
         # Add to favorites
-        result = await supabase.table("FilmesFavoritos").insert({
+        result = await run_query(supabase.table("FilmesFavoritos").insert({
             "filme_id": filme_id,
             "perfil_id": perfil_id
-        }).execute()
+        }))
         
         return result.data[0]
     except HTTPException:
@@ -71,23 +83,23 @@ async def add_movie_to_watched(supabase, filme_id: int, perfil_id: int) -> Dict[
     """Add a movie to watched list and remove from watch later if present"""
     try:
         # Check if the movie exists
-        movie_check = await supabase.table("Filme").select("id").eq("id", filme_id).execute()
+        movie_check = await run_query(supabase.table("Filme").select("id").eq("id", filme_id))
         if not movie_check.data or len(movie_check.data) == 0:
             raise HTTPException(status_code=404, detail="Filme não encontrado")
         
         # Check if already in watched list
-        existing = await supabase.table("FilmesAssistidos").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
+        existing = await run_query(supabase.table("FilmesAssistidos").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id))
         if existing.data and len(existing.data) > 0:
             return existing.data[0]  # Already in watched list
         
         # Remove from watch later if present
-        await supabase.table("FilmesWatchLater").delete().eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
+        await run_query(supabase.table("FilmesWatchLater").delete().eq("filme_id", filme_id).eq("perfil_id", perfil_id))
         
         # Add to watched list
-        result = await supabase.table("FilmesAssistidos").insert({
+        result = await run_query(supabase.table("FilmesAssistidos").insert({
             "filme_id": filme_id,
             "perfil_id": perfil_id
-        }).execute()
+        }))
         
         return result.data[0]
     except HTTPException:
@@ -100,12 +112,12 @@ async def add_movie_to_watch_later(supabase, filme_id: int, perfil_id: int) -> D
     """Add a movie to watch later list if not already watched"""
     try:
         # Check if the movie exists
-        movie_check = await supabase.table("Filme").select("id").eq("id", filme_id).execute()
+        movie_check = await run_query(supabase.table("Filme").select("id").eq("id", filme_id))
         if not movie_check.data or len(movie_check.data) == 0:
             raise HTTPException(status_code=404, detail="Filme não encontrado")
         
         # Check if in watched list
-        watched = await supabase.table("FilmesAssistidos").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
+        watched = await run_query(supabase.table("FilmesAssistidos").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id))
         if watched.data and len(watched.data) > 0:
             raise HTTPException(
                 status_code=400, 
@@ -113,15 +125,15 @@ async def add_movie_to_watch_later(supabase, filme_id: int, perfil_id: int) -> D
             )
         
         # Check if already in watch later
-        existing = await supabase.table("FilmesWatchLater").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
+        existing = await run_query(supabase.table("FilmesWatchLater").select("id").eq("filme_id", filme_id).eq("perfil_id", perfil_id))
         if existing.data and len(existing.data) > 0:
             return existing.data[0]  # Already in watch later list
         
         # Add to watch later
-        result = await supabase.table("FilmesWatchLater").insert({
+        result = await run_query(supabase.table("FilmesWatchLater").insert({
             "filme_id": filme_id,
             "perfil_id": perfil_id
-        }).execute()
+        }))
         
         return result.data[0]
     except HTTPException:
@@ -146,7 +158,7 @@ async def remove_movie_from_list(supabase, table_name: str, filme_id: int, perfi
         actual_table = valid_tables[table_name]
         
         # Delete the entry
-        result = await supabase.table(actual_table).delete().eq("filme_id", filme_id).eq("perfil_id", perfil_id).execute()
+        result = await run_query(supabase.table(actual_table).delete().eq("filme_id", filme_id).eq("perfil_id", perfil_id))
         
         if not result.data or len(result.data) == 0:
             return {"message": "Filme não estava na lista"}
@@ -174,10 +186,10 @@ async def get_movies_in_list(supabase, table_name: str, perfil_id: int) -> List[
         actual_table = valid_tables[table_name]
         
         # Get all movies in the list with their details from Filme table
-        result = await supabase.rpc(
+        result = await run_query(supabase.rpc(
             'get_movies_in_list', 
             {'table_name': actual_table, 'profile_id': perfil_id}
-        ).execute()
+        ))
         
         return result.data
     except HTTPException:
@@ -186,33 +198,72 @@ async def get_movies_in_list(supabase, table_name: str, perfil_id: int) -> List[
         logger.error(f"Error getting movies from {table_name}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Falha ao obter filmes da lista: {str(e)}")
 
+BATCH_LIST_TABLES = {
+    "favorite": "FilmesFavoritos",
+    "watched": "FilmesAssistidos",
+    "watch_later": "FilmesWatchLater"
+}
+
 async def batch_update_movie_list(
     supabase, list_type: str, filme_ids: List[int], perfil_id: int
 ) -> BatchResponse:
-    """Batch update multiple movies in a list"""
-    results = []
+    """
+    Batch update multiple movies in a list.
+
+    Set-based: one existence check for all movies, one duplicate probe, one
+    bulk delete from watch later (for watched) and one bulk upsert, instead of
+    the per-movie round-trips of the single-item helpers. Per-movie outcomes
+    follow the same rules as `add_movie_to_favorites`/`_watched`/`_watch_later`.
+    """
+    failures: Dict[int, str] = {}
+    unique_ids = list(dict.fromkeys(filme_ids))
     
-    for filme_id in filme_ids:
+    if list_type not in BATCH_LIST_TABLES:
+        failures = {filme_id: "Tipo de lista inválido" for filme_id in unique_ids}
+    elif unique_ids:
+        table_name = BATCH_LIST_TABLES[list_type]
+        pending = unique_ids
         try:
-            if list_type == "favorite":
-                await add_movie_to_favorites(supabase, filme_id, perfil_id)
-            elif list_type == "watched":
-                await add_movie_to_watched(supabase, filme_id, perfil_id)
-            elif list_type == "watch_later":
-                await add_movie_to_watch_later(supabase, filme_id, perfil_id)
-            else:
-                raise HTTPException(status_code=400, detail="Tipo de lista inválido")
+            # Check which movies exist
+            movies = await run_query(supabase.table("Filme").select("id").in_("id", pending))
+            found = {row["id"] for row in movies.data}
+            for filme_id in pending:
+                if filme_id not in found:
+                    failures[filme_id] = "Filme não encontrado"
+            pending = [filme_id for filme_id in pending if filme_id in found]
+            
+            # Movies already watched can't go to watch later
+            if list_type == "watch_later" and pending:
+                watched = await run_query(supabase.table("FilmesAssistidos").select("filme_id").eq("perfil_id", perfil_id).in_("filme_id", pending))
+                watched_ids = {row["filme_id"] for row in watched.data}
+                for filme_id in watched_ids:
+                    failures[filme_id] = "Filme já está marcado como assistido e não pode ser adicionado à lista de 'assistir mais tarde'"
+                pending = [filme_id for filme_id in pending if filme_id not in watched_ids]
+            
+            # Movies already in the list need no write
+            if pending:
+                existing = await run_query(supabase.table(table_name).select("filme_id").eq("perfil_id", perfil_id).in_("filme_id", pending))
+                existing_ids = {row["filme_id"] for row in existing.data}
+                pending = [filme_id for filme_id in pending if filme_id not in existing_ids]
+            
+            if pending:
+                if list_type == "watched":
+                    await run_query(supabase.table("FilmesWatchLater").delete().eq("perfil_id", perfil_id).in_("filme_id", pending))
                 
-            results.append(
-                BatchResponseItem(filme_id=filme_id, success=True)
-            )
-        except HTTPException as e:
-            results.append(
-                BatchResponseItem(filme_id=filme_id, success=False, message=str(e.detail))
-            )
+                await run_query(supabase.table(table_name).upsert(
+                    [{"filme_id": filme_id, "perfil_id": perfil_id} for filme_id in pending],
+                    on_conflict="perfil_id,filme_id",
+                    ignore_duplicates=True
+                ))
         except Exception as e:
-            results.append(
-                BatchResponseItem(filme_id=filme_id, success=False, message=str(e))
-            )
+            logger.error(f"Error in batch update of {list_type}: {str(e)}")
+            for filme_id in pending:
+                failures.setdefault(filme_id, str(e))
     
-    return BatchResponse(results=results) 
\ No newline at end of file
+    results = [
+        BatchResponseItem(filme_id=filme_id, success=False, message=failures[filme_id])
+        if filme_id in failures
+        else BatchResponseItem(filme_id=filme_id, success=True)
+        for filme_id in filme_ids
+    ]
+    return BatchResponse(results=results)
@@ -3,6 +3,9 @@ from typing import Optional, List, Dict, Any
 from app.v1.movielist.schemas import *
 from app.v1.movielist.helper import *
 from app.v1.forum.helper import get_current_user
+from app.auth.identity import Identity, identity_dependency
+
+current_identity = identity_dependency(get_current_user)
 
 movielist_routes = APIRouter(prefix="/v1/movielist", tags=["Movie Lists"])
 
@@ -11,24 +14,36 @@ async def get_movie_status_route(
     request: Request,
     filme_id: int = Path(..., description="ID do filme"),
     perfil_id: Optional[int] = Query(None, description="ID do perfil (opcional)"),
-    current_user: dict = Depends(get_current_user)
+    identity: Identity = Depends(current_identity)
 ):
     """Obtém o status de um filme nas listas (favoritos, assistidos, assistir depois)"""
     try:
         supabase = request.app.state.supabase
         
-        # Get user ID from Firebase UID - UserRecord is an object with attributes
-        user_query = supabase.table("Usuario").select("id").eq("firebase_uid", current_user.uid).execute()
-        if not user_query.data or len(user_query.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        # If perfil_id is not provided, use the default profile
+        perfil_id = identity.profile(perfil_id)
         
-        usuario_id = user_query.data[0]['id']
+        return await get_movie_lists_status(supabase, filme_id, perfil_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@movielist_routes.post("/status:batch", response_model=BatchStatusResponse)
+async def get_movies_status_batch_route(
+    request: Request,
+    batch_data: BatchStatusRequest,
+    identity: Identity = Depends(current_identity)
+):
+    """Obtém o status de vários filmes nas listas em uma única requisição"""
+    try:
+        supabase = request.app.state.supabase
         
-        # If perfil_id is not provided, get the default profile
-        if not perfil_id:
-            perfil_id = get_default_profile(supabase, usuario_id)
+        # If perfil_id is not provided, use the default profile
+        perfil_id = identity.profile(batch_data.perfil_id)
         
-        return get_movie_lists_status(supabase, filme_id, perfil_id)
+        statuses = await get_movie_lists_status_batch(supabase, batch_data.filme_ids, perfil_id)
+        return BatchStatusResponse(statuses=statuses)
     except HTTPException:
         raise
     except Exception as e:
@@ -38,23 +53,16 @@ async def get_movie_status_route(
 async def add_to_favorites_route(
     request: Request,
     movie_data: MovieListAction,
-    current_user: dict = Depends(get_current_user)
+    identity: Identity = Depends(current_identity)
 ):
     """Adiciona um filme aos favoritos"""
     try:
         supabase = request.app.state.supabase
         
-        # Get user ID from Firebase UID - UserRecord is an object with attributes
-        user_query = supabase.table("Usuario").select("id").eq("firebase_uid", current_user.uid).execute()
-        if not user_query.data or len(user_query.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
-        
-        usuario_id = user_query.data[0]['id']
+        # If perfil_id is not provided, use the default profile
+        perfil_id = identity.profile(movie_data.perfil_id)
         
-        # If perfil_id is not provided, get the default profile
-        perfil_id = movie_data.perfil_id or get_default_profile(supabase, usuario_id)
-        
-        result = add_movie_to_favorites(supabase, movie_data.filme_id, perfil_id)
+        result = await add_movie_to_favorites(supabase, movie_data.filme_id, perfil_id)
         return result
     except HTTPException:
         raise
@@ -65,23 +73,16 @@ async def add_to_favorites_route(
 async def add_to_watched_route(
     request: Request,
     movie_data: MovieListAction,
-    current_user: dict = Depends(get_current_user)
+    identity: Identity = Depends(current_identity)
 ):
     """Adiciona um filme à lista de assistidos (e remove da lista de assistir depois, se presente)"""
     try:
         supabase = request.app.state.supabase
         
-        # Get user ID from Firebase UID - UserRecord is an object with attributes
-        user_query = supabase.table("Usuario").select("id").eq("firebase_uid", current_user.uid).execute()
-        if not user_query.data or len(user_query.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
-        
-        usuario_id = user_query.data[0]['id']
-        
-        # If perfil_id is not provided, get the default profile
-        perfil_id = movie_data.perfil_id or get_default_profile(supabase, usuario_id)
+        # If perfil_id is not provided, use the default profile
+        perfil_id = identity.profile(movie_data.perfil_id)
         
-        result = add_movie_to_watched(supabase, movie_data.filme_id, perfil_id)
+        result = await add_movie_to_watched(supabase, movie_data.filme_id, perfil_id)
         return result
     except HTTPException:
         raise
@@ -92,23 +93,16 @@ async def add_to_watched_route(
 async def add_to_watch_later_route(
     request: Request,
     movie_data: MovieListAction,
-    current_user: dict = Depends(get_current_user)
+    identity: Identity = Depends(current_identity)
 ):
     """Adiciona um filme à lista de assistir depois (apenas se não estiver na lista de assistidos)"""
     try:
         supabase = request.app.state.supabase
         
-        # Get user ID from Firebase UID - UserRecord is an object with attributes
-        user_query = supabase.table("Usuario").select("id").eq("firebase_uid", current_user.uid).execute()
-        if not user_query.data or len(user_query.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        # If perfil_id is not provided, use the default profile
+        perfil_id = identity.profile(movie_data.perfil_id)
         
-        usuario_id = user_query.data[0]['id']
-        
-        # If perfil_id is not provided, get the default profile
-        perfil_id = movie_data.perfil_id or get_default_profile(supabase, usuario_id)
-        
-        result = add_movie_to_watch_later(supabase, movie_data.filme_id, perfil_id)
+        result = await add_movie_to_watch_later(supabase, movie_data.filme_id, perfil_id)
         return result
     except HTTPException:
         raise
@@ -121,7 +115,7 @@ async def remove_from_list_route(
     list_type: str = Path(..., description="Tipo de lista (favorites, watched, watch_later)"),
     filme_id: int = Path(..., description="ID do filme"),
     perfil_id: Optional[int] = Query(None, description="ID do perfil (opcional)"),
-    current_user: dict = Depends(get_current_user)
+    identity: Identity = Depends(current_identity)
 ):
     """Remove um filme de uma lista específica"""
     try:
@@ -132,18 +126,10 @@ async def remove_from_list_route(
         if list_type not in valid_lists:
             raise HTTPException(status_code=400, detail="Tipo de lista inválido")
         
-        # Get user ID from Firebase UID - UserRecord is an object with attributes
-        user_query = supabase.table("Usuario").select("id").eq("firebase_uid", current_user.uid).execute()
-        if not user_query.data or len(user_query.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
-        
-        usuario_id = user_query.data[0]['id']
+        # If perfil_id is not provided, use the default profile
+        perfil_id = identity.profile(perfil_id)
         
-        # If perfil_id is not provided, get the default profile
-        if not perfil_id:
-            perfil_id = get_default_profile(supabase, usuario_id)
-        
-        return remove_movie_from_list(supabase, list_type, filme_id, perfil_id)
+        return await remove_movie_from_list(supabase, list_type, filme_id, perfil_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -154,7 +140,7 @@ async def get_movies_in_list_route(
     request: Request,
     list_type: str = Path(..., description="Tipo de lista (favorites, watched, watch_later)"),
     perfil_id: Optional[int] = Query(None, description="ID do perfil (opcional)"),
-    current_user: dict = Depends(get_current_user)
+    identity: Identity = Depends(current_identity)
 ):
     """Obtém todos os filmes em uma lista específica"""
     try:
@@ -165,18 +151,10 @@ async def get_movies_in_list_route(
         if list_type not in valid_lists:
             raise HTTPException(status_code=400, detail="Tipo de lista inválido")
         
-        # Get user ID from Firebase UID - UserRecord is an object with attributes
-        user_query = supabase.table("Usuario").select("id").eq("firebase_uid", current_user.uid).execute()
-        if not user_query.data or len(user_query.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
-        
-        usuario_id = user_query.data[0]['id']
-        
-        # If perfil_id is not provided, get the default profile
-        if not perfil_id:
-            perfil_id = get_default_profile(supabase, usuario_id)
+        # If perfil_id is not provided, use the default profile
+        perfil_id = identity.profile(perfil_id)
         
-        return get_movies_in_list(supabase, list_type, perfil_id)
+        return await get_movies_in_list(supabase, list_type, perfil_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -187,23 +165,16 @@ async def batch_update_list_route(
     request: Request,
     list_type: MovieListType,
     batch_data: BatchMovieListOperation,
-    current_user: dict = Depends(get_current_user)
+    identity: Identity = Depends(current_identity)
 ):
     """Adiciona múltiplos filmes a uma lista em operação em lote"""
     try:
         supabase = request.app.state.supabase
         
-        # Get user ID from Firebase UID - UserRecord is an object with attributes
-        user_query = supabase.table("Usuario").select("id").eq("firebase_uid", current_user.uid).execute()
-        if not user_query.data or len(user_query.data) == 0:
-            raise HTTPException(status_code=404, detail="Usuário não encontrado")
-        
-        usuario_id = user_query.data[0]['id']
-        
-        # If perfil_id is not provided, get the default profile
-        perfil_id = batch_data.perfil_id or get_default_profile(supabase, usuario_id)
+        # If perfil_id is not provided, use the default profile
+        perfil_id = identity.profile(batch_data.perfil_id)
         
-        return batch_update_movie_list(
+        return await batch_update_movie_list(
             supabase, list_type.list_type, batch_data.filme_ids, perfil_id
         )
     except HTTPException:
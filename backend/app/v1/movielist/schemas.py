@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Dict
 from datetime import datetime
 
 class MovieListAction(BaseModel):
@@ -21,6 +21,15 @@ class MovieListsStatus(BaseModel):
     is_watched: bool
     is_watch_later: bool
 
+class BatchStatusRequest(BaseModel):
+    """Request for the status of many movies at once"""
+    filme_ids: List[int] = Field(..., min_length=1, max_length=500, description="Lista de IDs de filmes")
+    perfil_id: Optional[int] = Field(None, description="ID do perfil (opcional)")
+
+class BatchStatusResponse(BaseModel):
+    """Status of many movies, keyed by movie id"""
+    statuses: Dict[int, MovieListsStatus]
+
 class MovieListType(BaseModel):
     """Type of movie list for batch operations"""
     list_type: Literal["favorite", "watched", "watch_later"] = Field(
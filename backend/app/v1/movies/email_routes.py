@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, Request, Body, Query, HTTPException, status, Path
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 import logging
 
@@ -29,13 +29,14 @@ movies_email_routes = APIRouter(
     })
 async def get_movie(
     movie_id: int = Query(..., description="ID do filme no TMDB", example=550),
+    request: Request = None,
     current_user: dict = Depends(get_user_by_email)
 ):
     """
     Get movie details by movie ID from TMDB.
     """
     try:
-        movie_data = await helper.fetch_movie_data(movie_id)
+        movie_data = await helper.fetch_movie_data(movie_id, request)
         return movie_data
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -177,13 +178,15 @@ async def list_movies(
     request: Request = None,
     page: int = Query(1, ge=1, description="Número da página", example=1),
     limit: int = Query(10, ge=1, le=100, description="Quantidade de itens por página", example=10),
+    count: Literal["exact", "planned", "estimated", "none"] = Query("exact", description="Modo de contagem do total: exato, planejado, estimado ou nenhum"),
+    after: Optional[str] = Query(None, description="Cursor retornado em meta.next_cursor; quando informado, mesmo vazio, substitui a paginação por página"),
     current_user: dict = Depends(get_user_by_email)
 ):
     """
     List movies from our database with pagination.
     """
     try:
-        result = await helper.list_movies_from_db(request, page, limit)
+        result = await helper.list_movies_from_db(request, page, limit, count, after)
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
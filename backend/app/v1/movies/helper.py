@@ -1,34 +1,29 @@
-from dotenv import load_dotenv
-import os
 from app.v1.movies import schemas
-import requests
+from app.cache import TTLCache
+from app.config import get_settings
+from app.pagination import decode_cursor, next_cursor
+from app.executor import run_query
 from fastapi import Request
+from typing import Optional
 
-async def fetch_movie_data(movie_id: int) -> dict:
+COUNT_MODES = ("exact", "planned", "estimated", "none")
+
+# Short-lived totals per (table, count mode) so paging does not recount on every request
+_count_cache = TTLCache(maxsize=64, ttl=get_settings().cache.movie_count_ttl)
+
+async def fetch_movie_data(movie_id: int, request: Request) -> dict:
     """
-    Fetch movie data from TMDB API using a Bearer token.
+    Fetch movie data from TMDB API through the shared TMDB client.
 
     Args:
         movie_id (int): The TMDB movie ID.
+        request (Request): FastAPI request object to access the TMDB client.
 
     Raises:
         ValueError: If TMDB_BEARER_TOKEN is not found in environment variables.
-        Exception: If the API request fails.
+        TMDBError: If the API request fails.
     """
-    tmdb_bearer_token = os.getenv("TMDB_BEARER_TOKEN")
-    tmdb_url = os.getenv("TMDB_URL")
-    if not tmdb_bearer_token:
-        raise ValueError("TMDB_BEARER_TOKEN not found in .env file")
-
-    url = f"{tmdb_url}/movie/{movie_id}"
-    headers = {"Authorization": f"Bearer {tmdb_bearer_token}"}
-
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise Exception(f"TMDB API Error: {response.status_code} - {response.text}")
+    return await request.app.state.tmdb.get_movie(movie_id)
 
 async def get_movie_from_db(movie_id: int, request: Request) -> dict:
     """
@@ -42,7 +37,7 @@ async def get_movie_from_db(movie_id: int, request: Request) -> dict:
         dict: Movie data from the database.
     """
     try:
-        response = request.app.state.supabase.table("Filme").select("*").eq("id", movie_id).execute()
+        response = await run_query(request.app.state.supabase.table("Filme").select("*").eq("id", movie_id))
         if response.data:
             return response.data[0]
         return None
@@ -61,7 +56,8 @@ async def create_movie_in_db(movie_data: dict, request: Request) -> dict:
         dict: Created movie data.
     """
     try:
-        response = request.app.state.supabase.table("Filme").insert(movie_data).execute()
+        response = await run_query(request.app.state.supabase.table("Filme").insert(movie_data))
+        _count_cache.clear()
         return response.data[0]
     except Exception as e:
         raise Exception(f"Database Error: {str(e)}")
@@ -79,7 +75,7 @@ async def update_movie_in_db(movie_id: int, movie_data: dict, request: Request)
         dict: Updated movie data.
     """
     try:
-        response = request.app.state.supabase.table("Filme").update(movie_data).eq("id", movie_id).execute()
+        response = await run_query(request.app.state.supabase.table("Filme").update(movie_data).eq("id", movie_id))
         return response.data[0]
     except Exception as e:
         raise Exception(f"Database Error: {str(e)}")
@@ -96,36 +92,76 @@ async def delete_movie_from_db(movie_id: int, request: Request) -> bool:
         bool: True if successful, False otherwise.
     """
     try:
-        response = request.app.state.supabase.table("Filme").delete().eq("id", movie_id).execute()
+        response = await run_query(request.app.state.supabase.table("Filme").delete().eq("id", movie_id))
+        _count_cache.clear()
         return bool(response.data)
     except Exception as e:
         raise Exception(f"Database Error: {str(e)}")
 
-async def list_movies_from_db(request: Request, page: int = 1, limit: int = 10) -> dict:
+async def count_movies(request: Request, count: str = "exact") -> Optional[int]:
+    """
+    Count movies using only the server-side count header (no rows are transferred).
+
+    Args:
+        request (Request): FastAPI request object to access the Supabase client.
+        count (str): One of "exact", "planned", "estimated" or "none".
+
+    Returns:
+        Optional[int]: Total number of movies, or None when count is "none".
+    """
+    if count not in COUNT_MODES:
+        raise ValueError(f"Invalid count mode: {count}")
+    if count == "none":
+        return None
+
+    async def load_count():
+        response = await run_query(request.app.state.supabase.table("Filme").select("id", count=count, head=True))
+        return response.count
+
+    return await _count_cache.get_or_load(("Filme", count), load_count)
+
+async def list_movies_from_db(
+    request: Request, page: int = 1, limit: int = 10, count: str = "exact", after: Optional[str] = None
+) -> dict:
     """
     List movies from the database with pagination.
 
+    When `after` is given, keyset pagination on `id` is used instead of the
+    page offset, so deep pages cost the same as the first one. An empty `after`
+    starts keyset pagination from the first movie.
+
     Args:
         request (Request): FastAPI request object to access the Supabase client.
-        page (int): Page number.
+        page (int): Page number (ignored when `after` is given).
         limit (int): Number of items per page.
+        count (str): Count mode for the total, see `count_movies`.
+        after (str, optional): Cursor returned as `next_cursor` by the previous page.
 
     Returns:
         dict: List of movies and pagination info.
     """
     try:
-        start = (page - 1) * limit
-        response = request.app.state.supabase.table("Filme").select("*").range(start, start + limit - 1).execute()
-        count_response = request.app.state.supabase.table("Filme").select("*", count="exact").execute()
+        query = request.app.state.supabase.table("Filme").select("*").order("id")
+        if after is not None:
+            if after:
+                position = decode_cursor(after, ["id"])
+                query = query.gt("id", position["id"])
+            query = query.limit(limit)
+        else:
+            start = (page - 1) * limit
+            query = query.range(start, start + limit - 1)
+        response = await run_query(query)
+        total = await count_movies(request, count)
         
         return {
             "data": response.data,
             "meta": {
-                "total": len(count_response.data),
+                "total": total,
                 "page": page,
                 "limit": limit,
-                "totalPages": (len(count_response.data) + limit - 1) // limit
+                "totalPages": (total + limit - 1) // limit if total is not None else None,
+                "next_cursor": next_cursor(response.data, limit, ["id"])
             }
         }
     except Exception as e:
-        raise Exception(f"Database Error: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Database Error: {str(e)}")
@@ -0,0 +1,347 @@
+"""
+Bulk importer of TMDB popular movies into the Filme table.
+
+Usage:
+    python -m app.v1.movies.importer --pages 1-50 --checkpoint import.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.executor import run_query
+from app.v1.movies.tmdb_client import TMDBClient, TMDBError
+
+logger = logging.getLogger(__name__)
+
+MAX_TMDB_PAGE = 500  # TMDB refuses pages beyond 500
+MAX_RETRIES = 5
+UNKNOWN_GENRE = "Desconhecido"
+UNKNOWN_DIRECTOR = "Unknown"
+
+
+def retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """Seconds to wait from a Retry-After header (seconds or HTTP date), else exponential backoff"""
+    backoff = float(2 ** attempt)
+    if not retry_after:
+        return backoff
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return backoff
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts of up to `capacity`.
+
+    Waiters are served in FIFO order so a burst of concurrent requests is
+    spread evenly over time instead of stampeding the API.
+    """
+
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+@dataclass
+class ImportStats:
+    pages: int = 0
+    films: int = 0
+    upserted: int = 0
+    adopted: int = 0
+    failed_credits: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def films_per_second(self) -> float:
+        return self.films / self.elapsed if self.elapsed else 0.0
+
+
+class Checkpoint:
+    """JSON file remembering the last fully imported page"""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = Path(path) if path else None
+
+    def load(self) -> int:
+        if not self.path or not self.path.exists():
+            return 0
+        try:
+            return int(json.loads(self.path.read_text()).get("last_page", 0))
+        except (ValueError, OSError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {str(e)}")
+            return 0
+
+    def save(self, last_page: int, stats: ImportStats):
+        if not self.path:
+            return
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"last_page": last_page, "films": stats.films, "upserted": stats.upserted}))
+        tmp.replace(self.path)
+
+
+class PopularMoviesImporter:
+    """
+    Crawl `/movie/popular` and upsert the movies into Filme, keyed on tmdb_id.
+
+    Pages are fetched in windows of `page_window` pages; the credits of every
+    film in the window are fetched concurrently (at most `concurrency` in
+    flight) while a shared token bucket keeps the request rate under TMDB's
+    limit. After each window the rows are upserted in chunks of `chunk_size`
+    and the checkpoint is advanced, so an interrupted import resumes from the
+    first page that was not stored.
+
+    Films stored before tmdb_id existed have it NULL; before upserting, each
+    window adopts them by title (see `adopt_legacy_rows`) so they are updated
+    instead of duplicated.
+    """
+
+    def __init__(
+        self,
+        tmdb: TMDBClient,
+        supabase,
+        *,
+        language: str = "en-US",
+        concurrency: int = 16,
+        page_window: int = 5,
+        chunk_size: int = 100,
+        limiter: Optional[TokenBucket] = None,
+        checkpoint: Optional[Checkpoint] = None,
+    ):
+        self.tmdb = tmdb
+        self.supabase = supabase
+        self.language = language
+        self.page_window = page_window
+        self.chunk_size = chunk_size
+        self.limiter = limiter or TokenBucket(tmdb.settings.rate_limit, tmdb.settings.rate_burst)
+        self.checkpoint = checkpoint or Checkpoint(None)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._genre_map: Optional[Dict[int, str]] = None
+
+    async def _get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> dict:
+        """Rate-limited GET, retrying on 429 and 5xx responses"""
+        for attempt in range(MAX_RETRIES):
+            await self.limiter.acquire()
+            async with self._semaphore:
+                response = await self.tmdb.get(path, params=params)
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 429 or response.status_code >= 500:
+                delay = retry_delay(response.headers.get("Retry-After"), attempt)
+                logger.warning(f"TMDB {response.status_code} on {path}, retrying in {delay}s")
+                await asyncio.sleep(delay)
+                continue
+            raise TMDBError(response.status_code, response.text)
+        raise TMDBError(response.status_code, response.text)
+
+    async def genre_map(self) -> Dict[int, str]:
+        """Genre id -> name, fetched once per importer"""
+        if self._genre_map is None:
+            data = await self._get_json("/genre/movie/list", {"language": self.language})
+            self._genre_map = {genre["id"]: genre["name"] for genre in data.get("genres", [])}
+        return self._genre_map
+
+    async def fetch_page(self, page: int) -> List[dict]:
+        data = await self._get_json("/movie/popular", {"language": self.language, "page": page})
+        return data.get("results", [])
+
+    async def fetch_credits(self, movie_id: int) -> Tuple[str, List[str]]:
+        """Director and the first three cast members of a movie"""
+        data = await self._get_json(f"/movie/{movie_id}/credits", {"language": self.language})
+        diretor = next(
+            (person.get("name") for person in data.get("crew", []) if person.get("job") == "Director"),
+            UNKNOWN_DIRECTOR,
+        )
+        elenco = [actor.get("name") for actor in data.get("cast", [])[:3]]
+        return diretor, elenco
+
+    async def build_row(self, movie: dict, stats: ImportStats) -> dict:
+        genres = await self.genre_map()
+        try:
+            diretor, elenco = await self.fetch_credits(movie["id"])
+        except Exception as e:
+            # A missing credits entry should not drop the movie itself
+            logger.error(f"Error fetching credits for movie {movie['id']}: {str(e)}")
+            stats.failed_credits += 1
+            diretor, elenco = UNKNOWN_DIRECTOR, []
+        return {
+            "tmdb_id": movie["id"],
+            "titulo": movie["title"],
+            "sinopse": movie.get("overview"),
+            "avaliacaoMedia": movie.get("vote_average") or 0.0,
+            "genero": [genres.get(gid, UNKNOWN_GENRE) for gid in movie.get("genre_ids", [])],
+            "diretor": diretor,
+            "elenco": elenco,
+        }
+
+    async def adopt_legacy_rows(self, rows: List[dict]) -> int:
+        """
+        Set the TMDB id of Filme rows without one that have the title of an
+        imported film, so the upsert keyed on tmdb_id updates them. Films whose
+        TMDB id is already stored are skipped, and a title shared by several
+        films is only adopted once.
+        """
+        if not rows:
+            return 0
+        titles = sorted({row["titulo"] for row in rows})
+        result = await run_query(
+            self.supabase.table("Filme").select("id, titulo").is_("tmdb_id", "null").in_("titulo", titles)
+        )
+        legacy: Dict[str, int] = {}
+        for row in result.data or []:
+            legacy.setdefault(row["titulo"], row["id"])
+        candidates = [row for row in rows if row["titulo"] in legacy]
+        if not candidates:
+            return 0
+
+        result = await run_query(
+            self.supabase.table("Filme").select("tmdb_id").in_("tmdb_id", [row["tmdb_id"] for row in candidates])
+        )
+        stored = {row["tmdb_id"] for row in result.data or []}
+        adopted = 0
+        for row in candidates:
+            if row["tmdb_id"] in stored:
+                continue
+            filme_id = legacy.pop(row["titulo"], None)
+            if filme_id is None:
+                continue
+            await run_query(self.supabase.table("Filme").update({"tmdb_id": row["tmdb_id"]}).eq("id", filme_id))
+            adopted += 1
+        return adopted
+
+    async def upsert(self, rows: List[dict]) -> int:
+        upserted = 0
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            await run_query(self.supabase.table("Filme").upsert(chunk, on_conflict="tmdb_id"))
+            upserted += len(chunk)
+        return upserted
+
+    async def run(self, first_page: int = 1, last_page: int = 1) -> ImportStats:
+        """Import pages first_page..last_page, resuming after the checkpoint"""
+        stats = ImportStats()
+        started = time.perf_counter()
+        last_page = min(last_page, MAX_TMDB_PAGE)
+        page = max(first_page, self.checkpoint.load() + 1)
+        if page > first_page:
+            logger.info(f"Resuming import from page {page}")
+        seen = set()
+
+        await self.genre_map()
+        while page <= last_page:
+            window = list(range(page, min(page + self.page_window, last_page + 1)))
+            results = await asyncio.gather(*(self.fetch_page(p) for p in window))
+
+            # The popular ranking shifts while crawling, so a film can show up twice
+            movies = []
+            for movie in (movie for page_movies in results for movie in page_movies):
+                if movie["id"] not in seen:
+                    seen.add(movie["id"])
+                    movies.append(movie)
+
+            rows = list(await asyncio.gather(*(self.build_row(movie, stats) for movie in movies)))
+            stats.adopted += await self.adopt_legacy_rows(rows)
+            stats.upserted += await self.upsert(rows)
+            stats.pages += len(window)
+            stats.films += len(rows)
+            stats.elapsed = time.perf_counter() - started
+            self.checkpoint.save(window[-1], stats)
+            logger.info(
+                f"Imported pages {window[0]}-{window[-1]}: {stats.films} films "
+                f"({stats.films_per_second:.1f} films/s)"
+            )
+            page = window[-1] + 1
+
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+
+def _parse_pages(value: str) -> Tuple[int, int]:
+    first, _, last = value.partition("-")
+    first_page, last_page = int(first), int(last or first)
+    if first_page < 1 or last_page < first_page:
+        raise argparse.ArgumentTypeError("Intervalo de páginas inválido")
+    return first_page, last_page
+
+
+async def _main(args) -> ImportStats:
+    from app.config import get_settings
+    from app.supabase_client import create_http_client, create_supabase_client
+
+    settings = get_settings()
+    tmdb = TMDBClient(settings.tmdb)
+    http_client = create_http_client(settings.supabase)
+    try:
+        supabase = await create_supabase_client(settings.supabase, http_client)
+        importer = PopularMoviesImporter(
+            tmdb,
+            supabase,
+            language=args.language,
+            concurrency=args.concurrency,
+            page_window=args.page_window,
+            chunk_size=args.chunk_size,
+            limiter=TokenBucket(args.rate or settings.tmdb.rate_limit, settings.tmdb.rate_burst),
+            checkpoint=Checkpoint(args.checkpoint),
+        )
+        return await importer.run(*args.pages)
+    finally:
+        await tmdb.aclose()
+        await http_client.aclose()
+
+
+def main(argv: Optional[List[str]] = None) -> ImportStats:
+    parser = argparse.ArgumentParser(description="Importa filmes populares do TMDB para a tabela Filme")
+    parser.add_argument("--pages", type=_parse_pages, default=(1, 1), help="Páginas a importar, ex.: 1-50")
+    parser.add_argument("--language", default="en-US")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requisições simultâneas ao TMDB")
+    parser.add_argument("--page-window", type=int, default=5, help="Páginas processadas por lote")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Linhas por upsert")
+    parser.add_argument("--rate", type=float, default=None, help="Requisições por segundo (padrão: TMDB_RATE_LIMIT)")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="Arquivo de checkpoint para retomar a importação")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    stats = asyncio.run(_main(args))
+    print(
+        f"Importação concluída: {stats.films} filmes de {stats.pages} páginas em "
+        f"{stats.elapsed:.1f}s ({stats.films_per_second:.1f} filmes/s, "
+        f"{stats.failed_credits} sem créditos, {stats.adopted} já cadastrados sem tmdb_id)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    main()
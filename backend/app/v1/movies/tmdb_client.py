@@ -0,0 +1,104 @@
+import copy
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.cache import TTLCache
+from app.config import TMDBSettings
+
+logger = logging.getLogger(__name__)
+
+
+class TMDBError(Exception):
+    """Error returned by the TMDB API"""
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+        super().__init__(f"TMDB API Error: {status_code} - {text}")
+
+
+class _NotFound:
+    """Cached marker for movies TMDB answered with 404"""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class TMDBClient:
+    """
+    Shared, keep-alive TMDB client.
+
+    A single instance is created in the application lifespan and stored on
+    `app.state.tmdb`. Movie lookups go through a TTL+LRU cache keyed by movie
+    id; 404 responses are cached for a shorter time, and concurrent lookups of
+    the same movie share one upstream request.
+    """
+
+    def __init__(self, settings: TMDBSettings, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.settings = settings
+        headers = {"Accept": "application/json"}
+        if settings.bearer_token:
+            headers["Authorization"] = f"Bearer {settings.bearer_token}"
+        self._client = httpx.AsyncClient(
+            base_url=settings.url,
+            headers=headers,
+            timeout=settings.timeout,
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+            ),
+            transport=transport,
+        )
+        self.movie_cache = TTLCache(maxsize=settings.cache_size, ttl=settings.cache_ttl)
+        self.upstream_requests = 0
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """Perform a raw GET against the TMDB API"""
+        if not self.settings.bearer_token:
+            raise ValueError("TMDB_BEARER_TOKEN not found in .env file")
+        self.upstream_requests += 1
+        return await self._client.get(path, params=params)
+
+    async def get_movie(self, movie_id: int) -> dict:
+        """
+        Fetch movie details, served from cache when possible.
+
+        Raises:
+            ValueError: If TMDB_BEARER_TOKEN is not configured.
+            TMDBError: If the API answers with a non-200 status.
+        """
+        result = await self.movie_cache.get_or_load(
+            movie_id,
+            lambda: self._load_movie(movie_id),
+            ttl=self._ttl_for,
+        )
+        if isinstance(result, _NotFound):
+            raise TMDBError(404, result.text)
+        # Callers may modify the movie; the cached copy stays as loaded
+        return copy.deepcopy(result)
+
+    async def _load_movie(self, movie_id: int):
+        response = await self.get(f"/movie/{movie_id}")
+        if response.status_code == 200:
+            return response.json()
+        if response.status_code == 404:
+            return _NotFound(response.text)
+        raise TMDBError(response.status_code, response.text)
+
+    def _ttl_for(self, value) -> float:
+        if isinstance(value, _NotFound):
+            return self.settings.negative_cache_ttl
+        return self.settings.cache_ttl
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "movie_cache": self.movie_cache.stats(),
+            "upstream_requests": self.upstream_requests,
+        }
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Body, Path, Quer
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
 from app.auth.sync import get_current_user
+from app.executor import run_query
+from app.auth.identity import invalidate_identity
 
 # Router setup
 profile_routes = APIRouter(
@@ -56,7 +58,7 @@ async def get_current_profile(
         supabase = request.app.state.supabase
         
         # Get user from database
-        user_query = supabase.table("Usuario").select("*").eq("id", current_user["id"]).execute()
+        user_query = await run_query(supabase.table("Usuario").select("*").eq("id", current_user["id"]))
         
         if not user_query.data or len(user_query.data) == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -89,7 +91,8 @@ async def update_profile(
             update_data["email"] = profile_data.email
         
         # Update user in database
-        result = supabase.table("Usuario").update(update_data).eq("id", current_user["id"]).execute()
+        result = await run_query(supabase.table("Usuario").update(update_data).eq("id", current_user["id"]))
+        invalidate_identity(firebase_uid=current_user.get("uid"), email=current_user.get("email"), usuario_id=current_user["id"])
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -111,7 +114,7 @@ async def change_password(
         supabase = request.app.state.supabase
         
         # Get user from database
-        user_query = supabase.table("Usuario").select("senha").eq("id", current_user["id"]).execute()
+        user_query = await run_query(supabase.table("Usuario").select("senha").eq("id", current_user["id"]))
         
         if not user_query.data or len(user_query.data) == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -126,7 +129,7 @@ async def change_password(
         hashed_password = get_password_hash(password_data.newPassword)
         
         # Update password in database
-        result = supabase.table("Usuario").update({"senha": hashed_password}).eq("id", current_user["id"]).execute()
+        result = await run_query(supabase.table("Usuario").update({"senha": hashed_password}).eq("id", current_user["id"]))
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -147,7 +150,8 @@ async def delete_profile(
         supabase = request.app.state.supabase
         
         # Delete user from database
-        result = supabase.table("Usuario").delete().eq("id", current_user["id"]).execute()
+        result = await run_query(supabase.table("Usuario").delete().eq("id", current_user["id"]))
+        invalidate_identity(firebase_uid=current_user.get("uid"), email=current_user.get("email"), usuario_id=current_user["id"])
         
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -186,7 +190,7 @@ async def get_user_profile(
         supabase = request.app.state.supabase
         
         # Get user from database
-        user_query = supabase.table("Usuario").select("*").eq("id", user_id).execute()
+        user_query = await run_query(supabase.table("Usuario").select("*").eq("id", user_id))
         
         if not user_query.data or len(user_query.data) == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -207,7 +211,7 @@ async def get_user_by_username(
         supabase = request.app.state.supabase
         
         # Get user from database
-        user_query = supabase.table("Usuario").select("*").eq("username", username).execute()
+        user_query = await run_query(supabase.table("Usuario").select("*").eq("username", username))
         
         if not user_query.data or len(user_query.data) == 0:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, BackgroundTasks
 from app.v1.user.schemas import UserCreate, UserUpdate, UserResponse
 from app.v1.user.helper import *
+from app.executor import run_blocking
 from app.auth.email_auth import get_user_by_email
 from firebase_admin import auth
 import asyncio
@@ -12,7 +13,7 @@ user_email_routes = APIRouter(prefix="/v1/email/users", tags=["Users Email Auth"
 async def create_user_route(user: UserCreate, request: Request):
     """Rota para criar um novo usuário com autenticação por e-mail."""
     try:
-        return create_user(user, request)
+        return await create_user(user, request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
@@ -21,7 +22,7 @@ async def create_user_route(user: UserCreate, request: Request):
 async def list_users_route():
     """Rota para listar todos os usuários com autenticação por e-mail."""
     try:
-        return list_users()
+        return await list_users()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -30,7 +31,7 @@ async def list_users_route():
 async def get_user_route(uid: str):
     """Rota para obter informações de um usuário pelo UID com autenticação por e-mail."""
     try:
-        return get_user(uid)
+        return await get_user(uid)
     except Exception as e:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
@@ -44,7 +45,7 @@ async def update_user_route(
 ):
     """Rota para atualizar um usuário com autenticação por e-mail."""
     try:
-        return update_user(uid, user, request)
+        return await update_user(uid, user, request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -57,7 +58,7 @@ async def delete_user_route(
 ):
     """Rota para deletar um usuário com autenticação por e-mail."""
     try:
-        return delete_user(uid, request)
+        return await delete_user(uid, request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -96,7 +97,7 @@ async def sync_single_user_route(
         
         # Get the Firebase user
         try:
-            firebase_user = auth.get_user(uid)
+            firebase_user = await run_blocking(auth.get_user, uid)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Usuário Firebase não encontrado: {str(e)}")
         
@@ -4,24 +4,26 @@ from app.v1.user.schemas import *
 from fastapi import Depends, Request
 import logging
 import asyncio
+from app.executor import run_blocking
 
 logger = logging.getLogger(__name__)
 
 async def get_user_synchronizer(request: Request):
     return request.app.state.user_synchronizer
 
-def create_user(user_data: UserCreate, request: Request = None) -> UserResponse:
+async def create_user(user_data: UserCreate, request: Request = None) -> UserResponse:
     """Cria um novo usuário no Firebase Authentication e sincroniza com Supabase."""
     try:
         # Create user in Firebase
-        user = auth.create_user(
+        user = await run_blocking(
+            auth.create_user,
             email=user_data.email,
             password=user_data.password,
             display_name=user_data.display_name or user_data.email.split('@')[0],
         )
         
         # Set custom claims for Supabase integration
-        auth.set_custom_user_claims(user.uid, {
+        await run_blocking(auth.set_custom_user_claims, user.uid, {
             'role': 'authenticated',  # Required for Supabase RLS
         })
         
@@ -49,17 +51,17 @@ def create_user(user_data: UserCreate, request: Request = None) -> UserResponse:
         raise e
 
 
-def get_user(uid: str) -> UserResponse:
+async def get_user(uid: str) -> UserResponse:
     """Obtém um usuário pelo UID."""
     try:
-        user = auth.get_user(uid)
+        user = await run_blocking(auth.get_user, uid)
         return UserResponse(uid=user.uid, email=user.email, display_name=user.display_name or user.email.split('@')[0])
     except Exception as e:
         logger.error(f"Error getting user {uid}: {str(e)}")
         raise e
 
 
-def update_user(uid: str, user_data: UserUpdate, request: Request = None) -> UserResponse:
+async def update_user(uid: str, user_data: UserUpdate, request: Request = None) -> UserResponse:
     """Atualiza as informações de um usuário e sincroniza com Supabase."""
     try:
         update_fields = {}
@@ -70,7 +72,7 @@ def update_user(uid: str, user_data: UserUpdate, request: Request = None) -> Use
             update_fields["password"] = user_data.password
 
         # Update user in Firebase
-        user = auth.update_user(uid, **update_fields)
+        user = await run_blocking(auth.update_user, uid, **update_fields)
         
         # Synchronize with Supabase
         if request and hasattr(request.app.state, 'user_synchronizer'):
@@ -95,7 +97,7 @@ def update_user(uid: str, user_data: UserUpdate, request: Request = None) -> Use
         raise e
 
 
-def delete_user(uid: str, request: Request = None) -> dict:
+async def delete_user(uid: str, request: Request = None) -> dict:
     """Exclui um usuário e sincroniza a exclusão com Supabase."""
     try:
         # Synchronize deletion with Supabase before deleting from Firebase
@@ -120,17 +122,17 @@ def delete_user(uid: str, request: Request = None) -> dict:
                 logger.error(f"Error scheduling user deletion synchronization: {str(e)}")
         
         # Delete user from Firebase
-        auth.delete_user(uid)
+        await run_blocking(auth.delete_user, uid)
         return {"message": "Usuário deletado com sucesso"}
     except Exception as e:
         logger.error(f"Error deleting user {uid}: {str(e)}")
         raise e
 
 
-def list_users() -> UserList:
+async def list_users() -> UserList:
     """Lists all users."""
     try:
-        page = auth.list_users()
+        page = await run_blocking(auth.list_users)
         users = []
         while page:
             for user in page.users:
@@ -141,7 +143,7 @@ def list_users() -> UserList:
                         display_name=user.display_name or user.email.split('@')[0]
                     )
                 )
-            page = page.get_next_page()
+            page = await run_blocking(page.get_next_page)
         return UserList(users=users)
     except Exception as e:
         logger.error(f"Failed to list users: {str(e)}")
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, BackgroundTasks
 from app.v1.user.schemas import UserCreate, UserUpdate, UserResponse
 from app.v1.user.helper import *
+from app.executor import run_blocking
 from firebase_admin import auth
 import asyncio
 
@@ -11,7 +12,7 @@ user_routes = APIRouter(prefix="/v1/users", tags=["Users"])
 async def create_user_route(user: UserCreate, request: Request):
     """Rota para criar um novo usuário."""
     try:
-        return create_user(user, request)
+        return await create_user(user, request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
@@ -20,7 +21,7 @@ async def create_user_route(user: UserCreate, request: Request):
 async def list_users_route():
     """Rota para listar todos os usuários."""
     try:
-        return list_users()
+        return await list_users()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -29,7 +30,7 @@ async def list_users_route():
 async def get_user_route(uid: str):
     """Rota para obter informações de um usuário pelo UID."""
     try:
-        return get_user(uid)
+        return await get_user(uid)
     except Exception as e:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
@@ -38,7 +39,7 @@ async def get_user_route(uid: str):
 async def update_user_route(uid: str, user: UserUpdate, request: Request):
     """Rota para atualizar um usuário."""
     try:
-        return update_user(uid, user, request)
+        return await update_user(uid, user, request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -47,7 +48,7 @@ async def update_user_route(uid: str, user: UserUpdate, request: Request):
 async def delete_user_route(uid: str, request: Request):
     """Rota para deletar um usuário."""
     try:
-        return delete_user(uid, request)
+        return await delete_user(uid, request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -78,7 +79,7 @@ async def sync_single_user_route(uid: str, request: Request):
         
         # Get the Firebase user
         try:
-            firebase_user = auth.get_user(uid)
+            firebase_user = await run_blocking(auth.get_user, uid)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Usuário Firebase não encontrado: {str(e)}")
         
@@ -98,7 +99,7 @@ async def sync_single_user_route(uid: str, request: Request):
 async def sync_all_firebase_users(synchronizer):
     """Sincroniza todos os usuários do Firebase com o Supabase."""
     try:
-        page = auth.list_users()
+        page = await run_blocking(auth.list_users)
         count = 0
         sync_count = 0
         
@@ -108,7 +109,7 @@ async def sync_all_firebase_users(synchronizer):
                 try:
                     # Check if user has authenticated role
                     if not user.custom_claims or 'role' not in user.custom_claims:
-                        auth.set_custom_user_claims(user.uid, {'role': 'authenticated'})
+                        await run_blocking(auth.set_custom_user_claims, user.uid, {'role': 'authenticated'})
                     
                     # Sync with Supabase
                     result = await synchronizer.create_user_in_supabase(user)
@@ -117,7 +118,7 @@ async def sync_all_firebase_users(synchronizer):
                 except Exception as e:
                     logger.error(f"Error synchronizing user {user.uid}: {str(e)}")
             
-            page = page.get_next_page()
+            page = await run_blocking(page.get_next_page)
         
         #logger.info(f"Synchronized {sync_count} out of {count} users")
     except Exception as e:
@@ -24,7 +24,8 @@ def main():
         host="0.0.0.0",  # Allow external connections
         port=8000,
         reload=False,  # Disable reload in production
-        log_level="info"
+        log_level="info",
+        ws_per_message_deflate=get_settings().chat.per_message_deflate
     )
 
 if __name__ == "__main__":
@@ -26,7 +26,8 @@ def main():
         port=8000,
         reload=True,  # Enable auto-reload
         reload_dirs=watch_dirs,  # Specify which directories to watch
-        log_level="debug"  # More verbose logging for development
+        log_level="debug",  # More verbose logging for development
+        ws_per_message_deflate=get_settings().chat.per_message_deflate
     )
 
 if __name__ == "__main__":
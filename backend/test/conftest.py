@@ -6,7 +6,7 @@ import pytest
 import json
 from datetime import datetime
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from firebase_admin.auth import UserRecord
 
@@ -722,7 +722,8 @@ def patch_httpx():
 @pytest.fixture(autouse=True)
 def mock_supabase_client():
     mock_client = MockSupabaseClient()
-    with patch('supabase.create_client', return_value=mock_client) as mock:
+    with patch('supabase.create_client', return_value=mock_client) as mock, \
+         patch('app.supabase_client.acreate_client', AsyncMock(return_value=mock_client)):
         yield mock, mock_client
 
 # Override the app.state.supabase in routes
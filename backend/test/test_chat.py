@@ -1,5 +1,7 @@
 import pytest
+import pytest_asyncio
 import json
+import asyncio
 import logging
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock, AsyncMock
@@ -309,4 +311,1095 @@ class TestChatRoutes:
     ])
     def test_error_handling(self, client, endpoint, method, expected_status, auth_headers):
         """Test error handling for various scenarios"""
-        pass 
\ No newline at end of file
+        pass 
+
+class TestMessagePagination:
+    """Test suite for cursor pagination of group messages"""
+
+    @pytest.fixture
+    def mock_supabase(self):
+        supabase = MagicMock()
+        query = supabase.table.return_value
+        for method in ("select", "eq", "or_", "order", "limit"):
+            getattr(query, method).return_value = query
+        query.execute.return_value = MagicMock(data=[
+            {"id": "m2", "content": "b", "group_id": "g1", "sender_id": "u1", "created_at": "2024-01-01T10:00:01"},
+            {"id": "m1", "content": "a", "group_id": "g1", "sender_id": "u1", "created_at": "2024-01-01T10:00:00"},
+        ])
+        yield supabase, query
+
+    @pytest.mark.asyncio
+    async def test_first_page_returns_cursor(self, mock_supabase):
+        """A full page returns a cursor pointing at its oldest message"""
+        from app.v1.chat.service import ChatService
+        from app.pagination import decode_cursor
+        supabase, query = mock_supabase
+
+        with Timer("messages_cursor_first_page"):
+            page = await ChatService(supabase).get_group_messages_page("g1", limit=2)
+
+        query.or_.assert_not_called()
+        assert [m.id for m in page.messages] == ["m2", "m1"]
+        assert decode_cursor(page.next_cursor, ["created_at", "id"]) == {"created_at": "2024-01-01T10:00:00", "id": "m1"}
+
+    @pytest.mark.asyncio
+    async def test_after_cursor_filters_by_keyset(self, mock_supabase):
+        """The cursor becomes a (created_at, id) keyset filter"""
+        from app.v1.chat.service import ChatService
+        from app.pagination import encode_cursor
+        supabase, query = mock_supabase
+
+        cursor = encode_cursor({"created_at": "2024-01-01T10:00:00", "id": "m1"})
+        page = await ChatService(supabase).get_group_messages_page("g1", limit=5, after=cursor)
+
+        query.or_.assert_called_once_with(
+            'created_at.lt."2024-01-01T10:00:00",and(created_at.eq."2024-01-01T10:00:00",id.lt."m1")'
+        )
+        assert page.next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_is_rejected(self, mock_supabase):
+        from app.v1.chat.service import ChatService
+        supabase, _ = mock_supabase
+
+        with pytest.raises(ValueError):
+            await ChatService(supabase).get_group_messages_page("g1", after="not-a-cursor")
+
+    @pytest.mark.asyncio
+    async def test_route_requires_membership(self):
+        """Only members read a group's messages, in either pagination mode"""
+        from fastapi import HTTPException
+        from app.v1.chat import routes
+        from app.v1.chat.models import MessagePage
+        service = MagicMock(
+            is_member=AsyncMock(side_effect=lambda group_id, user_id: user_id == "u1"),
+            get_group_messages_page=AsyncMock(return_value=MessagePage(messages=[], next_cursor=None)),
+        )
+
+        page = await routes.get_group_messages("g1", 50, 0, "", {"uid": "u1"}, service)
+        for after in (None, ""):
+            with pytest.raises(HTTPException) as exc:
+                await routes.get_group_messages("g1", 50, 0, after, {"uid": "u9"}, service)
+            assert exc.value.status_code == 403
+
+        assert page.next_cursor is None
+        service.get_group_messages_page.assert_awaited_once_with("g1", 50, "")
+        service.get_group_messages.assert_not_called()
+
+
+class FakeWebSocket:
+    """Minimal WebSocket stand-in recording the frames it was sent"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.frames = []
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def send_text(self, frame):
+        if self.fail:
+            raise RuntimeError("socket closed")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+    async def send_bytes(self, frame):
+        await self.send_text(frame)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+async def join(manager, socket, group_id, user_id):
+    """Connect a socket and subscribe it to one group"""
+    connection = await manager.connect(socket, user_id)
+    await manager.subscribe(connection, group_id)
+    return connection
+
+
+class TestConnectionManager:
+    """Test suite for the backpressured chat broadcast"""
+
+    @pytest_asyncio.fixture
+    async def manager(self):
+        from app.config import ChatSettings
+        from app.v1.chat.connections import ConnectionManager
+        manager = ConnectionManager(ChatSettings(send_queue_size=2, send_timeout=0.5))
+        yield manager
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_broadcast_serializes_once(self, manager):
+        """Every recipient gets the same frame, encoded a single time"""
+        from datetime import datetime
+        from app.v1.chat.connections import encode_frame
+        sockets = [FakeWebSocket() for _ in range(3)]
+        for n, socket in enumerate(sockets):
+            await join(manager, socket, "g1", f"u{n}")
+
+        with patch("app.v1.chat.connections.encode_frame", wraps=encode_frame) as encode, Timer("chat_broadcast"):
+            await manager.send_message({"id": "m1", "created_at": datetime(2024, 1, 1)}, "g1")
+            await asyncio.sleep(0.01)
+
+        assert encode.call_count == 1
+        assert all(socket.frames == ['{"id":"m1","created_at":"2024-01-01T00:00:00"}'] for socket in sockets)
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_is_evicted(self, manager):
+        """A client that cannot keep up is dropped without delaying the others"""
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=10)
+        await join(manager, fast, "g1", "fast")
+        await join(manager, slow, "g1", "slow")
+
+        for n in range(5):
+            await manager.send_message({"n": n}, "g1")
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.01)
+
+        assert len(fast.frames) == 5
+        assert slow.close_code == 1013
+        assert [c.user_id for c in manager.active_connections["g1"]] == ["fast"]
+        stats = manager.stats()
+        assert stats["dropped"] == 1 and stats["evicted"] == 1 and stats["connections"] == 1
+
+    @pytest.mark.asyncio
+    async def test_broken_socket_does_not_abort_broadcast(self, manager):
+        """A socket failing to send is removed and the rest still receive"""
+        broken, healthy = FakeWebSocket(fail=True), FakeWebSocket()
+        await join(manager, broken, "g1", "broken")
+        await join(manager, healthy, "g1", "healthy")
+
+        await manager.send_message({"n": 1}, "g1")
+        await asyncio.sleep(0.01)
+
+        assert healthy.frames == ['{"n":1}']
+        assert [c.user_id for c in manager.active_connections["g1"]] == ["healthy"]
+        assert manager.stats()["send_errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_one_socket_many_groups(self, manager):
+        """A multiplexed socket receives every subscribed group and drops out of all on disconnect"""
+        socket = FakeWebSocket()
+        connection = await manager.connect(socket, "u1")
+        for group_id in ("g1", "g2", "g3"):
+            assert await manager.subscribe(connection, group_id)
+
+        await manager.send_message({"n": 1}, "g1")
+        await manager.send_message({"n": 2}, "g3")
+        manager.unsubscribe(connection, "g3")
+        await manager.send_message({"n": 3}, "g3")
+        await asyncio.sleep(0.01)
+
+        assert socket.frames == ['{"n":1}', '{"n":2}']
+        assert connection.groups == {"g1", "g2"}
+
+        manager.disconnect(connection)
+        assert manager.active_connections == {}
+        assert manager.stats()["connections"] == 0
+
+    @pytest.mark.asyncio
+    async def test_tabs_of_a_user_do_not_replace_each_other(self, manager):
+        first_tab, second_tab = FakeWebSocket(), FakeWebSocket()
+        await join(manager, first_tab, "g1", "u1")
+        await join(manager, second_tab, "g1", "u1")
+
+        await manager.send_message({"n": 1}, "g1")
+        await asyncio.sleep(0.01)
+
+        assert first_tab.frames == second_tab.frames == ['{"n":1}']
+        assert manager.stats()["users"] == 1 and manager.stats()["connections"] == 2
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_pings_then_reaps_idle_sockets(self):
+        """Quiet sockets are pinged; sockets that never answer are closed"""
+        from app.config import ChatSettings
+        from app.v1.chat.connections import ConnectionManager
+        now = [0.0]
+        manager = ConnectionManager(ChatSettings(heartbeat_interval=10, idle_timeout=30), clock=lambda: now[0])
+        quiet, active = FakeWebSocket(), FakeWebSocket()
+        quiet_connection = await join(manager, quiet, "g1", "u1")
+        active_connection = await join(manager, active, "g1", "u2")
+
+        now[0] = 15
+        active_connection.touch()
+        manager.sweep()
+        await asyncio.sleep(0.01)
+        assert quiet.frames == ['{"type":"ping"}'] and active.frames == []
+
+        now[0] = 31
+        manager.sweep()
+        await asyncio.sleep(0.01)
+        assert quiet.close_code == 1001 and active.close_code is None
+        assert quiet_connection not in manager.connections
+        stats = manager.stats()
+        assert stats["reaped"] == 1 and stats["pings"] == 2 and stats["connections"] == 1
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_memory_gauge_tracks_queued_frames(self, manager):
+        slow = FakeWebSocket(delay=10)
+        connection = await join(manager, slow, "g1", "u1")
+        baseline = manager.stats()["memory_bytes"]
+
+        await manager.send_message({"content": "x" * 1000}, "g1")
+        await manager.send_message({"content": "x" * 1000}, "g1")
+        await asyncio.sleep(0.01)
+
+        stats = manager.stats()
+        assert stats["queued_bytes"] >= 1000
+        assert stats["memory_bytes"] >= baseline + 1000
+
+        manager.disconnect(connection)
+        assert manager.stats()["queued_bytes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_subscriptions_are_capped(self):
+        from app.config import ChatSettings
+        from app.v1.chat.connections import ConnectionManager
+        manager = ConnectionManager(ChatSettings(max_subscriptions=2))
+        connection = await manager.connect(FakeWebSocket(), "u1")
+
+        assert await manager.subscribe(connection, "g1")
+        assert await manager.subscribe(connection, "g2")
+        assert not await manager.subscribe(connection, "g3")
+        await manager.close_all()
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio pub/sub API, shared by several workers"""
+
+    def __init__(self):
+        self.pubsubs = []
+        self.closed = False
+
+    def pubsub(self):
+        pubsub = FakePubSub()
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+    async def publish(self, channel, data):
+        receivers = [p for p in self.pubsubs if channel in p.channels]
+        for pubsub in receivers:
+            pubsub.messages.put_nowait({"type": "message", "channel": channel.encode(), "data": data.encode()})
+        return len(receivers)
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+class TestChatBackplane:
+    """Test suite for the cross-worker chat fan-out"""
+
+    @pytest_asyncio.fixture
+    async def workers(self):
+        from app.config import ChatSettings
+        from app.v1.chat.backplane import RedisBackplane
+        from app.v1.chat.connections import ConnectionManager
+        redis = FakeRedis()
+        workers = [
+            ConnectionManager(ChatSettings(), RedisBackplane(redis, poll_timeout=0.01))
+            for _ in range(2)
+        ]
+        for worker in workers:
+            await worker.start()
+        yield workers
+        for worker in workers:
+            await worker.close_all()
+
+    @pytest.mark.asyncio
+    async def test_publish_reaches_every_worker(self, workers):
+        """A message sent on one worker is delivered to the group's sockets on all of them"""
+        first, second = workers
+        local, remote, other_group = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await join(first, local, "g1", "u1")
+        await join(second, remote, "g1", "u2")
+        await join(second, other_group, "g2", "u3")
+
+        with Timer("chat_backplane_publish"):
+            await first.send_message({"id": "m1"}, "g1")
+            await asyncio.sleep(0.05)
+
+        assert local.frames == ['{"id":"m1"}']
+        assert remote.frames == ['{"id":"m1"}']
+        assert other_group.frames == []
+        assert first.stats()["backplane"]["published"] == 1
+
+    @pytest.mark.asyncio
+    async def test_presence_diffs_stay_on_their_worker(self, workers):
+        """A user leaving one worker is not reported offline to sockets on the other"""
+        first, second = workers
+        local, remote = FakeWebSocket(), FakeWebSocket()
+        await join(first, local, "g1", "u1")
+        tab = await join(first, FakeWebSocket(), "g1", "u2")
+        await join(second, remote, "g1", "u2")
+        await first.flush_presence()
+        await second.flush_presence()
+
+        first.disconnect(tab)
+        await first.flush_presence()
+        await asyncio.sleep(0.05)
+
+        assert [json.loads(frame)["online"] for frame in remote.frames] == [["u2"]]
+        assert json.loads(local.frames[-1]) == {"type": "presence", "group_id": "g1", "offline": ["u2"]}
+        assert first.stats()["backplane"]["published"] == 0
+
+    @pytest.mark.asyncio
+    async def test_worker_unsubscribes_from_empty_group(self, workers):
+        """Channels are only held while the worker has sockets in the group"""
+        first, _ = workers
+        connection = await join(first, FakeWebSocket(), "g1", "u1")
+        assert first.backplane.stats()["channels"] == 2  # g1 and the roster channel
+
+        first.disconnect(connection)
+        await asyncio.sleep(0)
+
+        assert first.backplane.stats()["channels"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_release_is_kept_and_logged(self, workers, caplog):
+        """Background releases are referenced until they end and their errors are logged"""
+        first, _ = workers
+        connection = await join(first, FakeWebSocket(), "g1", "u1")
+        first.backplane._pubsub.unsubscribe = AsyncMock(side_effect=ConnectionError("redis is gone"))
+
+        with caplog.at_level(logging.ERROR):
+            first.disconnect(connection)
+            assert len(first._tasks) == 1
+            await asyncio.sleep(0.01)
+
+        assert not first._tasks
+        assert "Error releasing chat group g1: redis is gone" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_new_member_is_admitted_on_every_worker(self, workers):
+        """A member added through one worker is not refused by another worker's cached roster"""
+        from app.v1.chat import roster
+        first, second = workers
+        roster._rosters.set("g1", {"u1": "admin"})
+        roster._user_groups.set("u2", set())
+        try:
+            await first.announce_member("g1", "u2")
+            await asyncio.sleep(0.05)
+
+            assert roster._rosters.get("g1") == {"u1": "admin", "u2": "member"}
+            assert roster._user_groups.get("u2") == {"g1"}
+            assert first.stats()["broadcasts"] == 0
+        finally:
+            roster._rosters.clear()
+            roster._user_groups.clear()
+
+    def test_in_process_backplane_by_default(self):
+        """A single worker needs no external broker"""
+        from app.config import ChatSettings
+        from app.v1.chat.backplane import InProcessBackplane, create_backplane
+        assert isinstance(create_backplane(ChatSettings()), InProcessBackplane)
+        with pytest.raises(ValueError):
+            create_backplane(ChatSettings(backplane="kafka"))
+
+
+class TestMessageWriter:
+    """Test suite for the write-behind chat message persistence"""
+
+    @pytest.fixture
+    def mock_supabase(self):
+        supabase = MagicMock()
+        upsert = supabase.table.return_value.upsert
+        upsert.return_value.execute.return_value = MagicMock(data=[{}])
+        yield supabase, upsert
+
+    def _writer(self, **settings):
+        from app.config import ChatSettings
+        from app.v1.chat.writer import MessageWriter
+        return MessageWriter(ChatSettings(**settings))
+
+    def _messages(self, count):
+        from app.v1.chat.models import Message
+        return [Message(content=f"m{n}", group_id="g1", sender_id="u1") for n in range(count)]
+
+    @pytest.mark.asyncio
+    async def test_messages_are_group_committed(self, mock_supabase):
+        """Messages arriving within the interval share one bulk insert, in order"""
+        supabase, upsert = mock_supabase
+        writer = self._writer(write_interval=0.05)
+        await writer.start(supabase)
+        messages = self._messages(5)
+
+        with Timer("chat_group_commit"):
+            for message in messages:
+                await writer.submit(message)
+            await writer.flush()
+        await writer.close()
+
+        upsert.assert_called_once()
+        rows = upsert.call_args.args[0]
+        assert [row["id"] for row in rows] == [m.id for m in messages]
+        assert isinstance(rows[0]["created_at"], str)
+        assert upsert.call_args.kwargs == {"on_conflict": "id"}
+
+    @pytest.mark.asyncio
+    async def test_batches_are_capped(self, mock_supabase):
+        supabase, upsert = mock_supabase
+        writer = self._writer(write_interval=0.05, write_batch_size=2)
+        await writer.start(supabase)
+
+        for message in self._messages(5):
+            await writer.submit(message)
+        await writer.close()
+
+        assert [len(call.args[0]) for call in upsert.call_args_list] == [2, 2, 1]
+        assert writer.stats()["written"] == 5
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried(self, mock_supabase):
+        """A transient error does not lose the batch"""
+        supabase, upsert = mock_supabase
+        upsert.return_value.execute.side_effect = [Exception("connection reset"), MagicMock(data=[{}])]
+        writer = self._writer()
+        await writer.start(supabase)
+
+        await writer.submit(self._messages(1)[0])
+        await writer.close()
+
+        assert upsert.return_value.execute.call_count == 2
+        assert writer.stats()["retries"] == 1
+        assert writer.stats()["written"] == 1
+        assert writer.stats()["failed"] == 0
+
+    @pytest.mark.asyncio
+    async def test_flush_does_not_wait_for_later_messages(self, mock_supabase):
+        """A read ack returns while other members keep sending"""
+        import asyncio
+        from app.v1.chat.models import Message
+        supabase, upsert = mock_supabase
+        writer = self._writer(write_interval=0.01, write_batch_size=5)
+        await writer.start(supabase)
+        first = self._messages(1)[0]
+        await writer.submit(first)
+
+        async def chatter():
+            while True:
+                await writer.submit(Message(content="oi", group_id="g1", sender_id="u2"))
+                await asyncio.sleep(0)
+
+        sender = asyncio.create_task(chatter())
+        try:
+            with Timer("chat_flush_under_load"):
+                await asyncio.wait_for(writer.flush(), timeout=2)
+        finally:
+            sender.cancel()
+        written = [row["id"] for call in upsert.call_args_list for row in call.args[0]]
+        assert first.id in written
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_pending_messages(self, mock_supabase):
+        """Shutdown writes whatever is still buffered"""
+        supabase, upsert = mock_supabase
+        writer = self._writer(write_interval=10)
+        await writer.start(supabase)
+
+        for message in self._messages(3):
+            await writer.submit(message)
+        await writer.close()
+
+        assert writer.stats()["written"] == 3
+        with pytest.raises(RuntimeError):
+            await writer.submit(self._messages(1)[0])
+
+
+class TestRosterCache:
+    """Test suite for the cached chat group rosters"""
+
+    @pytest.fixture(autouse=True)
+    def clear_rosters(self):
+        from app.v1.chat import roster
+        for cache in (roster._rosters, roster._user_groups, roster._groups):
+            cache.clear()
+        yield
+        for cache in (roster._rosters, roster._user_groups, roster._groups):
+            cache.clear()
+
+    @pytest.fixture
+    def mock_supabase(self):
+        supabase = MagicMock()
+        tables = {}
+
+        def table(name):
+            if name not in tables:
+                query = MagicMock()
+                for method in ("select", "eq", "in_", "insert"):
+                    getattr(query, method).return_value = query
+                tables[name] = query
+            return tables[name]
+
+        supabase.table.side_effect = table
+        table("group_members").execute.return_value = MagicMock(data=[
+            {"user_id": "u1", "role": "admin", "group_id": "g1"},
+            {"user_id": "u2", "role": "member", "group_id": "g1"},
+        ])
+        table("chat_groups").execute.return_value = MagicMock(data=[
+            {"id": "g1", "name": "Cinéfilos", "created_by": "u1"},
+        ])
+        yield supabase, tables
+
+    @pytest.mark.asyncio
+    async def test_membership_checks_hit_the_roster(self, mock_supabase):
+        """Only the first check of a group reaches the database"""
+        from app.v1.chat.service import ChatService
+        supabase, tables = mock_supabase
+        service = ChatService(supabase)
+
+        with Timer("chat_roster_lookup"):
+            results = [await service.is_member("g1", user) for user in ("u1", "u2", "u3") * 10]
+
+        assert results[:3] == [True, True, False]
+        assert tables["group_members"].execute.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_added_member_is_recorded(self, mock_supabase):
+        """Adding a member updates the cached roster instead of dropping it"""
+        from fastapi import HTTPException
+        from app.v1.chat.service import ChatService
+        supabase, tables = mock_supabase
+        service = ChatService(supabase)
+
+        assert not await service.is_member("g1", "u3")
+        await service.add_user_to_group("g1", "u3")
+
+        assert await service.is_member("g1", "u3")
+        with pytest.raises(HTTPException):
+            await service.add_user_to_group("g1", "u3")
+        assert tables["group_members"].execute.call_count == 2  # roster load + insert
+
+    @pytest.mark.asyncio
+    async def test_list_user_groups_is_cached(self, mock_supabase):
+        from app.v1.chat.service import ChatService
+        supabase, tables = mock_supabase
+        tables["group_members"].execute.return_value = MagicMock(data=[{"group_id": "g1"}])
+        service = ChatService(supabase)
+
+        first = await service.list_user_groups("u1")
+        second = await service.list_user_groups("u1")
+
+        assert [g.id for g in first] == [g.id for g in second] == ["g1"]
+        assert tables["group_members"].execute.call_count == 1
+        assert tables["chat_groups"].execute.call_count == 1
+
+
+class ScriptedWebSocket(FakeWebSocket):
+    """FakeWebSocket that also plays back a list of client frames, then disconnects"""
+
+    def __init__(self, incoming, token="t", subprotocols=()):
+        super().__init__()
+        self.incoming = list(incoming)
+        self.query_params = {"token": token} if token else {}
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.app = MagicMock()
+
+    async def receive_json(self):
+        from fastapi import WebSocketDisconnect
+        # Let the writer task flush the replies to the previous frame
+        await asyncio.sleep(0.01)
+        if not self.incoming:
+            raise WebSocketDisconnect(1000)
+        frame = self.incoming.pop(0)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    def sent(self):
+        return [json.loads(frame) for frame in self.frames]
+
+
+class TestMultiplexedWebSocket:
+    """Test suite for the multiplexed chat websocket"""
+
+    @pytest_asyncio.fixture
+    async def endpoint(self):
+        from app.v1.chat import routes
+        from app.v1.chat.connections import ConnectionManager
+        manager = ConnectionManager()
+        with patch.object(routes, "manager", manager), \
+             patch.object(routes, "writer", MagicMock(submit=AsyncMock(), flush=AsyncMock())), \
+             patch.object(routes, "verify_token", AsyncMock(return_value={"uid": "u1"})):
+            yield routes, manager
+        await manager.close_all()
+
+    @pytest.fixture
+    def service(self):
+        service = MagicMock()
+        service.is_member = AsyncMock(side_effect=lambda group_id, user_id: group_id != "g3")
+        return service
+
+    @pytest.mark.asyncio
+    async def test_subscribe_and_send_over_one_socket(self, endpoint, service):
+        routes, manager = endpoint
+        ws = ScriptedWebSocket([
+            {"type": "subscribe", "group_id": "g1"},
+            {"type": "subscribe", "group_id": "g2"},
+            {"type": "subscribe", "group_id": "g3"},
+            {"type": "message", "group_id": "g2", "content": "oi"},
+            {"type": "message", "group_id": "g3", "content": "oi"},
+            {"type": "unsubscribe", "group_id": "g1"},
+        ])
+
+        with Timer("chat_multiplexed_ws"):
+            await routes.multiplexed_websocket_endpoint(ws, service)
+
+        replies = ws.sent()
+        assert replies[:3] == [
+            {"type": "subscribed", "group_id": "g1"},
+            {"type": "subscribed", "group_id": "g2"},
+            {"type": "error", "group_id": "g3", "detail": "User not in group"},
+        ]
+        assert (replies[3]["group_id"], replies[3]["sender_id"], replies[3]["content"]) == ("g2", "u1", "oi")
+        assert replies[4]["detail"] == "Not subscribed to group"
+        assert replies[5] == {"type": "unsubscribed", "group_id": "g1"}
+        routes.writer.submit.assert_awaited_once()
+        assert manager.active_connections == {}
+
+    @pytest.mark.asyncio
+    async def test_missing_token_is_rejected(self, endpoint, service):
+        routes, manager = endpoint
+        ws = ScriptedWebSocket([], token=None)
+
+        await routes.multiplexed_websocket_endpoint(ws, service)
+
+        assert ws.close_code == 1008
+        assert manager.stats()["connections"] == 0
+
+    @pytest.mark.asyncio
+    async def test_malformed_frames_keep_the_socket(self, endpoint, service):
+        """Bad JSON or a missing field is answered with an error, not a leaked socket"""
+        routes, manager = endpoint
+        ws = ScriptedWebSocket([
+            json.JSONDecodeError("Expecting value", "", 0),
+            ["not", "an", "object"],
+            {"type": "ping"},
+            {"type": "subscribe", "group_id": "g1"},
+            {"type": "message", "group_id": "g1"},
+        ])
+
+        await routes.multiplexed_websocket_endpoint(ws, service)
+
+        assert [frame.get("detail") or frame["type"] for frame in ws.sent()] == [
+            "Invalid frame", "Frame must be a JSON object", "pong", "subscribed", "content is required",
+        ]
+        assert manager.stats()["connections"] == 0
+
+    @pytest.mark.asyncio
+    async def test_unexpected_error_cleans_up(self, endpoint, service):
+        """Any failure in the receive loop still removes the connection"""
+        routes, manager = endpoint
+        routes.writer.submit.side_effect = RuntimeError("database down")
+
+        await routes.websocket_endpoint(ScriptedWebSocket([{"content": "oi"}]), "g1", service=service)
+
+        assert manager.active_connections == {}
+        assert manager.stats()["connections"] == 0
+
+
+class TestCatchUpReplay:
+    """Test suite for replaying missed messages on reconnect"""
+
+    def _frame(self, message_id, created_at):
+        return json.dumps({"id": message_id, "group_id": "g1", "content": message_id, "created_at": created_at})
+
+    def _history(self, size=200):
+        from datetime import datetime
+        from app.v1.chat.history import MessageHistory
+        history = MessageHistory(size, clock=lambda: datetime(2024, 1, 1, 10, 0, 0))
+        for n in range(1, 6):
+            history.record("g1", self._frame(f"m{n}", f"2024-01-01T10:00:0{n}"))
+        return history
+
+    def test_history_replays_after_id_or_timestamp(self):
+        history = self._history()
+
+        with Timer("chat_history_since"):
+            after_id = history.since("g1", "m3")
+            after_time = history.since("g1", "2024-01-01T10:00:04")
+
+        assert [json.loads(f)["id"] for f in after_id] == ["m4", "m5"]
+        assert [json.loads(f)["id"] for f in after_time] == ["m5"]
+        assert history.since("g1", "m5") == []
+
+    def test_history_defers_gaps_it_cannot_cover(self):
+        """Unknown ids and instants before the buffer was complete go to the database"""
+        history = self._history(size=3)
+
+        assert history.since("g1", "m1") is None  # rotated out
+        assert history.since("g1", "2024-01-01T09:59:00") is None  # before the buffer started
+        assert history.since("g1", "2024-01-01T10:00:01") is None  # m2 rotated out
+        assert history.since("g1", "2024-01-01T10:00:02") is not None
+        assert history.since("g2", "m1") is None
+        assert history.stats()["misses"] == 4
+
+    @pytest_asyncio.fixture
+    async def endpoint(self):
+        from app.v1.chat import routes
+        from app.v1.chat.connections import ConnectionManager
+        manager = ConnectionManager()
+        with patch.object(routes, "manager", manager), \
+             patch.object(routes, "writer", MagicMock(submit=AsyncMock(), flush=AsyncMock())), \
+             patch.object(routes, "verify_token", AsyncMock(return_value={"uid": "u1"})):
+            yield routes, manager
+        await manager.close_all()
+
+    @pytest.fixture
+    def service(self):
+        from app.v1.chat.models import Message
+        service = MagicMock()
+        service.is_member = AsyncMock(return_value=True)
+        service.get_messages_since = AsyncMock(return_value=[
+            Message(id="old", content="old", group_id="g1", sender_id="u2"),
+        ])
+        return service
+
+    @pytest.mark.asyncio
+    async def test_reconnect_replays_from_memory(self, endpoint, service):
+        routes, manager = endpoint
+        for n in range(1, 4):
+            await manager.send_message({"id": f"m{n}", "group_id": "g1", "created_at": f"2024-01-01T10:00:0{n}"}, "g1")
+
+        ws = ScriptedWebSocket([])
+        await routes.websocket_endpoint(ws, "g1", since="m1", service=service)
+
+        assert [frame.get("id") or frame["type"] for frame in ws.sent()] == ["m2", "m3", "replayed"]
+        assert ws.sent()[-1] == {"type": "replayed", "group_id": "g1", "count": 2, "truncated": False}
+        service.get_messages_since.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_reconnect_falls_back_to_database(self, endpoint, service):
+        routes, manager = endpoint
+        ws = ScriptedWebSocket([{"type": "subscribe", "group_id": "g1", "since": "2024-01-01T09:00:00"}])
+
+        await routes.multiplexed_websocket_endpoint(ws, service)
+
+        assert [frame.get("type") or frame["id"] for frame in ws.sent()] == ["subscribed", "old", "replayed"]
+        service.get_messages_since.assert_awaited_once_with("g1", "2024-01-01T09:00:00", manager.settings.replay_limit + 1)
+
+    @pytest.mark.asyncio
+    async def test_live_messages_during_replay_follow_it_once(self, endpoint, service):
+        """Messages broadcast while the database is queried are neither duplicated nor reordered"""
+        from app.v1.chat.models import Message
+        routes, manager = endpoint
+        replayed = [Message(id="old", content="old", group_id="g1", sender_id="u2"),
+                    Message(id="racing", content="racing", group_id="g1", sender_id="u2")]
+
+        async def query_while_chatting(*args):
+            # One message is already stored, the other not written yet
+            await manager.send_message({"id": "racing", "group_id": "g1"}, "g1")
+            await manager.send_message({"id": "new", "group_id": "g1"}, "g1")
+            return replayed
+
+        service.get_messages_since = AsyncMock(side_effect=query_while_chatting)
+        ws = ScriptedWebSocket([{"type": "subscribe", "group_id": "g1", "since": "2024-01-01T09:00:00"}])
+
+        await routes.multiplexed_websocket_endpoint(ws, service)
+
+        assert [frame.get("id") or frame["type"] for frame in ws.sent()] == [
+            "subscribed", "old", "racing", "replayed", "new",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_database_replay_uses_keyset_after_id(self):
+        from app.v1.chat.service import ChatService
+        supabase = MagicMock()
+        query = supabase.table.return_value
+        for method in ("select", "eq", "or_", "gt", "order", "limit"):
+            getattr(query, method).return_value = query
+        query.execute.side_effect = [
+            MagicMock(data=[{"created_at": "2024-01-01T10:00:00"}]),
+            MagicMock(data=[
+                {"id": "m3", "content": "c", "group_id": "g1", "sender_id": "u1", "created_at": "2024-01-01T10:00:02"},
+                {"id": "m2", "content": "b", "group_id": "g1", "sender_id": "u1", "created_at": "2024-01-01T10:00:01"},
+            ]),
+        ]
+
+        messages = await ChatService(supabase).get_messages_since("g1", "m1", limit=10)
+
+        query.or_.assert_called_once_with(
+            'created_at.gt."2024-01-01T10:00:00",and(created_at.eq."2024-01-01T10:00:00",id.gt."m1")'
+        )
+        assert [m.id for m in messages] == ["m2", "m3"]
+
+
+class TestWireEncoding:
+    """Test suite for the negotiable chat wire encodings"""
+
+    @pytest.fixture(autouse=True)
+    def require_msgpack(self):
+        pytest.importorskip("msgpack")
+
+    def test_msgpack_uses_short_keys_and_drops_defaults(self):
+        import msgpack
+        from datetime import datetime
+        from app.v1.chat.connections import encode_frame
+        from app.v1.chat.encoding import CODECS
+        message = {"id": "m1", "content": "oi", "group_id": "g1", "sender_id": "u1",
+                   "created_at": datetime(2024, 1, 1, 10, 0), "updated_at": None, "is_edited": False}
+
+        frame = CODECS["msgpack"].from_json(encode_frame(message))
+        decoded = msgpack.unpackb(frame, timestamp=3)
+
+        assert set(decoded) == {"i", "c", "g", "s", "t"}
+        assert decoded["t"].astimezone().replace(tzinfo=None) == datetime(2024, 1, 1, 10, 0)
+        assert len(frame) < len(encode_frame(message))
+
+    def test_subprotocol_negotiation(self):
+        from app.v1.chat.encoding import CODECS, JSON, negotiate
+        ws = ScriptedWebSocket([], subprotocols=["chat.msgpack", "chat.json"])
+        assert negotiate(ws) == (CODECS["msgpack"], "chat.msgpack")
+        ws = ScriptedWebSocket([])
+        ws.query_params["encoding"] = "msgpack"
+        assert negotiate(ws) == (CODECS["msgpack"], None)
+        assert negotiate(ScriptedWebSocket([])) == (JSON, None)
+
+    @pytest.mark.asyncio
+    async def test_broadcast_is_transcoded_once_per_encoding(self):
+        """Mixed groups get each encoding computed a single time per broadcast"""
+        import msgpack
+        from app.v1.chat.connections import ConnectionManager
+        from app.v1.chat.encoding import CODECS, MsgpackCodec
+        manager = ConnectionManager()
+        json_socket, packed = FakeWebSocket(), [FakeWebSocket() for _ in range(3)]
+        await join(manager, json_socket, "g1", "u0")
+        for n, socket in enumerate(packed):
+            connection = await manager.connect(socket, f"u{n + 1}", CODECS["msgpack"], "chat.msgpack")
+            await manager.subscribe(connection, "g1")
+
+        with patch.object(MsgpackCodec, "from_json", autospec=True, side_effect=MsgpackCodec.from_json) as transcode:
+            await manager.send_message({"id": "m1", "content": "oi"}, "g1")
+            await asyncio.sleep(0.01)
+
+        assert transcode.call_count == 1
+        assert json_socket.frames == ['{"id":"m1","content":"oi"}']
+        assert all(msgpack.unpackb(socket.frames[0]) == {"i": "m1", "c": "oi"} for socket in packed)
+        assert packed[0].subprotocol == "chat.msgpack"
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_msgpack_client_frames_are_expanded(self):
+        import msgpack
+        from app.v1.chat.encoding import CODECS
+
+        class PackedSocket:
+            async def receive_bytes(self):
+                return msgpack.packb({"y": "message", "g": "g1", "c": "oi"})
+
+        assert await CODECS["msgpack"].receive(PackedSocket()) == {"type": "message", "group_id": "g1", "content": "oi"}
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("codec,message", [
+        ("json", {"type": "websocket.receive", "bytes": b"\x81\xa1y\xa4ping"}),
+        ("msgpack", {"type": "websocket.receive", "text": '{"type": "ping"}'}),
+    ])
+    async def test_wrong_frame_type_is_a_malformed_frame(self, codec, message):
+        """A binary frame on a JSON socket, or a text frame on a msgpack one, is rejected like bad input"""
+        from starlette.websockets import WebSocket, WebSocketState
+        from app.v1.chat.encoding import CODECS
+
+        async def receive():
+            return message
+
+        websocket = WebSocket({"type": "websocket", "path": "/ws", "headers": []}, receive, AsyncMock())
+        websocket.client_state = websocket.application_state = WebSocketState.CONNECTED
+
+        with pytest.raises(ValueError):
+            await CODECS[codec].receive(websocket)
+
+    def test_benchmark_reports_smaller_frames(self):
+        from app.v1.chat.benchmark import run_benchmark
+        with Timer("chat_encoding_benchmark"):
+            results = run_benchmark(200)
+        assert results["msgpack"]["bytes_per_message"] < results["json"]["bytes_per_message"]
+        assert results["json"]["deflate_bytes_per_message"] < results["json"]["bytes_per_message"]
+
+
+class TestPresence:
+    """Test suite for coalesced presence and typing indicators"""
+
+    @pytest.fixture
+    def tracker(self):
+        from app.config import ChatSettings
+        from app.v1.chat.presence import PresenceTracker
+        now = [0.0]
+        tracker = PresenceTracker(ChatSettings(typing_ttl=5), clock=lambda: now[0])
+        tracker.now = now
+        return tracker
+
+    def test_changes_are_coalesced_per_flush(self, tracker):
+        """A keystroke burst and a quick reconnect cost one diff, or none"""
+        tracker.join("g1", "u1")
+        tracker.join("g1", "u2")
+        assert tracker.flush() == [("g1", {"type": "presence", "group_id": "g1", "online": ["u1", "u2"]})]
+
+        with Timer("chat_presence_flush"):
+            for _ in range(100):
+                tracker.typing("g1", "u1")
+            tracker.leave("g1", "u2")
+            tracker.join("g1", "u2")
+            diffs = tracker.flush()
+
+        assert diffs == [("g1", {"type": "presence", "group_id": "g1", "typing": ["u1"]})]
+        assert tracker.flush() == []
+
+    def test_typing_lapses_and_leaving_clears_it(self, tracker):
+        tracker.join("g1", "u1")
+        tracker.typing("g1", "u1")
+        tracker.flush()
+
+        tracker.now[0] = 6
+        assert tracker.flush() == [("g1", {"type": "presence", "group_id": "g1", "stopped_typing": ["u1"]})]
+
+        tracker.typing("g1", "u1")
+        tracker.flush()
+        tracker.leave("g1", "u1")
+        assert tracker.flush() == [
+            ("g1", {"type": "presence", "group_id": "g1", "offline": ["u1"], "stopped_typing": ["u1"]}),
+        ]
+        assert tracker.stats()["typing"] == 0
+
+    def test_user_stays_online_while_a_tab_is_open(self, tracker):
+        tracker.join("g1", "u1")
+        tracker.join("g1", "u1")
+        tracker.flush()
+
+        tracker.leave("g1", "u1")
+        assert tracker.flush() == []
+        assert tracker.snapshot("g1") == {"group_id": "g1", "scope": "worker", "online": ["u1"], "typing": []}
+
+    @pytest.mark.asyncio
+    async def test_manager_broadcasts_presence_diffs(self):
+        from app.v1.chat.connections import ConnectionManager
+        manager = ConnectionManager()
+        watcher = FakeWebSocket()
+        await join(manager, watcher, "g1", "u1")
+        connection = await join(manager, FakeWebSocket(), "g1", "u2")
+        manager.presence.typing("g1", "u2")
+
+        await manager.flush_presence()
+        manager.disconnect(connection)
+        await manager.flush_presence()
+        await asyncio.sleep(0.01)
+
+        assert [json.loads(frame) for frame in watcher.frames] == [
+            {"type": "presence", "group_id": "g1", "online": ["u1", "u2"], "typing": ["u2"]},
+            {"type": "presence", "group_id": "g1", "offline": ["u2"], "stopped_typing": ["u2"]},
+        ]
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_presence_snapshot_route(self):
+        from fastapi import HTTPException
+        from app.v1.chat import routes
+        from app.v1.chat.connections import ConnectionManager
+        manager = ConnectionManager()
+        service = MagicMock(is_member=AsyncMock(side_effect=lambda group_id, user_id: user_id == "u1"))
+        with patch.object(routes, "manager", manager):
+            await join(manager, FakeWebSocket(), "g1", "u1")
+
+            snapshot = await routes.get_group_presence("g1", {"uid": "u1"}, service)
+            with pytest.raises(HTTPException) as exc:
+                await routes.get_group_presence("g1", {"uid": "u9"}, service)
+
+        assert snapshot == {"group_id": "g1", "scope": "worker", "online": ["u1"], "typing": []}
+        assert exc.value.status_code == 403
+        await manager.close_all()
+
+
+class TestUnreadCounters:
+    """Test suite for the incremental unread counters"""
+
+    @pytest.fixture
+    def mock_supabase(self):
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute.return_value = MagicMock(data=[])
+        query = supabase.table.return_value
+        for method in ("select", "eq", "upsert"):
+            getattr(query, method).return_value = query
+        query.execute.return_value = MagicMock(data=[
+            {"group_id": "g1", "unread_count": 3, "last_read_message_id": "m1", "last_read_at": "2024-01-01T10:00:00"},
+            {"group_id": "g2", "unread_count": 0, "last_read_message_id": None, "last_read_at": None},
+        ])
+        yield supabase, query
+
+    @pytest.mark.asyncio
+    async def test_batch_increments_counters_with_one_rpc(self, mock_supabase):
+        """A committed batch is folded into per (group, sender) counts"""
+        from app.config import ChatSettings
+        from app.v1.chat.models import Message
+        from app.v1.chat.writer import MessageWriter
+        supabase, _ = mock_supabase
+        writer = MessageWriter(ChatSettings(write_interval=0.05))
+        await writer.start(supabase)
+
+        for group_id, sender_id in [("g1", "u1"), ("g1", "u1"), ("g1", "u2"), ("g2", "u1")]:
+            await writer.submit(Message(content="oi", group_id=group_id, sender_id=sender_id))
+        await writer.close()
+
+        supabase.rpc.assert_called_once_with("chat_increment_unread", {"p_counts": [
+            {"group_id": "g1", "sender_id": "u1", "count": 2},
+            {"group_id": "g1", "sender_id": "u2", "count": 1},
+            {"group_id": "g2", "sender_id": "u1", "count": 1},
+        ]})
+
+    @pytest.mark.asyncio
+    async def test_unread_is_a_single_query(self, mock_supabase):
+        from app.v1.chat.service import ChatService
+        supabase, query = mock_supabase
+
+        with Timer("chat_unread"):
+            unread = await ChatService(supabase).get_unread("u1")
+
+        supabase.table.assert_called_once_with("group_members")
+        assert query.execute.call_count == 1
+        assert [(u.group_id, u.unread_count) for u in unread] == [("g1", 3), ("g2", 0)]
+
+    @pytest.mark.asyncio
+    async def test_read_ack_over_socket(self, mock_supabase):
+        """A read frame flushes pending writes, moves the marker and replies with the new count"""
+        from app.v1.chat import routes
+        from app.v1.chat.connections import ConnectionManager
+        from app.v1.chat.models import UnreadCount
+        manager = ConnectionManager()
+        service = MagicMock()
+        service.is_member = AsyncMock(return_value=True)
+        service.mark_read = AsyncMock(return_value=UnreadCount(group_id="g1", unread_count=0, last_read_message_id="m9"))
+        ws = ScriptedWebSocket([{"type": "read", "group_id": "g1", "message_id": "m9"}])
+
+        with patch.object(routes, "manager", manager), \
+             patch.object(routes, "writer", MagicMock(flush=AsyncMock())) as writer, \
+             patch.object(routes, "verify_token", AsyncMock(return_value={"uid": "u1"})):
+            await routes.multiplexed_websocket_endpoint(ws, service)
+
+        writer.flush.assert_awaited_once()
+        service.mark_read.assert_awaited_once_with("g1", "u1", "m9")
+        assert ws.sent() == [{"type": "read", "group_id": "g1", "unread_count": 0,
+                              "last_read_message_id": "m9", "last_read_at": None}]
+        await manager.close_all()
@@ -1,9 +1,14 @@
 import pytest
 import asyncio
+import time
 import logging
 from unittest.mock import patch, MagicMock, AsyncMock
 from conftest import Timer
-from app.auth.sync import UserSynchronizer, setup_firebase_auth_hooks
+from fastapi import HTTPException
+from app.auth import identity
+from app.auth.identity import Identity, resolve_identity
+from app.auth import tokens
+from app.auth.sync import UserSynchronizer, setup_firebase_auth_hooks, create_access_token
 
 logger = logging.getLogger("test")
 
@@ -339,4 +344,196 @@ class TestFirebaseSync:
             
             # Verify other calls were made
             assert usuario_mock.insert.called, "Usuario table insert should be called"
-            assert perfil_mock.insert.called, "Perfil table insert should be called" 
\ No newline at end of file
+            assert perfil_mock.insert.called, "Perfil table insert should be called" 
+
+class TestIdentityCache:
+    """Test suite for the cached user identity resolution"""
+
+    @pytest.fixture
+    def supabase(self):
+        """Supabase mock answering Usuario and Perfil lookups"""
+        tables = {
+            "Usuario": [{"id": 7, "email": "test@example.com", "firebase_uid": "test-user-uid"}],
+            "Perfil": [{"id": 70}],
+        }
+        client = MagicMock()
+
+        def table(name):
+            query = MagicMock()
+            for method in ("select", "eq", "limit"):
+                getattr(query, method).return_value = query
+            query.execute.return_value = MagicMock(data=tables[name])
+            return query
+
+        client.table.side_effect = table
+        return client
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        identity._identity_cache.clear()
+        yield
+        identity._identity_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_identity_is_cached_under_all_keys(self, supabase):
+        """A resolved identity is reused for the uid and the email of the user"""
+        with Timer("identity_cache_hit"):
+            first = await resolve_identity(supabase, {"uid": "test-user-uid", "email": "test@example.com"})
+            by_email = await resolve_identity(supabase, {"id": 7, "email": "test@example.com"})
+
+        assert first.usuario_id == 7 and first.perfil_id == 70
+        assert by_email == first
+        assert supabase.table.call_count == 2, "Usuario and Perfil should be queried once"
+
+    @pytest.mark.asyncio
+    async def test_identity_invalidated_on_update_and_delete(self, supabase):
+        """UserSynchronizer drops cached identities when a user changes"""
+        user = {"uid": "test-user-uid", "email": "test@example.com"}
+        synchronizer = UserSynchronizer(supabase)
+        firebase_user = MagicMock(uid="test-user-uid", email="test@example.com", display_name="Test User")
+
+        await resolve_identity(supabase, user)
+        with patch.object(synchronizer, "_check_existing_user", return_value={"id": 7, "email": "old@example.com"}):
+            supabase.table.side_effect = None
+            supabase.table.return_value = MagicMock()
+            await synchronizer.update_user_in_supabase(firebase_user)
+
+        assert ("uid", "test-user-uid") not in identity._identity_cache
+        assert ("email", "test@example.com") not in identity._identity_cache
+
+        identity._identity_cache.set(("uid", "test-user-uid"), Identity(usuario_id=7, firebase_uid="test-user-uid"))
+        await synchronizer.delete_user_from_supabase("test-user-uid")
+        assert ("uid", "test-user-uid") not in identity._identity_cache
+        assert ("usuario", 7) not in identity._identity_cache
+
+    @pytest.mark.asyncio
+    async def test_identity_invalidated_by_profile_writes(self, supabase):
+        """Profile edits, account deletion and profile creation drop the cached identity"""
+        from app.v1.profile import routes as profile_routes
+        user = {"id": 7, "uid": "test-user-uid", "email": "test@example.com"}
+        request = MagicMock()
+        request.app.state.supabase = supabase
+
+        await resolve_identity(supabase, user)
+        supabase.table.side_effect = None
+        query = supabase.table.return_value
+        for method in ("update", "delete", "eq"):
+            getattr(query, method).return_value = query
+        query.execute.return_value = MagicMock(data=[{"id": 7}])
+        await profile_routes.update_profile(request, profile_routes.ProfileUpdate(email="new@example.com"), user)
+        for key in (("usuario", 7), ("uid", "test-user-uid"), ("email", "test@example.com")):
+            assert key not in identity._identity_cache
+
+        identity._identity_cache.set(("usuario", 7), Identity(usuario_id=7, perfil_id=70, email="new@example.com"))
+        await profile_routes.delete_profile(request, user)
+        assert ("usuario", 7) not in identity._identity_cache
+
+        # A lookup before the default profile existed cached perfil_id=None
+        identity._identity_cache.set(("uid", "test-user-uid"), Identity(usuario_id=7, firebase_uid="test-user-uid"))
+        query.insert.return_value = query
+        firebase_user = MagicMock(uid="test-user-uid", email="test@example.com", display_name="Test User")
+        await UserSynchronizer(supabase)._create_user_record(firebase_user, None)
+        assert ("uid", "test-user-uid") not in identity._identity_cache
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_is_not_found(self, supabase):
+        """Users without a Usuario record raise 404 and are not cached"""
+        supabase.table.side_effect = None
+        query = supabase.table.return_value
+        for method in ("select", "eq", "limit"):
+            getattr(query, method).return_value = query
+        query.execute.return_value = MagicMock(data=[])
+
+        with pytest.raises(HTTPException) as exc:
+            await resolve_identity(supabase, {"uid": "missing"})
+        assert exc.value.status_code == 404
+
+
+class TestTokenCache:
+    """Test suite for the verified-token cache"""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        tokens._token_cache.clear()
+        yield
+        tokens._token_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_verified_token_is_cached(self):
+        """A second verification of the same token does not reach Firebase"""
+        claims = {"uid": "user-123", "email": "test@example.com", "exp": time.time() + 3600}
+        with patch("firebase_admin.auth") as firebase_auth, Timer("token_cache_hit"):
+            verify = firebase_auth.verify_id_token
+            verify.return_value = claims
+            assert (await tokens.verify_token("firebase-token")) == claims
+            assert (await tokens.verify_token("firebase-token")) == claims
+
+        assert verify.call_count == 1
+        stats = tokens.token_cache_stats()
+        assert stats["cache"]["hits"] >= 1
+        assert stats["verification"]["verifications"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_expired_token_is_not_cached(self):
+        """Tokens are never served from the cache past their exp"""
+        claims = {"uid": "user-123", "exp": time.time() - 1}
+        with patch("firebase_admin.auth") as firebase_auth:
+            verify = firebase_auth.verify_id_token
+            verify.return_value = claims
+            await tokens.verify_token("old-token")
+            await tokens.verify_token("old-token")
+
+        assert verify.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_jwt_fallback_is_not_cached(self):
+        """A JWT stops authenticating as soon as its Usuario is deleted"""
+        token = create_access_token({"sub": "42"})
+        supabase = MagicMock()
+        query = supabase.table.return_value
+        query.select.return_value = query
+        query.eq.return_value = query
+        query.execute.side_effect = [
+            MagicMock(data=[{"id": 42, "email": "test@example.com", "nome": "Test"}]),
+            MagicMock(data=[]),
+        ]
+        with patch("firebase_admin.auth") as firebase_auth:
+            firebase_auth.verify_id_token.side_effect = ValueError("not a firebase token")
+            assert (await tokens.verify_token(token, supabase))["uid"] == "42"
+            with pytest.raises(HTTPException) as deleted:
+                await tokens.verify_token(token, supabase)
+            with pytest.raises(HTTPException) as firebase_only:
+                await tokens.verify_token(token, allow_jwt=False)
+
+        assert deleted.value.status_code == firebase_only.value.status_code == 401
+        assert len(tokens._token_cache) == 0
+
+
+class TestBlockingCalls:
+    """Test suite for the executor used by blocking Firebase/Supabase calls"""
+
+    @pytest.mark.asyncio
+    async def test_sync_client_runs_off_the_event_loop(self):
+        """Sync Supabase queries execute on the shared pool, not the loop thread"""
+        import threading
+        from app.executor import run_query
+        threads = []
+        query = MagicMock()
+        query.execute.side_effect = lambda: threads.append(threading.current_thread().name) or MagicMock(data=[])
+
+        with Timer("run_query_sync"):
+            await run_query(query)
+
+        assert threads and threads[0].startswith("blocking-io")
+
+    @pytest.mark.asyncio
+    async def test_async_client_is_awaited_directly(self):
+        """Async Supabase queries are awaited without a thread hop"""
+        from app.executor import run_query
+        query = MagicMock()
+        query.execute = AsyncMock(return_value=MagicMock(data=[{"id": 1}]))
+
+        result = await run_query(query)
+
+        assert result.data == [{"id": 1}]
+        query.execute.assert_awaited_once()
@@ -346,4 +346,569 @@ class TestForumRoutes:
              patch('app.v1.forum.routes.like_comment', mocks["like_comment"]), \
              patch('app.v1.forum.routes.update_comment', mocks["update_comment"]):
             
-            yield mocks 
\ No newline at end of file
+            yield mocks 
+
+class TestLikeAggregator:
+    """Test suite for the coalesced comment likes"""
+
+    @pytest.fixture(autouse=True)
+    def clear_forum_caches(self):
+        from app.v1.forum import helper
+        from app.v1.forum.pages import comment_pages
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+        yield
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+
+    @pytest.fixture
+    def mock_supabase(self):
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute.return_value = MagicMock(data=[{"id": 1, "likes": 1}])
+        query = supabase.table.return_value
+        for method in ("select", "eq", "gt", "order", "limit", "update"):
+            getattr(query, method).return_value = query
+        query.execute.return_value = MagicMock(data=[self.comment_row()])
+        yield supabase, query
+
+    @staticmethod
+    def comment_row(**overrides):
+        row = {"id": 1, "mensagem": "Ótimo filme", "likes": 10, "usuario_id": 3, "forum_id": 5, "perfil_id": 4,
+               "created_at": "2024-01-01T10:00:00", "updated_at": None, "respondendo_id": None}
+        row.update(overrides)
+        return row
+
+    @pytest.mark.asyncio
+    async def test_likes_are_coalesced_into_one_rpc(self, mock_supabase):
+        from app.config import ForumSettings
+        from app.v1.forum.likes import LikeAggregator
+        supabase, _ = mock_supabase
+        aggregator = LikeAggregator(ForumSettings(like_flush_interval=60))
+        await aggregator.start(supabase)
+
+        with Timer("forum_like_add"):
+            for _ in range(1000):
+                aggregator.add(1)
+        aggregator.add(2)
+        await aggregator.close()
+
+        supabase.rpc.assert_called_once_with("forum_increment_likes", {"p_deltas": [
+            {"id": 1, "delta": 1000},
+            {"id": 2, "delta": 1},
+        ]})
+        assert aggregator.stats()["written"] == 1001
+        assert aggregator.pending(1) == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_deltas(self, mock_supabase):
+        from app.config import ForumSettings
+        from app.v1.forum.likes import LikeAggregator
+        supabase, _ = mock_supabase
+        supabase.rpc.return_value.execute.side_effect = [Exception("connection reset"), MagicMock(data=[])]
+        aggregator = LikeAggregator(ForumSettings(like_flush_interval=60))
+        aggregator.supabase = supabase
+
+        aggregator.add(1)
+        await aggregator.flush()
+        assert aggregator.pending(1) == 1
+        assert aggregator.stats()["errors"] == 1
+
+        aggregator.add(1)
+        await aggregator.flush()
+        assert supabase.rpc.call_args.args[1] == {"p_deltas": [{"id": 1, "delta": 2}]}
+        assert aggregator.pending(1) == 0
+
+    @pytest.mark.asyncio
+    async def test_reads_include_pending_likes(self, mock_supabase):
+        """A like is visible right away, without a read-modify-write on the row"""
+        from app.config import ForumSettings
+        from app.v1.forum import helper
+        from app.v1.forum.likes import LikeAggregator
+        supabase, query = mock_supabase
+        aggregator = LikeAggregator(ForumSettings(like_flush_interval=60))
+        await aggregator.start(supabase)
+
+        with patch.object(helper, "like_aggregator", aggregator):
+            liked = await helper.like_comment(supabase, 1)
+            assert liked["likes"] == 11
+            query.update.assert_not_called()
+            supabase.rpc.assert_not_called()
+
+            query.execute.return_value = MagicMock(data=[self.comment_row()])
+            page = await helper.get_movie_comments(supabase, 7, limit=20)
+            assert page.comments[0].likes == 11
+        await aggregator.close()
+
+    @pytest.mark.asyncio
+    async def test_like_without_aggregator_is_atomic(self, mock_supabase):
+        from fastapi import HTTPException
+        from app.v1.forum import helper
+        supabase, query = mock_supabase
+
+        assert not helper.like_aggregator.running
+        assert (await helper.like_comment(supabase, 1))["likes"] == 1
+        supabase.rpc.assert_called_once_with("forum_increment_likes", {"p_deltas": [{"id": 1, "delta": 1}]})
+        query.update.assert_not_called()
+
+        supabase.rpc.return_value.execute.return_value = MagicMock(data=[])
+        with pytest.raises(HTTPException) as exc:
+            await helper.like_comment(supabase, 99)
+        assert exc.value.status_code == 404
+
+
+class TestCommentThreads:
+    """Test suite for the threaded comment listing"""
+
+    @pytest.fixture(autouse=True)
+    def clear_forum_caches(self):
+        from app.v1.forum import helper
+        from app.v1.forum.pages import comment_pages
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+        yield
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+
+    @staticmethod
+    def comment(id, respondendo_id=None, **overrides):
+        row = {"id": id, "mensagem": f"Comentário {id}", "likes": 0, "usuario_id": 3, "forum_id": 5,
+               "perfil_id": 4, "created_at": "2024-01-01T10:00:00", "updated_at": None,
+               "respondendo_id": respondendo_id}
+        row.update(overrides)
+        return row
+
+    def reply_rows(self):
+        # forum_comment_replies output for roots 1 and 2, depth 2, 2 replies per comment
+        return [
+            {"depth": 0, "reply_count": 3, "comment": {"id": 1}},
+            {"depth": 0, "reply_count": 0, "comment": {"id": 2}},
+            {"depth": 1, "reply_count": 1, "comment": self.comment(10, 1)},
+            {"depth": 1, "reply_count": 0, "comment": self.comment(11, 1)},
+            {"depth": 2, "reply_count": 4, "comment": self.comment(20, 10)},
+        ]
+
+    @pytest.fixture
+    def mock_supabase(self):
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute.return_value = MagicMock(data=self.reply_rows())
+        query = supabase.table.return_value
+        for method in ("select", "eq", "is_", "gt", "order", "limit"):
+            getattr(query, method).return_value = query
+        query.execute.side_effect = [
+            MagicMock(data=[{"id": 5}]),
+            MagicMock(data=[self.comment(1), self.comment(2)]),
+        ]
+        yield supabase, query
+
+    def test_build_threads(self):
+        from app.pagination import decode_cursor
+        from app.v1.forum.threads import build_threads
+
+        with Timer("forum_build_threads"):
+            threads = build_threads([self.comment(1), self.comment(2)], self.reply_rows())
+
+        first, second = threads
+        assert [reply["id"] for reply in first["replies"]] == [10, 11]
+        assert first["replies"][0]["replies"][0]["id"] == 20
+        # One reply of comment 1 was cut by the per-comment limit
+        assert decode_cursor(first["replies_cursor"], ["id"]) == {"id": 11}
+        # The replies of comment 20 are below the depth limit
+        assert decode_cursor(first["replies"][0]["replies"][0]["replies_cursor"], ["id"]) == {"id": 0}
+        assert "replies_cursor" not in first["replies"][1]
+        assert second["replies"] == [] and "replies_cursor" not in second
+
+    def test_build_threads_is_linear(self):
+        """A deep chain of replies is assembled without recursion"""
+        from app.v1.forum.threads import build_threads
+        rows = [{"depth": n, "reply_count": 1, "comment": self.comment(n + 1, n)} for n in range(1, 5001)]
+
+        with Timer("forum_build_deep_thread"):
+            (thread,) = build_threads([self.comment(1)], rows)
+
+        depth = 0
+        while thread["replies"]:
+            thread = thread["replies"][0]
+            depth += 1
+        assert depth == 5000
+
+    @pytest.mark.asyncio
+    async def test_threads_page_uses_two_queries_and_one_rpc(self, mock_supabase):
+        from app.pagination import decode_cursor
+        from app.v1.forum.helper import get_comment_threads
+        supabase, query = mock_supabase
+
+        page = await get_comment_threads(supabase, 7, limit=2, depth=2, replies=2)
+
+        assert query.execute.call_count == 2
+        query.is_.assert_called_once_with("respondendo_id", "null")
+        supabase.rpc.assert_called_once()
+        name, params = supabase.rpc.call_args.args
+        assert name == "forum_comment_replies"
+        assert params["p_parent_ids"] == [1, 2]
+        assert (params["p_max_depth"], params["p_per_parent"]) == (2, 2)
+        assert [thread.id for thread in page.threads] == [1, 2]
+        assert page.threads[0].reply_count == 3
+        assert page.threads[0].replies[0].replies[0].id == 20
+        assert decode_cursor(page.next_cursor, ["id"]) == {"id": 2}
+
+    @pytest.mark.asyncio
+    async def test_load_more_replies(self, mock_supabase):
+        from app.pagination import encode_cursor
+        from app.v1.forum.helper import get_comment_replies
+        supabase, query = mock_supabase
+        query.execute.side_effect = [MagicMock(data=[{"id": 1, "forum_id": 5}])]
+        supabase.rpc.return_value.execute.return_value = MagicMock(data=[
+            {"depth": 0, "reply_count": 3, "comment": {"id": 1}},
+            {"depth": 1, "reply_count": 0, "comment": self.comment(12, 1)},
+        ])
+
+        page = await get_comment_replies(supabase, 1, after=encode_cursor({"id": 11}), replies=2)
+
+        assert supabase.rpc.call_args.args[1]["p_after"] == 11
+        assert [thread.id for thread in page.threads] == [12]
+        assert page.next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_replies_resolve_the_forum_once_per_comment(self, mock_supabase):
+        from app.pagination import encode_cursor
+        from app.v1.forum.helper import get_comment_replies
+        supabase, query = mock_supabase
+        query.execute.side_effect = [MagicMock(data=[{"forum_id": 5}])]
+
+        for after in (10, 11, 12):
+            await get_comment_replies(supabase, 1, after=encode_cursor({"id": after}), replies=2)
+
+        assert query.execute.call_count == 1
+        assert supabase.rpc.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, mock_supabase):
+        from app.v1.forum.helper import get_comment_replies
+        supabase, _ = mock_supabase
+        with pytest.raises(ValueError):
+            await get_comment_replies(supabase, 1, after="not-a-cursor")
+
+
+class TestForumIdCache:
+    """Test suite for the cached forum resolution"""
+
+    @pytest.fixture(autouse=True)
+    def clear_forum_caches(self):
+        from app.v1.forum import helper
+        from app.v1.forum.pages import comment_pages
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+        yield
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+
+    @pytest.fixture
+    def mock_supabase(self):
+        supabase = MagicMock()
+        query = supabase.table.return_value
+        for method in ("select", "eq", "upsert"):
+            getattr(query, method).return_value = query
+        query.execute.return_value = MagicMock(data=[{"id": 5}])
+        yield supabase, query
+
+    @pytest.mark.asyncio
+    async def test_forum_is_upserted_once_per_movie(self, mock_supabase):
+        import asyncio
+        from app.v1.forum.helper import get_or_create_forum
+        supabase, query = mock_supabase
+
+        with Timer("forum_get_or_create"):
+            forums = await asyncio.gather(*(get_or_create_forum(supabase, 7) for _ in range(20)))
+            forums.append(await get_or_create_forum(supabase, 7))
+
+        assert forums == [{"id": 5}] * 21
+        query.upsert.assert_called_once_with({"filme_id": 7}, on_conflict="filme_id")
+        assert query.execute.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_forum_is_not_cached(self, mock_supabase):
+        from app.v1.forum.helper import get_forum_id, get_or_create_forum
+        supabase, query = mock_supabase
+        query.execute.return_value = MagicMock(data=[])
+
+        assert await get_forum_id(supabase, 7) is None
+        assert await get_forum_id(supabase, 7) is None
+        assert query.execute.call_count == 2
+
+        query.execute.return_value = MagicMock(data=[{"id": 5}])
+        assert await get_or_create_forum(supabase, 7) == {"id": 5}
+        assert await get_forum_id(supabase, 7) == 5
+        assert query.execute.call_count == 3
+
+
+class TestCreateCommentRpc:
+    """Test suite for comment posting through forum_create_comment"""
+
+    @pytest.fixture(autouse=True)
+    def clear_forum_caches(self):
+        from app.v1.forum import helper
+        from app.v1.forum.pages import comment_pages
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+        yield
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+
+    @pytest.fixture
+    def mock_supabase(self):
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute.return_value = MagicMock(data=[{
+            "id": 9, "mensagem": "Ótimo filme", "likes": 0, "usuario_id": 3, "forum_id": 5, "perfil_id": 4,
+            "created_at": "2024-01-01T10:00:00", "updated_at": None, "respondendo_id": 2,
+        }])
+        yield supabase
+
+    @pytest.mark.asyncio
+    async def test_comment_is_created_with_one_rpc(self, mock_supabase):
+        from app.v1.forum import helper
+        from app.v1.forum.schemas import CommentCreate
+
+        with Timer("forum_create_comment"):
+            created = await helper.create_comment(
+                mock_supabase, 7, CommentCreate(mensagem="Ótimo filme", respondendo_id=2),
+                {"uid": "firebase-uid", "email": "test@example.com"},
+            )
+
+        assert created["id"] == 9
+        mock_supabase.table.assert_not_called()
+        mock_supabase.rpc.assert_called_once_with("forum_create_comment", {
+            "p_filme_id": 7,
+            "p_mensagem": "Ótimo filme",
+            "p_usuario_id": None,
+            "p_firebase_uid": "firebase-uid",
+            "p_email": "test@example.com",
+            "p_perfil_id": None,
+            "p_respondendo_id": 2,
+        })
+        # The forum created by the function is remembered for the listings
+        assert await helper.get_forum_id(mock_supabase, 7) == 5
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("code,status", [("PT404", 404), ("PT403", 403), ("23503", 500)])
+    async def test_function_errors_map_to_http_status(self, mock_supabase, code, status):
+        from fastapi import HTTPException
+        from postgrest.exceptions import APIError
+        from app.v1.forum import helper
+        from app.v1.forum.schemas import CommentCreate
+        mock_supabase.rpc.return_value.execute.side_effect = APIError({"code": code, "message": "Perfil não encontrado"})
+
+        with pytest.raises(HTTPException) as exc:
+            await helper.create_comment(mock_supabase, 7, CommentCreate(mensagem="Oi"), {"email": "test@example.com"})
+
+        assert exc.value.status_code == status
+
+    @pytest.mark.asyncio
+    async def test_user_errors_keep_their_status(self, mock_supabase):
+        from fastapi import HTTPException
+        from postgrest.exceptions import APIError
+        from app.v1.forum import helper
+        from app.v1.forum.schemas import CommentCreate
+
+        with pytest.raises(HTTPException) as exc:
+            await helper.create_comment(mock_supabase, 7, CommentCreate(mensagem="Oi"), {"uid": "firebase-uid"})
+        assert exc.value.status_code == 403
+        assert exc.value.detail == "Email de usuário não disponível"
+        mock_supabase.rpc.assert_not_called()
+
+        mock_supabase.rpc.return_value.execute.side_effect = APIError(
+            {"code": "PT403", "message": "Usuário não encontrado no sistema"})
+        with pytest.raises(HTTPException) as exc:
+            await helper.create_comment(mock_supabase, 7, CommentCreate(mensagem="Oi"), {"email": "nobody@example.com"})
+        assert exc.value.status_code == 403
+        assert exc.value.detail == "Usuário não encontrado no sistema"
+
+    @pytest.mark.asyncio
+    async def test_benchmark_reports_fewer_round_trips(self):
+        from app.v1.forum.benchmark import run_benchmark
+
+        results = await run_benchmark(20, rtt_ms=0.5)
+
+        assert results["sequential"]["round_trips"] == 5
+        assert results["rpc"]["round_trips"] == 1
+        assert results["rpc"]["p50_ms"] < results["sequential"]["p50_ms"]
+
+
+class TestCommentPageCache:
+    """Test suite for the cached comment pages"""
+
+    @pytest.fixture(autouse=True)
+    def clear_forum_caches(self):
+        from app.v1.forum import helper
+        from app.v1.forum.pages import comment_pages
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+        yield
+        helper._forum_ids.clear()
+        helper._comment_forums.clear()
+        comment_pages.clear()
+
+    @pytest.fixture
+    def clock(self):
+        now = [0.0]
+        clock = lambda: now[0]
+        clock.advance = lambda seconds: now.__setitem__(0, now[0] + seconds)
+        yield clock
+
+    @pytest.fixture
+    def cache(self, clock):
+        from app.config import ForumSettings
+        from app.v1.forum.pages import CommentPageCache
+        yield CommentPageCache(ForumSettings(page_ttl=5, page_stale_ttl=60, page_pages=2), clock=clock)
+
+    @pytest.mark.asyncio
+    async def test_fresh_pages_are_served_from_memory(self, cache):
+        loader = AsyncMock(return_value=[{"id": 1, "likes": 0}])
+        await cache.get(5, ("comments", None, None), loader)
+
+        with Timer("forum_page_cache_hit"):
+            for _ in range(1000):
+                page = await cache.get(5, ("comments", None, None), loader)
+
+        assert page == [{"id": 1, "likes": 0}]
+        loader.assert_awaited_once()
+        assert cache.stats()["hits"] == 1000
+
+    @pytest.mark.asyncio
+    async def test_stale_page_is_served_while_revalidating(self, cache, clock):
+        import asyncio
+        loader = AsyncMock(side_effect=[["old"], ["new"]])
+        await cache.get(5, "page", loader)
+        clock.advance(10)
+
+        assert await cache.get(5, "page", loader) == ["old"]
+        await asyncio.gather(*cache._refreshing)
+        assert await cache.get(5, "page", loader) == ["new"]
+        assert loader.await_count == 2
+        assert cache.stats()["refreshes"] == 1
+
+        clock.advance(120)
+        loader.side_effect = [["newer"]]
+        assert await cache.get(5, "page", loader) == ["newer"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_are_coalesced(self, cache):
+        import asyncio
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def load():
+            started.set()
+            await release.wait()
+            return ["page"]
+
+        loader = AsyncMock(side_effect=load)
+        first = asyncio.create_task(cache.get(5, "page", loader))
+        await started.wait()
+        second = asyncio.create_task(cache.get(5, "page", loader))
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await first == await second == ["page"]
+        loader.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_fail_coalesced_waiters(self, cache):
+        import asyncio
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def load():
+            started.set()
+            await release.wait()
+            return ["page"]
+
+        loader = AsyncMock(side_effect=load)
+        first = asyncio.create_task(cache.get(5, "page", loader))
+        await started.wait()
+        second = asyncio.create_task(cache.get(5, "page", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == ["page"]
+        assert first.cancelled()
+        assert await cache.get(5, "page", loader) == ["page"]
+        loader.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_invalidation_drops_pages_and_in_flight_loads(self, cache):
+        import asyncio
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return ["before the write"]
+
+        task = asyncio.create_task(cache.get(5, "page", AsyncMock(side_effect=load)))
+        await asyncio.sleep(0)
+        cache.invalidate(5)
+
+        # A read right after the write does not join the load started before it
+        loader = AsyncMock(return_value=["after the write"])
+        assert await cache.get(5, "page", loader) == ["after the write"]
+        release.set()
+        assert await task == ["before the write"]
+
+        assert await cache.get(5, "page", loader) == ["after the write"]
+        loader.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_likes_patch_cached_pages(self, cache):
+        from app.v1.forum.schemas import CommentThreadList
+        thread = TestCommentThreads.comment(1, likes=2)
+        thread["replies"] = [TestCommentThreads.comment(10, 1, likes=0)]
+        await cache.get(5, "threads", AsyncMock(return_value=CommentThreadList(threads=[thread])))
+        await cache.get(5, "list", AsyncMock(return_value=[TestCommentThreads.comment(10, 1, likes=0)]))
+
+        cache.patch_likes(5, 10)
+        cache.patch_likes(6, 10)
+
+        threads = await cache.get(5, "threads", AsyncMock())
+        rows = await cache.get(5, "list", AsyncMock())
+        assert threads.threads[0].likes == 2
+        assert threads.threads[0].replies[0].likes == 1
+        assert rows[0]["likes"] == 1
+        assert cache.stats()["patches"] == 2
+
+    @pytest.mark.asyncio
+    async def test_pages_per_forum_are_bounded(self, cache):
+        for after in ("a", "b", "c"):
+            await cache.get(5, after, AsyncMock(return_value=[after]))
+        assert cache.stats()["pages"] == 2
+
+    @pytest.mark.asyncio
+    async def test_writes_invalidate_listing(self):
+        """A new comment is visible to the next read of the forum"""
+        from app.v1.forum import helper
+        from app.v1.forum.schemas import CommentCreate
+        supabase = MagicMock()
+        query = supabase.table.return_value
+        for method in ("select", "eq", "gt", "order", "limit"):
+            getattr(query, method).return_value = query
+        query.execute.side_effect = [
+            MagicMock(data=[{"id": 5}]),
+            MagicMock(data=[TestCommentThreads.comment(1)]),
+            MagicMock(data=[TestCommentThreads.comment(1), TestCommentThreads.comment(2)]),
+        ]
+        supabase.rpc.return_value.execute.return_value = MagicMock(data=[TestCommentThreads.comment(2)])
+
+        assert len((await helper.get_movie_comments(supabase, 7, limit=20)).comments) == 1
+        assert len((await helper.get_movie_comments(supabase, 7, limit=20)).comments) == 1
+        await helper.create_comment(supabase, 7, CommentCreate(mensagem="Oi"), {"email": "test@example.com"})
+        assert len((await helper.get_movie_comments(supabase, 7, limit=20)).comments) == 2
+        assert query.execute.call_count == 3
@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from app.factory import create_app
 
@@ -87,4 +88,121 @@ def test_watch_later_validation():
     
     # Then try to add it to watch later
     response = client.post("/v1/movielist/watch-later", json=payload, headers=DEV_HEADERS)
-    assert response.status_code in [400, 401, 404]  # Should fail with 400 
\ No newline at end of file
+    assert response.status_code in [400, 401, 404]  # Should fail with 400 
+
+@pytest.mark.asyncio
+async def test_batch_status_route():
+    """Test the batch status route against a mocked Supabase client"""
+    from unittest.mock import AsyncMock, MagicMock
+    from app.auth.identity import Identity
+    from app.v1.movielist.routes import get_movies_status_batch_route
+    from app.v1.movielist.schemas import BatchStatusRequest
+
+    perfis = []
+
+    def table(name):
+        query = MagicMock()
+        query.select.return_value = query
+        query.eq.side_effect = lambda column, value: perfis.append(value) or query
+        query.in_.return_value = query
+        query.execute = AsyncMock(return_value=MagicMock(data=[{"filme_id": 2}] if name == "FilmesFavoritos" else []))
+        return query
+
+    request = MagicMock()
+    request.app.state.supabase.table.side_effect = table
+
+    response = await get_movies_status_batch_route(
+        request, BatchStatusRequest(filme_ids=[1, 2]), Identity(usuario_id=3, perfil_id=7)
+    )
+
+    assert set(perfis) == {7}
+    assert response.statuses[2].is_favorite and not response.statuses[1].is_favorite
+    assert list(response.statuses) == [1, 2]
+
+@pytest.mark.asyncio
+async def test_batch_status_queries_each_list_once():
+    """Test that the batch status issues one query per list table"""
+    from unittest.mock import AsyncMock, MagicMock
+    from app.v1.movielist.helper import get_movie_lists_status_batch
+
+    rows = {
+        "FilmesFavoritos": [{"filme_id": 1}],
+        "FilmesAssistidos": [{"filme_id": 2}],
+        "FilmesWatchLater": [{"filme_id": 3}],
+    }
+    tables = []
+
+    def table(name):
+        tables.append(name)
+        query = MagicMock()
+        query.select.return_value = query
+        query.eq.return_value = query
+        query.in_.return_value = query
+        query.execute = AsyncMock(return_value=MagicMock(data=rows[name]))
+        return query
+
+    supabase = MagicMock()
+    supabase.table.side_effect = table
+
+    statuses = await get_movie_lists_status_batch(supabase, [1, 2, 3, 4, 1], perfil_id=7)
+
+    assert sorted(tables) == ["FilmesAssistidos", "FilmesFavoritos", "FilmesWatchLater"]
+    assert statuses[1].is_favorite and not statuses[1].is_watched
+    assert statuses[2].is_watched
+    assert statuses[3].is_watch_later
+    assert not any([statuses[4].is_favorite, statuses[4].is_watched, statuses[4].is_watch_later])
+    assert list(statuses) == [1, 2, 3, 4]
+
+@pytest.mark.asyncio
+async def test_batch_update_is_set_based():
+    """Test that a batch to watch later uses bulk queries and reports per-movie results"""
+    from unittest.mock import AsyncMock, MagicMock
+    from app.v1.movielist.helper import batch_update_movie_list
+
+    rows = {
+        ("Filme", "select"): [{"id": 1}, {"id": 2}, {"id": 3}],
+        ("FilmesAssistidos", "select"): [{"filme_id": 2}],
+        ("FilmesWatchLater", "select"): [{"filme_id": 3}],
+    }
+    calls = []
+
+    def table(name):
+        query = MagicMock()
+        for method in ("eq", "in_"):
+            getattr(query, method).return_value = query
+
+        def operation(op):
+            def start(*args, **kwargs):
+                calls.append((name, op, args, kwargs))
+                query.execute = AsyncMock(return_value=MagicMock(data=rows.get((name, op), [])))
+                return query
+            return start
+
+        for op in ("select", "upsert", "delete"):
+            setattr(query, op, MagicMock(side_effect=operation(op)))
+        return query
+
+    supabase = MagicMock()
+    supabase.table.side_effect = table
+
+    response = await batch_update_movie_list(supabase, "watch_later", [1, 2, 3, 4], perfil_id=7)
+
+    results = {item.filme_id: item for item in response.results}
+    assert results[1].success
+    assert not results[2].success and "assistido" in results[2].message
+    assert results[3].success
+    assert not results[4].success and results[4].message == "Filme não encontrado"
+
+    assert len(calls) == 4
+    upserts = [call for call in calls if call[1] == "upsert"]
+    assert upserts[0][2][0] == [{"filme_id": 1, "perfil_id": 7}]
+
+@pytest.mark.asyncio
+async def test_batch_update_invalid_list_type():
+    """Test that an invalid list type fails every item"""
+    from unittest.mock import MagicMock
+    from app.v1.movielist.helper import batch_update_movie_list
+
+    response = await batch_update_movie_list(MagicMock(), "unknown", [1, 2], perfil_id=7)
+
+    assert [item.success for item in response.results] == [False, False]
@@ -1,5 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
+import json
 import logging
 from unittest.mock import patch, MagicMock
 from conftest import Timer
@@ -237,4 +238,412 @@ class TestMoviesRoutes:
             
             # Assert
             assert response.status_code == expected_status, f"Expected {expected_status}, got {response.status_code}"
-            assert "detail" in response.json(), "Response should include error details"
\ No newline at end of file
+            assert "detail" in response.json(), "Response should include error details"
+
+class TestTMDBClient:
+    """Test suite for the cached, pooled TMDB client"""
+
+    @pytest.fixture
+    def tmdb_settings(self):
+        from app.config import TMDBSettings
+        return TMDBSettings(url="https://tmdb.test/3", bearer_token="test-token")
+
+    def make_client(self, settings, handler):
+        import httpx
+        from app.v1.movies.tmdb_client import TMDBClient
+        return TMDBClient(settings, transport=httpx.MockTransport(handler))
+
+    @pytest.mark.asyncio
+    async def test_get_movie_is_cached(self, tmdb_settings):
+        """Repeated lookups of the same movie hit TMDB only once"""
+        import httpx
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(200, json={"id": 550, "title": "Fight Club"})
+
+        with Timer("tmdb_cache_hit"):
+            client = self.make_client(tmdb_settings, handler)
+            first = await client.get_movie(550)
+            second = await client.get_movie(550)
+            await client.aclose()
+
+        assert first == second == {"id": 550, "title": "Fight Club"}
+        assert calls == ["/3/movie/550"]
+        assert client.stats()["movie_cache"]["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_are_coalesced(self, tmdb_settings):
+        """Concurrent lookups of one movie share a single upstream request"""
+        import asyncio
+        import httpx
+        calls = []
+
+        async def handler(request):
+            calls.append(request.url.path)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"id": 603})
+
+        with Timer("tmdb_coalesce"):
+            client = self.make_client(tmdb_settings, handler)
+            results = await asyncio.gather(*(client.get_movie(603) for _ in range(50)))
+            await client.aclose()
+
+        assert all(result == {"id": 603} for result in results)
+        assert len(calls) == 1
+        assert client.stats()["movie_cache"]["coalesced"] == 49
+
+    @pytest.mark.asyncio
+    async def test_cancelled_lookup_does_not_fail_coalesced_ones(self, tmdb_settings):
+        """A client going away mid-request leaves the shared lookup running for the others"""
+        import asyncio
+        import httpx
+        calls = []
+
+        async def handler(request):
+            calls.append(request.url.path)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"id": 603})
+
+        client = self.make_client(tmdb_settings, handler)
+        first = asyncio.create_task(client.get_movie(603))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(client.get_movie(603))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == {"id": 603}
+        assert first.cancelled()
+        assert await client.get_movie(603) == {"id": 603}
+        await client.aclose()
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_cached_movie_is_not_shared_with_callers(self, tmdb_settings):
+        import httpx
+
+        client = self.make_client(tmdb_settings, lambda request: httpx.Response(200, json={"id": 550, "genres": []}))
+        movie = await client.get_movie(550)
+        movie["genres"].append("Drama")
+        movie["title"] = "changed"
+
+        assert await client.get_movie(550) == {"id": 550, "genres": []}
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_not_found_is_negatively_cached(self, tmdb_settings):
+        """A 404 from TMDB is cached and re-raised without another request"""
+        import httpx
+        from app.v1.movies.tmdb_client import TMDBError
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.path)
+            return httpx.Response(404, text="not found")
+
+        client = self.make_client(tmdb_settings, handler)
+        for _ in range(2):
+            with pytest.raises(TMDBError) as exc_info:
+                await client.get_movie(1)
+            assert exc_info.value.status_code == 404
+        await client.aclose()
+
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_server_errors_are_not_cached(self, tmdb_settings):
+        """Transient TMDB failures are retried on the next lookup"""
+        import httpx
+        from app.v1.movies.tmdb_client import TMDBError
+        responses = [httpx.Response(503, text="unavailable"), httpx.Response(200, json={"id": 2})]
+
+        client = self.make_client(tmdb_settings, lambda request: responses.pop(0))
+        with pytest.raises(TMDBError):
+            await client.get_movie(2)
+        assert await client.get_movie(2) == {"id": 2}
+        await client.aclose()
+
+    def test_cache_evicts_least_recently_used(self):
+        """The TTL cache stays bounded and evicts the oldest entry"""
+        from app.cache import TTLCache
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+        assert cache.stats()["evictions"] == 1
+
+    def test_cache_entries_expire(self):
+        """Entries are dropped once their TTL has elapsed"""
+        from app.cache import TTLCache
+        now = [0.0]
+        cache = TTLCache(maxsize=10, ttl=5, clock=lambda: now[0])
+        cache.set("a", 1)
+        now[0] = 4.9
+        assert cache.get("a") == 1
+        now[0] = 5.1
+        assert cache.get("a") is None
+
+
+class TestSupabaseClient:
+    """Test suite for the app's async, pooled Supabase client"""
+
+    @pytest.mark.asyncio
+    async def test_queries_share_the_pooled_http_client(self):
+        """PostgREST queries are async and go through the app-owned HTTP client"""
+        import httpx
+        import supabase
+        from app.config import SupabaseSettings
+        from app.executor import run_query
+        from app.supabase_client import create_http_client, create_supabase_client
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json=[{"id": 1}])
+
+        settings = SupabaseSettings(url="https://db.test", key="anon-key", service_key="service-key")
+        http_client = create_http_client(settings, transport=httpx.MockTransport(handler))
+        with patch("app.supabase_client.acreate_client", supabase.acreate_client), Timer("supabase_async_query"):
+            client = await create_supabase_client(settings, http_client)
+            query = client.table("Filme").select("id").eq("id", 1)
+            result = await run_query(query)
+        await http_client.aclose()
+
+        assert result.data == [{"id": 1}]
+        assert str(requests[0].url) == "https://db.test/rest/v1/Filme?select=id&id=eq.1"
+        assert requests[0].headers["apikey"] == "service-key"
+        assert http_client.is_closed
+
+
+class TestPopularMoviesImporter:
+    """Test suite for the bulk TMDB importer"""
+
+    POPULAR = {
+        1: [{"id": 10, "title": "A", "overview": "a", "vote_average": 7.5, "genre_ids": [28]},
+            {"id": 11, "title": "B", "overview": "b", "vote_average": 6.0, "genre_ids": [28, 99]}],
+        2: [{"id": 11, "title": "B", "overview": "b", "vote_average": 6.0, "genre_ids": [28, 99]},
+            {"id": 12, "title": "C", "overview": "c", "vote_average": 8.0, "genre_ids": []}],
+        3: [{"id": 13, "title": "D", "overview": "d", "vote_average": 5.0, "genre_ids": [28]}],
+    }
+
+    def make_importer(self, checkpoint=None, **kwargs):
+        import httpx
+        from app.config import TMDBSettings
+        from app.v1.movies.importer import Checkpoint, PopularMoviesImporter, TokenBucket
+        from app.v1.movies.tmdb_client import TMDBClient
+        self.calls = []
+
+        def handler(request):
+            path = request.url.path
+            self.calls.append(path)
+            if path == "/3/genre/movie/list":
+                return httpx.Response(200, json={"genres": [{"id": 28, "name": "Action"}]})
+            if path == "/3/movie/popular":
+                page = int(request.url.params["page"])
+                return httpx.Response(200, json={"page": page, "results": self.POPULAR.get(page, [])})
+            movie_id = int(path.split("/")[3])
+            if movie_id == 12:
+                return httpx.Response(404, text="not found")
+            return httpx.Response(200, json={
+                "crew": [{"job": "Writer", "name": "W"}, {"job": "Director", "name": f"Dir {movie_id}"}],
+                "cast": [{"name": f"Actor {n}"} for n in range(5)],
+            })
+
+        tmdb = TMDBClient(TMDBSettings(url="https://tmdb.test/3", bearer_token="t"), transport=httpx.MockTransport(handler))
+        self.upserts = []
+        self.updates = []
+        # Filme rows already stored, as {"id", "titulo", "tmdb_id"}
+        self.stored = kwargs.pop("stored", [])
+        supabase = MagicMock()
+
+        def table(name):
+            query = MagicMock()
+            filters = []
+            for method in ("select", "is_", "in_", "eq"):
+                getattr(query, method).side_effect = lambda *args, method=method: filters.append((method, args)) or query
+            def upsert(rows, on_conflict=None):
+                self.upserts.append((name, on_conflict, list(rows)))
+                return MagicMock()
+            def update(values):
+                self.updates.append((name, values, filters))
+                return query
+            def execute():
+                rows = self.stored
+                for method, args in filters:
+                    if method == "is_":
+                        rows = [row for row in rows if row[args[0]] is None]
+                    elif method == "in_":
+                        rows = [row for row in rows if row[args[0]] in args[1]]
+                return MagicMock(data=rows)
+            query.upsert.side_effect = upsert
+            query.update.side_effect = update
+            query.execute.side_effect = execute
+            return query
+
+        supabase.table.side_effect = table
+        return PopularMoviesImporter(
+            tmdb, supabase, limiter=TokenBucket(1000, 100), checkpoint=Checkpoint(checkpoint), **kwargs
+        )
+
+    @pytest.mark.asyncio
+    async def test_import_upserts_deduplicated_rows_by_tmdb_id(self):
+        """Movies are upserted in chunks keyed on tmdb_id, once per film"""
+        importer = self.make_importer(page_window=2, chunk_size=2)
+        with Timer("tmdb_import"):
+            stats = await importer.run(1, 3)
+
+        rows = [row for _, _, chunk in self.upserts for row in chunk]
+        assert {conflict for _, conflict, _ in self.upserts} == {"tmdb_id"}
+        assert all(len(chunk) <= 2 for _, _, chunk in self.upserts)
+        assert [row["tmdb_id"] for row in rows] == [10, 11, 12, 13]
+        assert rows[1]["genero"] == ["Action", "Desconhecido"]
+        assert rows[0]["diretor"] == "Dir 10" and rows[0]["elenco"] == ["Actor 0", "Actor 1", "Actor 2"]
+        assert rows[2]["diretor"] == "Unknown", "Films without credits are still imported"
+        assert stats.films == 4 and stats.pages == 3 and stats.failed_credits == 1
+        assert self.calls.count("/3/genre/movie/list") == 1
+
+    @pytest.mark.asyncio
+    async def test_import_resumes_from_checkpoint(self, tmp_path):
+        """A checkpoint makes the importer skip pages already stored"""
+        checkpoint = tmp_path / "import.json"
+        await self.make_importer(checkpoint=checkpoint, page_window=1).run(1, 2)
+        assert json.loads(checkpoint.read_text())["last_page"] == 2
+
+        importer = self.make_importer(checkpoint=checkpoint, page_window=1)
+        stats = await importer.run(1, 3)
+
+        assert stats.pages == 1
+        assert [row["tmdb_id"] for _, _, chunk in self.upserts for row in chunk] == [13]
+        assert "/3/movie/popular" in self.calls and self.calls.count("/3/movie/popular") == 1
+
+    @pytest.mark.asyncio
+    async def test_import_adopts_rows_stored_without_tmdb_id(self):
+        """Films stored before tmdb_id existed are updated instead of duplicated"""
+        importer = self.make_importer(stored=[
+            {"id": 1, "titulo": "A", "tmdb_id": None},
+            {"id": 2, "titulo": "B", "tmdb_id": None},
+            {"id": 3, "titulo": "B", "tmdb_id": 11},
+        ])
+
+        stats = await importer.run(1, 1)
+
+        assert [(values, filters[-1]) for _, values, filters in self.updates] == [({"tmdb_id": 10}, ("eq", ("id", 1)))]
+        assert stats.adopted == 1
+        assert [row["tmdb_id"] for _, _, chunk in self.upserts for row in chunk] == [10, 11]
+
+    @pytest.mark.parametrize("retry_after,attempt,delay", [
+        ("3", 0, 3.0),
+        (None, 2, 4.0),
+        ("soon", 1, 2.0),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 0, 0.0),
+    ])
+    def test_retry_delay(self, retry_after, attempt, delay):
+        """Retry-After is read as seconds or an HTTP date, falling back to backoff"""
+        from app.v1.movies.importer import retry_delay
+        assert retry_delay(retry_after, attempt) == delay
+
+    def test_retry_delay_until_http_date(self):
+        from datetime import datetime, timedelta, timezone
+        from email.utils import format_datetime
+        from app.v1.movies.importer import retry_delay
+        when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        assert 25 < retry_delay(when, 0) <= 30
+
+    @pytest.mark.asyncio
+    async def test_token_bucket_limits_rate(self):
+        """Requests beyond the burst are spread according to the rate"""
+        import time
+        from app.v1.movies.importer import TokenBucket
+        bucket = TokenBucket(rate=50, capacity=1)
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        assert time.monotonic() - started >= 0.05
+
+
+class TestMovieListCount:
+    """Test suite for the pagination total of the movie listing"""
+
+    @pytest.fixture
+    def mock_request(self):
+        from app.v1.movies import helper
+        helper._count_cache.clear()
+
+        request = MagicMock()
+        table = request.app.state.supabase.table.return_value
+        for method in ("select", "order", "range", "gt", "limit"):
+            getattr(table, method).return_value = table
+
+        count_response = MagicMock(count=1234, data=[])
+        page_response = MagicMock(data=[{"id": 1}, {"id": 2}])
+        table.execute.side_effect = lambda: count_response if table.select.call_args.kwargs.get("head") else page_response
+        yield request, table
+        helper._count_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_total_uses_head_count(self, mock_request):
+        """The total comes from the count header of a head request"""
+        from app.v1.movies import helper
+        request, table = mock_request
+
+        with Timer("list_movies_count_head"):
+            result = await helper.list_movies_from_db(request, page=1, limit=10, count="estimated")
+
+        table.select.assert_any_call("id", count="estimated", head=True)
+        assert result["meta"]["total"] == 1234
+        assert result["meta"]["totalPages"] == 124
+
+    @pytest.mark.asyncio
+    async def test_total_is_cached_per_mode(self, mock_request):
+        """Consecutive pages reuse the cached total"""
+        from app.v1.movies import helper
+        request, table = mock_request
+
+        await helper.list_movies_from_db(request, page=1, limit=10)
+        await helper.list_movies_from_db(request, page=2, limit=10)
+
+        head_calls = [c for c in table.select.call_args_list if c.kwargs.get("head")]
+        assert len(head_calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_count_none_skips_counting(self, mock_request):
+        """count=none returns no total and issues no count query"""
+        from app.v1.movies import helper
+        request, table = mock_request
+
+        result = await helper.list_movies_from_db(request, page=1, limit=10, count="none")
+
+        assert result["meta"]["total"] is None
+        assert result["meta"]["totalPages"] is None
+        assert not any(c.kwargs.get("head") for c in table.select.call_args_list)
+
+    @pytest.mark.asyncio
+    async def test_cursor_pagination(self, mock_request):
+        """Passing `after` switches to keyset pagination on id"""
+        from app.v1.movies import helper
+        from app.pagination import encode_cursor
+        request, table = mock_request
+
+        result = await helper.list_movies_from_db(request, limit=2, count="none", after=encode_cursor({"id": 10}))
+
+        table.gt.assert_called_once_with("id", 10)
+        table.limit.assert_called_once_with(2)
+        table.range.assert_not_called()
+        assert result["meta"]["next_cursor"] == encode_cursor({"id": 2})
+
+    @pytest.mark.asyncio
+    async def test_empty_cursor_starts_keyset_pagination(self, mock_request):
+        """An empty `after` selects cursor mode from the first movie, as on the other paginated endpoints"""
+        from app.v1.movies import helper
+        request, table = mock_request
+
+        await helper.list_movies_from_db(request, page=3, limit=2, count="none", after="")
+
+        table.gt.assert_not_called()
+        table.limit.assert_called_once_with(2)
+        table.range.assert_not_called()